@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Assets – an in-memory cache of the local images a preview refers to, e.g.
+images next to the document.
+
+The files are kept as data URIs, which the preview is given instead of reading
+the files again. A file is read again only when its modification time or size
+has changed. Since an unchanged file is given as the same URI on every
+refresh, WebKit's memory cache can also reuse the decoded image. The cache is
+bounded by the total size of the URIs it holds, and the least recently used
+entries are evicted first.
+
+Stylesheets aren't cached. As data URIs, their relative references, e.g. in
+`url()` and `@import`, would no longer resolve against their directory.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import mimetypes, os, stat
+
+from base64 import b64encode
+from lru import SizedLRU
+
+class AssetCache:
+
+	"""
+		A least recently used cache of local files as data URIs, bounded by
+		its total size in bytes.
+	"""
+
+	def __init__(self, max_size = 16 * 1024 * 1024):
+
+		self.types = ('image/',)
+		"""Prefixes of the MIME types of the files that are cached. Other files,
+		e.g. stylesheets and web pages that are navigated to, are left to
+		WebKit."""
+
+		# Cached URIs, with the modification time and size of their files,
+		# sized by their length.
+		self._entries = SizedLRU(max_size)
+
+		self.hits = 0
+		"""Number of files given from the cache."""
+
+		self.misses = 0
+		"""Number of files that had to be read."""
+
+	def __len__(self):
+		return len(self._entries)
+
+	@property
+	def size(self):
+		return self._entries.size
+
+	@property
+	def max_size(self):
+
+		"""
+			Maximum total size in bytes of the cached URIs.
+		"""
+
+		return self._entries.max_size
+
+	def data_uri(self, path):
+
+		"""
+			Returns the file as a data URI, or `None` if it isn't a readable
+			regular file of a cached type or is too large to be cached.
+		"""
+
+		mime = mimetypes.guess_type(path)[0]
+		if mime is None or not mime.startswith(self.types):
+			return None
+
+		try:
+			status = os.stat(path)
+		except OSError:
+			return None
+		if not stat.S_ISREG(status.st_mode):
+			return None
+
+		# The base64 encoding makes the URI a third larger than the file.
+		state = (status.st_mtime_ns, status.st_size)
+		if status.st_size * 4 // 3 > self.max_size:
+			return None
+
+		entry = self._entries.get(path)
+		if entry is not None and entry[0] == state:
+			self.hits += 1
+			return entry[1]
+
+		try:
+			with open(path, 'rb') as f:
+				data = f.read()
+		except OSError:
+			return None
+		self.misses += 1
+		uri = 'data:{0};base64,{1}'.format(mime, b64encode(data).decode('ascii'))
+
+		self._entries.put(path, (state, uri), len(uri))
+		return uri
+
+	def clear(self):
+		self._entries.clear()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Batch render – renders a directory tree of Markdown files to HTML without
+Gedit, with the same configuration file and pipeline as the plugin.
+
+Files are rendered in parallel by a pool of processes. A manifest in the
+output directory records the source files and the configuration of the last
+build, so files that haven't changed since then are skipped.
+
+Usage: batchrender.py [-h] [-c CONFIG] [-j JOBS] [-f] SOURCE OUTPUT
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse, json, os, sys, time
+
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from configuration import CONFIG_FILE, configurate
+from pipeline import Pipeline
+
+EXTENSIONS = ('.md', '.markdown', '.mdown', '.mkd', '.mkdn')
+"""File name extensions of Markdown files."""
+
+MANIFEST = '.gedit-markdown-manifest.json'
+"""Name of the manifest in the output directory."""
+
+# The pipeline of a worker process.
+_pipeline = None
+
+def _initialize(config_file):
+	global _pipeline
+	_pipeline = Pipeline(configurate(config_file))
+
+def _render(source, target):
+
+	# Called in a worker process. Returns the size of the source and the
+	# target, or an error message.
+	with open(source, encoding = 'utf-8') as f:
+		text = f.read()
+	_pipeline.has_error = False
+	html = _pipeline.render(text)
+	if _pipeline.has_error:
+		return len(text.encode('utf-8')), 0, html
+	os.makedirs(os.path.dirname(target), exist_ok = True)
+	with open(target, 'w', encoding = 'utf-8') as f:
+		f.write(html)
+	return len(text.encode('utf-8')), len(html.encode('utf-8')), None
+
+def find_sources(directory):
+
+	"""
+		Returns the paths, relative to the directory, of all Markdown files in
+		the directory tree.
+	"""
+
+	sources = []
+	for root, dirs, files in os.walk(directory):
+		dirs.sort()
+		for name in sorted(files):
+			if name.lower().endswith(EXTENSIONS):
+				sources.append(os.path.relpath(os.path.join(root, name), directory))
+	return sources
+
+def file_hash(path):
+	digest = sha256()
+	with open(path, 'rb') as f:
+		for chunk in iter(lambda: f.read(1024 * 1024), b''):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+def load_manifest(path):
+	try:
+		with open(path, encoding = 'utf-8') as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return {'fingerprint': None, 'files': {}}
+
+def save_manifest(path, manifest):
+	temporary = path + '.tmp'
+	with open(temporary, 'w', encoding = 'utf-8') as f:
+		json.dump(manifest, f, indent = 1, sort_keys = True)
+	os.replace(temporary, path)
+
+def target_path(output, relative):
+	return os.path.join(output, os.path.splitext(relative)[0] + '.html')
+
+def is_unchanged(entry, source, target):
+
+	"""
+		Returns whether the source is unchanged since it was recorded in the
+		manifest entry. The hash is only computed if the modification time or
+		size has changed, and the entry is updated if the content hasn't.
+	"""
+
+	if entry is None or not os.path.exists(target):
+		return False
+	stat = os.stat(source)
+	if entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+		return True
+	if entry['sha256'] != file_hash(source):
+		return False
+	entry['mtime'], entry['size'] = stat.st_mtime, stat.st_size
+	return True
+
+def build(source_dir, output_dir, config_file = CONFIG_FILE, jobs = None, force = False, out = sys.stdout):
+
+	"""
+		Renders the Markdown files in `source_dir` to `output_dir` and returns
+		the number of files that failed.
+	"""
+
+	start = time.monotonic()
+
+	# A changed configuration invalidates everything.
+	manifest_path = os.path.join(output_dir, MANIFEST)
+	manifest = load_manifest(manifest_path)
+	fingerprint = Pipeline(configurate(config_file)).fingerprint()
+	if force or manifest['fingerprint'] != fingerprint:
+		manifest = {'fingerprint': fingerprint, 'files': {}}
+
+	# Find out what needs to be rendered. The sources to render are recorded
+	# as they are before rendering, so that a source changed meanwhile is
+	# rendered again by the next build.
+	sources = find_sources(source_dir)
+	pending = {}
+	files = {}
+	for relative in sources:
+		source = os.path.join(source_dir, relative)
+		entry = manifest['files'].get(relative)
+		if is_unchanged(entry, source, target_path(output_dir, relative)):
+			files[relative] = entry
+		else:
+			stat = os.stat(source)
+			pending[relative] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'sha256': file_hash(source)}
+
+	# Render in parallel.
+	failures = 0
+	bytes_in = bytes_out = 0
+	if pending:
+		with ProcessPoolExecutor(jobs, initializer = _initialize, initargs = (config_file, )) as executor:
+			futures = {relative: executor.submit(_render, os.path.join(source_dir, relative), target_path(output_dir, relative)) for relative in pending}
+			for relative, future in futures.items():
+				try:
+					size_in, size_out, error = future.result()
+				except Exception as err:
+					size_in, size_out, error = 0, 0, str(err)
+				bytes_in += size_in
+				bytes_out += size_out
+				if error is not None:
+					failures += 1
+					print("{0}: {1}".format(relative, error), file = out)
+					continue
+				files[relative] = pending[relative]
+
+	manifest['files'] = files
+	os.makedirs(output_dir, exist_ok = True)
+	save_manifest(manifest_path, manifest)
+
+	# Report throughput.
+	elapsed = max(time.monotonic() - start, 1e-9)
+	rendered = len(pending) - failures
+	print("Rendered {0} files, skipped {1}, failed {2} in {3:.2f} s".format(rendered, len(sources) - len(pending), failures, elapsed), file = out)
+	print("Throughput: {0:.1f} files/s, {1:.2f} MB/s".format(rendered / elapsed, bytes_in / (1024 * 1024) / elapsed), file = out)
+
+	return failures
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(description = "Renders a directory tree of Markdown files to HTML.")
+	parser.add_argument('source', help = "directory with Markdown files")
+	parser.add_argument('output', help = "directory for the HTML files")
+	parser.add_argument('-c', '--config', default = CONFIG_FILE, help = "configuration file (default: %(default)s)")
+	parser.add_argument('-j', '--jobs', type = int, default = None, help = "number of worker processes (default: number of CPUs)")
+	parser.add_argument('-f', '--force', action = 'store_true', help = "render all files, even unchanged ones")
+	args = parser.parse_args(argv)
+
+	failures = build(args.source, args.output, args.config, args.jobs, args.force)
+	return 1 if failures else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
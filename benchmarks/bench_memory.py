@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Memory report of released and pooled preview web views.
+
+Loads a document of the synthetic corpus (see `corpus.py`) into a number of
+web views, as if shown by as many windows, and reports the resident memory of
+the process before, with the views, and after they have been released as the
+plugin does when their previews have been hidden: at most `--pool` views are
+kept with an empty page for reuse, and the others are destroyed.
+
+Needs GTK+ 3 and WebKitGTK with GObject introspection, and Linux for reading
+the resident memory.
+
+Usage: bench_memory.py [-h] [-c CONFIG] [-n VIEWS] [-p POOL] [-d DOCUMENT]
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse, gc, os, resource, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus, gi
+
+gi.require_version('Gtk', '3.0')
+gi.require_version('WebKit', '3.0')
+
+from gi.repository import Gtk, WebKit
+from configuration import configurate
+from pipeline import Pipeline
+
+def rss():
+
+	"""
+		Returns the resident memory of the process in bytes.
+	"""
+
+	with open('/proc/self/statm') as f:
+		return int(f.read().split()[1]) * resource.getpagesize()
+
+def settle(views):
+
+	# Run the main loop until the views have loaded their pages.
+	while Gtk.events_pending() or any(view.get_load_status() not in (WebKit.LoadStatus.FINISHED, WebKit.LoadStatus.FAILED) for view in views):
+		Gtk.main_iteration()
+	gc.collect()
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(description = "Reports the memory of released and pooled web views.")
+	parser.add_argument('-c', '--config', default = os.devnull, help = "configuration file (default: the built-in defaults)")
+	parser.add_argument('-n', '--views', type = int, default = 4, help = "web views, one per window (default: %(default)s)")
+	parser.add_argument('-p', '--pool', type = int, default = 1, help = "released views kept for reuse (default: %(default)s)")
+	parser.add_argument('-d', '--document', default = 'spec', choices = sorted(corpus.GENERATORS), help = "document to load (default: %(default)s)")
+	args = parser.parse_args(argv)
+
+	pipeline = Pipeline(configurate(args.config))
+	html = pipeline.render(corpus.generate([args.document])[args.document])
+	pipeline.stop()
+	before = rss()
+
+	# A view in a window of its own for every window of gedit.
+	windows = []
+	views = []
+	for i in range(args.views):
+		window = Gtk.OffscreenWindow()
+		view = WebKit.WebView()
+		window.add(view)
+		window.show_all()
+		view.load_string(html, "text/html", "utf-8", "file:///")
+		windows.append(window)
+		views.append(view)
+	settle(views)
+	loaded = rss()
+
+	# Release the views, as the plugin does.
+	pool = []
+	for window, view in zip(windows, views):
+		window.remove(view)
+		if len(pool) < args.pool:
+			view.load_string("", "text/html", "utf-8", "about:blank")
+			pool.append(view)
+		else:
+			view.destroy()
+		window.destroy()
+	del windows, views
+	settle(pool)
+	released = rss()
+
+	mib = 1024 * 1024
+	print("{0:32} {1:10.1f} MiB".format("before", before / mib))
+	print("{0:32} {1:10.1f} MiB".format("{0} views with {1}".format(args.views, args.document), loaded / mib))
+	print("{0:32} {1:10.1f} MiB".format("released, {0} pooled".format(min(args.pool, args.views)), released / mib))
+	print("Saved {0:.1f} MiB, {1:.1f} MiB per view.".format((loaded - released) / mib, (loaded - released) / mib / args.views))
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the preview pipeline.
+
+Times every stage of the pipeline on its own, and the pipeline end to end, on
+each document of the synthetic corpus (see `corpus.py`). For every stage and
+document the latency percentiles and the peak memory are reported. The stages
+are:
+
+* `markdown`: the internal or external Markdown implementation.
+* `smartypants`: the internal or external SmartyPants implementation, on the
+  HTML from the Markdown stage.
+* `external`: an external command given with `--external`, e.g. `cat`, to
+  measure the cost of `Pipeline._execute_command_line`.
+* `pipeline`: Markdown and SmartyPants together.
+
+The results can be saved as a baseline, and compared with a saved baseline.
+The benchmark fails if the median latency of any stage and document is more
+than the threshold slower than the baseline. The baseline is specific to the
+machine it was measured on, and is therefore not shipped.
+
+Usage: bench_pipeline.py [-h] [-c CONFIG] [-r REPEATS] [-d DOCUMENT]
+                         [-e COMMAND] [-b BASELINE] [-s] [-t THRESHOLD]
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse, json, os, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus
+
+from configuration import configurate
+from pipeline import Pipeline
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+"""Default baseline file."""
+
+def percentile(values, p):
+	values = sorted(values)
+	k = (len(values) - 1) * p / 100
+	lower = int(k)
+	upper = min(lower + 1, len(values) - 1)
+	return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+def measure(function, argument, repeats):
+
+	"""
+		Returns the latencies in milliseconds of `repeats` calls, and the peak
+		memory in bytes of one call.
+	"""
+
+	latencies = []
+	for i in range(repeats):
+		start = time.perf_counter()
+		function(argument)
+		latencies.append((time.perf_counter() - start) * 1000)
+
+	# Tracing memory slows the call down, so it is done separately.
+	tracemalloc.start()
+	function(argument)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	return latencies, peak
+
+def run(pipeline, documents, repeats, external = None):
+
+	"""
+		Returns the results as a dictionary keyed by "stage/document".
+	"""
+
+	results = {}
+	for name, text in documents.items():
+		html = pipeline.markdown(text)
+		stages = [
+			('markdown', pipeline.markdown, text),
+			('smartypants', pipeline.smartypants, html),
+			('pipeline', pipeline.render, text)
+		]
+		if external:
+			stages.append(('external', lambda text: pipeline._execute_command_line(text, external, 60), text))
+
+		for stage, function, argument in stages:
+			latencies, peak = measure(function, argument, repeats)
+			results[stage + '/' + name] = {
+				'p50': percentile(latencies, 50),
+				'p90': percentile(latencies, 90),
+				'p99': percentile(latencies, 99),
+				'max': max(latencies),
+				'peak_memory': peak,
+				'input_bytes': len(argument.encode('utf-8'))
+			}
+	return results
+
+def report(results, baseline, threshold, out = sys.stdout):
+
+	"""
+		Prints the results and returns the keys of the regressions.
+	"""
+
+	regressions = []
+	print("{0:28} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10} {6:>9}".format("stage/document", "p50 ms", "p90 ms", "p99 ms", "max ms", "peak KiB", "change"), file = out)
+	for key, result in sorted(results.items()):
+		change = ""
+		if key in baseline:
+			ratio = result['p50'] / baseline[key]['p50'] - 1
+			change = "{0:+.1%}".format(ratio)
+			if ratio > threshold:
+				regressions.append(key)
+				change += " !"
+		print("{0:28} {1:10.2f} {2:10.2f} {3:10.2f} {4:10.2f} {5:10.0f} {6:>9}".format(key, result['p50'], result['p90'], result['p99'], result['max'], result['peak_memory'] / 1024, change), file = out)
+	return regressions
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(description = "Benchmarks the preview pipeline.")
+	parser.add_argument('-c', '--config', default = os.devnull, help = "configuration file (default: the built-in defaults)")
+	parser.add_argument('-r', '--repeats', type = int, default = 10, help = "calls per stage and document (default: %(default)s)")
+	parser.add_argument('-d', '--document', action = 'append', choices = sorted(corpus.GENERATORS), help = "document to benchmark; may be repeated (default: all)")
+	parser.add_argument('-e', '--external', metavar = 'COMMAND', help = "external command to benchmark, e.g. cat")
+	parser.add_argument('-b', '--baseline', default = BASELINE, help = "baseline file (default: %(default)s)")
+	parser.add_argument('-s', '--save', action = 'store_true', help = "save the results as the baseline")
+	parser.add_argument('-t', '--threshold', type = float, default = 0.10, help = "allowed slowdown of the median relative to the baseline (default: %(default)s)")
+	args = parser.parse_args(argv)
+
+	pipeline = Pipeline(configurate(args.config))
+	results = run(pipeline, corpus.generate(args.document), args.repeats, args.external)
+	pipeline.stop()
+
+	try:
+		with open(args.baseline, encoding = 'utf-8') as f:
+			baseline = json.load(f)
+	except (OSError, ValueError):
+		baseline = {}
+
+	regressions = report(results, baseline, args.threshold)
+
+	if args.save:
+		with open(args.baseline, 'w', encoding = 'utf-8') as f:
+			json.dump(results, f, indent = 1, sort_keys = True)
+
+	if regressions:
+		print("Regressions of more than {0:.0%}: {1}".format(args.threshold, ', '.join(regressions)))
+		return 1
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the substitution engine of `smarty.Smarty`.
+
+Compares the single-pass engine, which applies all substitutions with one
+combined regular expression, with the former engine, which applied them one
+regular expression at a time. Both engines are run on the same generated HTML
+and must give identical results.
+
+Usage: bench_smarty.py [SIZE_IN_MB] [REPEATS]
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os, re, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import smarty
+
+# Snippets the corpus is built from. They cover every substitution, runs of
+# dashes and dots that must be left alone, and raw elements.
+SNIPPETS = [
+	'<h2>"Chapter" \'one\'</h2>\n',
+	'<p>It\'s a "quoted" text -- with an en-dash --- and an em-dash...</p>\n',
+	'<p>Dashes ---- and - are left alone, but .... is an ellipsis.</p>\n',
+	'<p>\'Single\' and "double" quotes, <em>"emphasized"</em> and <strong>\'strong\'</strong>.</p>\n',
+	'<pre><code>x = "raw" -- not \'touched\' ...</code></pre>\n',
+	'<ul>\n<li>"One" -- first</li>\n<li>\'Two\' --- second</li>\n</ul>\n',
+	'<p>Plain text without anything to substitute, just to make the text nodes longer.</p>\n',
+]
+
+class MultiPassSmarty(smarty.Smarty):
+
+	"""
+		Smarty with the former substitution engine, which scans every text node
+		once for each substitution.
+	"""
+
+	def _compile(self):
+		super()._compile()
+		if hasattr(self, '_patterns'):
+			self._regexs = {key: re.compile(pattern) for key, pattern in self._patterns.items()}
+
+	def _substitute(self, data):
+		for key, substitution in self.substitutions.items():
+			if substitution:
+				data = self._regexs[key].sub(substitution, data)
+		return data
+
+def corpus(size):
+	chunks = []
+	length = 0
+	i = 0
+	while length < size:
+		snippet = SNIPPETS[i % len(SNIPPETS)]
+		chunks.append(snippet)
+		length += len(snippet)
+		i += 1
+	return ''.join(chunks)
+
+def measure(engine, html, repeats):
+	best = None
+	for i in range(repeats):
+		start = time.perf_counter()
+		result = engine.reset().feed(html).close()
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best, result
+
+def main(argv):
+	size = float(argv[1]) if len(argv) > 1 else 2.0
+	repeats = int(argv[2]) if len(argv) > 2 else 5
+
+	html = corpus(int(size * 1024 * 1024))
+	megabytes = len(html.encode('utf-8')) / (1024 * 1024)
+
+	multi_pass_time, multi_pass_result = measure(MultiPassSmarty(), html, repeats)
+	single_pass_time, single_pass_result = measure(smarty.Smarty(), html, repeats)
+
+	if multi_pass_result != single_pass_result:
+		print("Error: The engines give different results.")
+		return 1
+
+	print("Corpus:      {0:.2f} MB, best of {1}".format(megabytes, repeats))
+	print("Multi-pass:  {0:.3f} s ({1:.2f} MB/s)".format(multi_pass_time, megabytes / multi_pass_time))
+	print("Single-pass: {0:.3f} s ({1:.2f} MB/s)".format(single_pass_time, megabytes / single_pass_time))
+	print("Speed-up:    {0:.2f}x".format(multi_pass_time / single_pass_time))
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the start of gedit with the plugin.
+
+Measures, in fresh Python processes, the time of each phase of the plugin's
+life until its first preview:
+
+* `module`: the imports of the plugin module, when gedit loads the plugin.
+* `menu`: the reading of the configuration, when the menu is added once gedit
+  is idle after the window has been shown.
+* `preview`: the imports of `_import_preview()` and the configuration, when the
+  preview is first shown.
+* `engines`: the loading of the internal Markdown and SmartyPants, by the first
+  render or by the prewarming when gedit is idle.
+
+The imports are taken from the plugin module, so they are the ones it makes.
+Imports that fail, e.g. of the GObject introspection modules outside of gedit,
+are reported and not timed. Only the `module` phase delays the start of gedit.
+
+Usage: bench_startup.py [-h] [-c CONFIG] [-r REPEATS]
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse, ast, json, os, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+"""Directory of the plugin."""
+
+PLUGIN = os.path.join(ROOT, 'gedit-markdown.py')
+"""The plugin module."""
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+phases = json.loads(sys.argv[2])
+namespace = {}
+times = {}
+missing = []
+for phase, statements in phases:
+	start = time.perf_counter()
+	for statement in statements:
+		try:
+			exec(statement, namespace)
+		except ImportError as e:
+			missing.append(statement)
+	times[phase] = (time.perf_counter() - start) * 1000
+print(json.dumps({'times': times, 'missing': missing}))
+"""
+"""Script run in a fresh process, which executes the statements of each phase
+and prints the times in milliseconds."""
+
+def imports(path):
+
+	"""
+		Returns the import statements at the top level of the module, and the
+		ones of its function `_import_preview()`.
+	"""
+
+	with open(path, encoding = 'utf-8') as f:
+		source = f.read()
+	tree = ast.parse(source)
+	module, preview = [], []
+	for node in tree.body:
+		if isinstance(node, (ast.Import, ast.ImportFrom)):
+			module.append(ast.get_source_segment(source, node))
+		elif isinstance(node, ast.FunctionDef) and node.name == '_import_preview':
+			preview.extend(ast.get_source_segment(source, statement) for statement in node.body if isinstance(statement, (ast.Import, ast.ImportFrom)))
+	return module, preview
+
+def phases(config):
+	module, preview = imports(PLUGIN)
+	read = "from configuration import shared_configuration\ncfg = shared_configuration({0!r})".format(config)
+	return [
+		('module', module),
+		('menu', [read]),
+		('preview', preview),
+		('engines', ["pipeline.Pipeline(cfg).render('')"])
+	]
+
+def run(config, repeats):
+
+	"""
+		Returns the times of the phases in milliseconds, as lists keyed by
+		phase, and the statements that failed.
+	"""
+
+	argument = json.dumps(phases(config))
+	times = {}
+	for i in range(repeats):
+		output = subprocess.run([sys.executable, '-c', CHILD, ROOT, argument], stdout = subprocess.PIPE, check = True).stdout
+		result = json.loads(output.decode('utf-8'))
+		for phase, milliseconds in result['times'].items():
+			times.setdefault(phase, []).append(milliseconds)
+	return times, result['missing']
+
+def median(values):
+	values = sorted(values)
+	return values[len(values) // 2]
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(description = "Benchmarks the start of gedit with the plugin.")
+	parser.add_argument('-c', '--config', default = os.devnull, help = "configuration file (default: the built-in defaults)")
+	parser.add_argument('-r', '--repeats', type = int, default = 10, help = "processes to measure (default: %(default)s)")
+	args = parser.parse_args(argv)
+
+	times, missing = run(args.config, args.repeats)
+	medians = {phase: median(values) for phase, values in times.items()}
+	for phase, milliseconds in medians.items():
+		print("{0:10} {1:8.1f} ms".format(phase, milliseconds))
+	print("{0:10} {1:8.1f} ms".format("startup", medians['module']))
+	for statement in missing:
+		print("Not timed, since it failed: " + statement.replace('\n', ' '))
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Synthetic corpus of Markdown documents for the benchmarks.
+
+Every document is generated from a fixed seed, so the corpus is the same on
+every run. The documents are:
+
+* `note`: a small note of a few paragraphs.
+* `spec`: a specification of about 1 MB with headings, lists, links and
+  emphasis.
+* `code`: a document dominated by fenced and indented code, which exercises
+  the raw elements of SmartyPants.
+* `tables`: a document dominated by tables.
+* `typography`: text with a pathological density of quotes, dashes and dots.
+
+Usage: corpus.py [DIRECTORY]
+
+Writes the documents as Markdown files to the directory, or prints their names
+and sizes if no directory is given.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os, random, sys
+
+SEED = 2015
+"""Seed of the random generator."""
+
+WORDS = """
+	lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor
+	incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud
+	exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute
+	irure in reprehenderit voluptate velit esse cillum fugiat nulla pariatur
+""".split()
+
+def _sentence(rng, length = None):
+	words = [rng.choice(WORDS) for i in range(length or rng.randint(6, 18))]
+	return ' '.join(words).capitalize() + '.'
+
+def _paragraph(rng, sentences = None):
+	return ' '.join(_sentence(rng) for i in range(sentences or rng.randint(2, 6)))
+
+def _inline(rng):
+
+	# A sentence with some inline markup.
+	words = _sentence(rng).split()
+	i = rng.randrange(len(words))
+	words[i] = rng.choice(['*{0}*', '**{0}**', '`{0}`', '[{0}](http://example.com/{0})']).format(words[i])
+	return ' '.join(words)
+
+def _fill(rng, size, parts):
+
+	# Append generated parts until the document has the given size.
+	chunks = []
+	length = 0
+	while length < size:
+		chunk = parts(rng)
+		chunks.append(chunk)
+		length += len(chunk) + 2
+	return '\n\n'.join(chunks) + '\n'
+
+def note(rng):
+	return '# ' + _sentence(rng, 4) + '\n\n' + '\n\n'.join(_paragraph(rng) for i in range(4)) + '\n'
+
+def spec(rng, size = 1024 * 1024):
+	counter = [0]
+	def parts(rng):
+		counter[0] += 1
+		kind = counter[0] % 6
+		if kind == 0:
+			return '#' * rng.randint(1, 4) + ' ' + _sentence(rng, 5)
+		if kind == 1:
+			return '\n'.join('- ' + _inline(rng) for i in range(rng.randint(3, 8)))
+		if kind == 2:
+			return '\n'.join('{0}. {1}'.format(i + 1, _inline(rng)) for i in range(rng.randint(3, 8)))
+		if kind == 3:
+			return '> ' + _paragraph(rng)
+		return ' '.join(_inline(rng) for i in range(rng.randint(3, 6)))
+	return _fill(rng, size, parts)
+
+def code(rng, size = 256 * 1024):
+	def parts(rng):
+		lines = ['x = "{0}" -- \'{1}\' ...'.format(rng.choice(WORDS), rng.choice(WORDS)) for i in range(rng.randint(5, 20))]
+		if rng.random() < 0.5:
+			return '```\n' + '\n'.join(lines) + '\n```'
+		if rng.random() < 0.5:
+			return '\n'.join('    ' + line for line in lines)
+		return _paragraph(rng, 2) + ' `"inline" -- code`'
+	return _fill(rng, size, parts)
+
+def tables(rng, size = 256 * 1024):
+	def parts(rng):
+		columns = rng.randint(3, 8)
+		rows = [' | '.join(rng.choice(WORDS) for i in range(columns)) for j in range(rng.randint(5, 30))]
+		return '\n'.join([rows[0], ' | '.join('---' for i in range(columns))] + rows[1:])
+	return _fill(rng, size, parts)
+
+def typography(rng, size = 256 * 1024):
+	marks = ['"', "'", '--', '---', '...', ' "', " '", '" ', "' ", '----', '....']
+	def parts(rng):
+		return ''.join(rng.choice(WORDS) + rng.choice(marks) for i in range(rng.randint(20, 60)))
+	return _fill(rng, size, parts)
+
+GENERATORS = {
+	'note': note,
+	'spec': spec,
+	'code': code,
+	'tables': tables,
+	'typography': typography
+}
+"""Generators of the documents in the corpus, keyed by name."""
+
+def generate(names = None):
+
+	"""
+		Returns a dictionary with the named documents, or all of them.
+	"""
+
+	names = names or GENERATORS.keys()
+	return {name: GENERATORS[name](random.Random(SEED)) for name in names}
+
+def main(argv):
+	documents = generate()
+	for name, text in documents.items():
+		if len(argv) > 1:
+			os.makedirs(argv[1], exist_ok = True)
+			with open(os.path.join(argv[1], name + '.md'), 'w', encoding = 'utf-8') as f:
+				f.write(text)
+		print("{0:12} {1:10,d} bytes".format(name, len(text.encode('utf-8'))))
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
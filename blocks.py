@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Blocks – splits Markdown text into top-level blocks and caches their HTML, so
+that only changed blocks need to be converted again.
+
+A block is a run of lines separated from the next block by at least one blank
+line. Blank lines inside fenced code, raw HTML blocks and block quotes, before
+indented continuation lines and between items of the same list do not end a
+block, since those constructs must be converted as a whole.
+
+Link reference and abbreviation definitions may be used anywhere in the
+document. They are therefore appended to every block when it is converted,
+and are part of the key of the cached HTML. Footnotes can't be converted block
+by block, since their definitions are rendered at the end of the document.
+Neither can fenced code or a raw HTML block that is left open at the end of
+the text, since the definitions would end up inside it. Such a text is
+converted as a whole.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import re
+from hashlib import sha1
+
+FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+"""Opening or closing line of fenced code."""
+
+LIST_ITEM = re.compile(r'^ {0,3}([*+-]|\d+[.)])[ \t]')
+"""First line of a list item."""
+
+DEFINITION = re.compile(r'^ {0,3}(\[[^\]^][^\]]*\]|\*\[[^\]]+\]):')
+"""Link reference or abbreviation definition."""
+
+FOOTNOTE = re.compile(r'\[\^[^\]]+\]')
+"""Footnote reference or definition."""
+
+FOOTNOTE_DEFINITION = re.compile(r'^ {0,3}\[\^[^\]]+\]:')
+"""First line of a footnote definition."""
+
+DEFINITION_TITLE = re.compile(r'^[ \t]+("[^"]*"|\'[^\']*\'|\([^)]*\))[ \t]*$')
+"""Title of a link reference definition on a line of its own."""
+
+DEFINITION_LIST_ITEM = re.compile(r'^ {0,3}:[ \t]')
+"""First line of a definition in a definition list."""
+
+UNDERLINE = re.compile(r'^ {0,3}[|:= -]*[=-][|:= -]*$')
+"""Underline of a setext heading or separator line of a table."""
+
+QUOTE = re.compile(r'^ {0,3}>')
+"""Line of a block quote."""
+
+HTML_BLOCK = re.compile(r'^ {0,3}<(!--|[a-zA-Z][a-zA-Z0-9]*)(?=[\s/>]|$)')
+"""First line of a raw HTML block or comment."""
+
+BLOCK_LEVEL_ELEMENTS = frozenset([
+	'address', 'article', 'aside', 'blockquote', 'body', 'canvas', 'center',
+	'colgroup', 'dd', 'details', 'div', 'dl', 'dt', 'fieldset', 'figcaption',
+	'figure', 'footer', 'form', 'group', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+	'header', 'hgroup', 'hr', 'html', 'iframe', 'legend', 'li', 'main', 'map',
+	'math', 'menu', 'nav', 'noscript', 'object', 'ol', 'option', 'output', 'p',
+	'pre', 'progress', 'script', 'section', 'style', 'summary', 'table',
+	'tbody', 'td', 'textarea', 'tfoot', 'th', 'thead', 'tr', 'ul', 'video'
+])
+"""Elements that start a raw HTML block, as in Python-Markdown."""
+
+def split_blocks(text):
+
+	"""
+		Splits Markdown text into a list of top-level blocks.
+	"""
+
+	return [block for first_line, block in split_blocks_with_lines(text)]
+
+def split_blocks_with_lines(text):
+
+	"""
+		Splits Markdown text into a list of top-level blocks, each given as the
+		number of its first line, counted from zero, and its text.
+	"""
+
+	return split_document(text)[0]
+
+def split_document(text):
+
+	"""
+		Splits Markdown text into top-level blocks. Returns a list of the
+		blocks as `split_blocks_with_lines()` does, the link reference and
+		abbreviation definitions of the text, one per line, and whether the
+		text can be converted block by block.
+	"""
+
+	blocks = []
+	lines = []
+	shared = []
+	first_line = 0
+	fence = None
+	html = None
+	blank = False
+
+	# The lines between blank lines, and the definitions among them, as
+	# Python-Markdown sees them.
+	chunk = []
+	chunk_definitions = []
+	is_ambiguous = False
+
+	text_lines = text.split('\n')
+	for number, line in enumerate(text_lines):
+
+		# Inside fenced code nothing ends the block but the closing fence.
+		if fence is not None:
+			lines.append(line)
+			if _closes_fence(fence, line):
+				fence = None
+			continue
+
+		# Inside a raw HTML block nothing ends the block but the end tag of
+		# the element it starts with.
+		if html is not None:
+			lines.append(line)
+			html = _close_html(html, line)
+			continue
+
+		if not line.strip():
+			blank = True
+			if lines:
+				lines.append(line)
+			if chunk_definitions:
+				definitions = _chunk_definitions(chunk, chunk_definitions)
+				is_ambiguous = is_ambiguous or definitions is None
+				shared.extend(definitions or [])
+			chunk = []
+			chunk_definitions = []
+			continue
+
+		# A non-blank line after a blank line starts a new block, unless it
+		# continues the current one.
+		if blank and lines and not _is_continuation(lines, text_lines, number):
+			blocks.append((first_line, '\n'.join(lines).strip('\n')))
+			lines = []
+		if not lines:
+			first_line = number
+		blank = False
+
+		match = FENCE.match(line)
+		if match:
+			fence = match.group(1)
+		else:
+			html = _open_html(line)
+			if html is None:
+				if DEFINITION.match(line):
+					chunk_definitions.append(line)
+				elif chunk_definitions and chunk[-1] == chunk_definitions[-1] and _continues_definition(chunk[-1], line):
+					chunk_definitions.append(line)
+		chunk.append(line)
+		lines.append(line)
+
+	if lines:
+		blocks.append((first_line, '\n'.join(lines).strip('\n')))
+	if chunk_definitions:
+		definitions = _chunk_definitions(chunk, chunk_definitions)
+		is_ambiguous = is_ambiguous or definitions is None
+		shared.extend(definitions or [])
+
+	# Footnotes, constructs left open at the end, and definitions that may
+	# not be definitions need the whole text.
+	is_splittable = fence is None and html is None and not is_ambiguous and not FOOTNOTE.search(text)
+
+	return blocks, '\n'.join(shared), is_splittable
+
+def _chunk_ahead(text_lines, number):
+
+	# Returns the lines from the line with the number to the next blank line,
+	# and the first line after the blank lines and the definitions that
+	# follow them. Blank lines in fenced code and raw HTML blocks don't count.
+	ahead = []
+	fence = None
+	html = None
+	blank = False
+	for following in range(number, len(text_lines)):
+		line = text_lines[following]
+		if fence is not None:
+			if _closes_fence(fence, line):
+				fence = None
+			continue
+		if html is not None:
+			html = _close_html(html, line)
+			continue
+		if not line.strip():
+			blank = True
+			continue
+		if blank and (DEFINITION.match(line) or FOOTNOTE_DEFINITION.match(line)):
+			continue
+		ahead.append(line)
+		if blank:
+			break
+		match = FENCE.match(line)
+		if match:
+			fence = match.group(1)
+		else:
+			html = _open_html(line)
+
+	# Code or raw HTML left open at the end may be text, so all lines count.
+	if fence is not None or html is not None:
+		return [line for line in text_lines[number:] if line.strip()]
+	return ahead
+
+def _is_continuation(lines, text_lines, number):
+
+	line = text_lines[number]
+
+	# Indented lines belong to a list item or to indented code.
+	if line[0] in ' \t':
+		return True
+
+	# Definitions of a definition list follow the term, and further terms
+	# with definitions continue the list, also when blank lines separate the
+	# term from its definition.
+	if DEFINITION_LIST_ITEM.match(line):
+		return True
+	if any(DEFINITION_LIST_ITEM.match(l) for l in lines) and any(DEFINITION_LIST_ITEM.match(l) for l in _chunk_ahead(text_lines, number)):
+		return True
+
+	# Link reference, abbreviation and footnote definitions are removed from
+	# the text, so the blocks around them may be one.
+	if DEFINITION.match(line) or FOOTNOTE_DEFINITION.match(line):
+		return True
+
+	# Block quotes separated by blank lines are one block quote.
+	if QUOTE.match(line) and any(QUOTE.match(l) for l in lines):
+		return True
+
+	# Items of a list separated by blank lines are one list, also when the
+	# list follows a heading or paragraph in the same block.
+	return LIST_ITEM.match(line) is not None and any(LIST_ITEM.match(l) for l in reversed(lines))
+
+def _continues_definition(definition, line):
+
+	# Whether the line holds the URL or title of the link reference
+	# definition on the line before it.
+	if not line[:1].isspace():
+		return False
+	return DEFINITION_TITLE.match(line) is not None or not definition[definition.index(':', definition.index(']')) + 1:].strip()
+
+def _chunk_definitions(chunk, definitions):
+
+	# Returns the definitions of the lines between two blank lines, or `None`
+	# if they may not be definitions. Lines looking like definitions are the
+	# terms of a definition list, the text of a setext heading or the cells
+	# of a table when the lines hold one.
+	if any(DEFINITION_LIST_ITEM.match(line) for line in chunk):
+		return None
+	if any(UNDERLINE.match(line) for line in chunk[1:]):
+		return None
+	return definitions
+
+def _closes_fence(fence, line):
+
+	# Whether the line closes the fenced code opened by the fence.
+	match = FENCE.match(line)
+	return match is not None and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence)
+
+def _open_html(line):
+
+	# Returns the state of the raw HTML block started by the line, or `None`
+	# if the line doesn't start one or the block ends on the same line. The
+	# state is the tag of the element, its depth and whether a comment is
+	# open.
+	match = HTML_BLOCK.match(line)
+	if match is None:
+		return None
+	tag = match.group(1).lower()
+	if tag == '!--':
+		return _close_html((tag, 0, True), line[match.end():])
+	if tag not in BLOCK_LEVEL_ELEMENTS or tag == 'hr':
+		return None
+	return _close_html((tag, 0, False), line)
+
+def _close_html(html, line):
+
+	# Returns the state of the raw HTML block after the line, or `None` if the
+	# block ends on the line.
+	tag, depth, comment = html
+	position = 0
+	while True:
+		if comment:
+			position = line.find('-->', position)
+			if position < 0:
+				return (tag, depth, True)
+			position += 3
+			comment = False
+			if depth <= 0:
+				return None
+		else:
+			match = re.compile(r'<!--|<(/?)' + tag + r'(?=[\s/>]|$)([^>]*?/>)?', re.IGNORECASE).search(line, position)
+			if match is None:
+				return (tag, depth, False)
+			position = match.end()
+			if match.group(0) == '<!--':
+				comment = True
+			elif match.group(1):
+				depth -= 1
+				if depth <= 0:
+					return None
+			elif not match.group(2):
+				depth += 1
+
+class BlockCache:
+
+	"""
+		Converts Markdown text block by block, reusing the HTML of blocks whose
+		content has not changed since the last conversion.
+	"""
+
+	def __init__(self, convert):
+
+		self.convert = convert
+		"""Function converting Markdown text to HTML."""
+
+		# HTML of the blocks of the last conversion, keyed by content hash.
+		self._cache = {}
+
+	def clear(self):
+		self._cache = {}
+
+	def render(self, text):
+		return '\n'.join(html for key, html, first_line in self.render_blocks(text))
+
+	def render_blocks(self, text):
+
+		"""
+			Converts the text and returns a list of the key, HTML and first line
+			of each block. The key is a hexadecimal hash of the content of the
+			block.
+		"""
+
+		# Definitions may be referred to from any block. Footnotes and
+		# constructs left open need the whole document.
+		blocks, shared, is_splittable = split_document(text)
+		if not is_splittable:
+			self._cache = {}
+			return [(sha1(text.encode('utf-8')).hexdigest(), self.convert(text), 0)]
+
+		cache = {}
+		result = []
+		for first_line, block in blocks:
+			key = sha1((block + '\0' + shared).encode('utf-8')).hexdigest()
+			if key not in cache:
+				cache[key] = self._cache[key] if key in self._cache else self.convert(block + '\n\n' + shared)
+			result.append((key, cache[key], first_line))
+
+		# Only keep blocks of the current text, so the cache never grows larger
+		# than the document.
+		self._cache = cache
+
+		return result
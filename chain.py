@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Chain – external commands connected by OS pipes, so that they run at the same
+time, each one reading the output of the previous one as it is produced.
+
+The text is written in chunks to the stdin of the first command, while the
+output of the last command and the error output of every command are read.
+Every command has its own timeout, counted from the start of the chain. When
+a command exceeds it, or the chain is cancelled, the whole chain is killed,
+including any children of the commands.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os, selectors, shlex, signal
+
+from codecs import getincrementaldecoder
+from io import IncrementalNewlineDecoder
+from subprocess import Popen, PIPE, TimeoutExpired
+from time import monotonic
+
+CANCEL_INTERVAL = 0.05
+"""Seconds between checks for cancellation."""
+
+class Cancelled(Exception):
+	"""The chain was cancelled."""
+
+def run(command_lines, chunks, timeouts, cancelled = None):
+
+	"""
+		Runs the commands as a chain and writes an iterable of text chunks to
+		it. A chunk is only encoded when the previous one has been written, so
+		the input is never held in memory as a whole. Returns the output of
+		the last command as a list of text chunks, the error output of every
+		command as a list of strings, and the set of the indices of the
+		commands that timed out. Raises `OSError` if a command can't be
+		started, and `Cancelled` if the `threading.Event` given as
+		`cancelled` is set while the chain runs.
+	"""
+
+	deadlines = [monotonic() + timeout for timeout in timeouts]
+	processes = []
+	timed_out = set()
+	try:
+
+		# Each command reads the stdout of the previous one. The pipe is closed
+		# here once the next command has its own copy, so that the command
+		# sees the end of its input when the previous one exits.
+		stdin = PIPE
+		for command_line in command_lines:
+			process = Popen(shlex.split(command_line), stdin = stdin, stdout = PIPE, stderr = PIPE, bufsize = 0, start_new_session = True)
+			if processes:
+				processes[-1].stdout.close()
+			processes.append(process)
+			stdin = process.stdout
+
+		output, errors = _pump(processes, chunks, deadlines, timed_out, cancelled)
+
+		# The pipes are closed, but the commands may not have exited yet.
+		for i, process in enumerate(processes):
+			if timed_out:
+				break
+			try:
+				process.wait(max(0, deadlines[i] - monotonic()))
+			except TimeoutExpired:
+				timed_out.add(i)
+
+		return output, errors, timed_out
+
+	finally:
+		# Don't leave anything behind, whatever happened. Killed processes
+		# exit at once, so waiting for them doesn't block.
+		for process in processes:
+			if timed_out or process.poll() is None:
+				_kill(process)
+			for pipe in (process.stdin, process.stdout, process.stderr):
+				if pipe is not None:
+					pipe.close()
+
+def _pump(processes, chunks, deadlines, timed_out, cancelled):
+
+	# Writes the chunks to the first command and reads the output until all
+	# pipes are closed or a command times out, which is then added to
+	# `timed_out`. Raises `Cancelled` if the chain is cancelled.
+	first, last = processes[0], processes[-1]
+	chunks = iter(chunks)
+	request = memoryview(b'')
+	output = []
+	errors = [bytearray() for process in processes]
+
+	# Output is decoded as it arrives, with universal newlines.
+	decoder = IncrementalNewlineDecoder(getincrementaldecoder('utf-8')('replace'), True)
+
+	os.set_blocking(first.stdin.fileno(), False)
+	with selectors.DefaultSelector() as selector:
+		selector.register(first.stdin, selectors.EVENT_WRITE)
+		selector.register(last.stdout, selectors.EVENT_READ)
+		for i, process in enumerate(processes):
+			selector.register(process.stderr, selectors.EVENT_READ, i)
+
+		while selector.get_map():
+
+			# A command times out if it is still running at its deadline. When
+			# all commands have exited, but something they started keeps a
+			# pipe open, the chain is given until the latest deadline.
+			now = monotonic()
+			running = [i for i, process in enumerate(processes) if process.poll() is None]
+			timed_out.update(i for i in running if deadlines[i] <= now)
+			if not running and max(deadlines) <= now:
+				timed_out.add(len(processes) - 1)
+			if timed_out:
+				break
+			if cancelled is not None and cancelled.is_set():
+				raise Cancelled()
+			deadline = min(deadlines[i] for i in running) if running else max(deadlines)
+			if cancelled is not None:
+				deadline = min(deadline, now + CANCEL_INTERVAL)
+
+			for key, events in selector.select(deadline - now):
+
+				if key.fileobj is first.stdin:
+					while not request:
+						chunk = next(chunks, None)
+						if chunk is None:
+							break
+						request = memoryview(chunk.encode('utf-8'))
+
+					# Closing stdin tells the chain that the input is complete.
+					# A command that exits without reading all input is treated
+					# the same way.
+					try:
+						written = os.write(first.stdin.fileno(), request[:65536]) if request else None
+					except BlockingIOError:
+						continue
+					except BrokenPipeError:
+						written = None
+					if written is None:
+						selector.unregister(first.stdin)
+						first.stdin.close()
+					else:
+						request = request[written:]
+
+				else:
+					data = os.read(key.fd, 65536)
+					if not data:
+						selector.unregister(key.fileobj)
+						key.fileobj.close()
+					elif key.data is None:
+						text = decoder.decode(data)
+						if text:
+							output.append(text)
+					else:
+						errors[key.data] += data
+
+	text = decoder.decode(b'', True)
+	if text:
+		output.append(text)
+	return output, [error.decode('utf-8', 'replace') for error in errors]
+
+def _kill(process):
+
+	# Kill the whole process group, in case the command has children.
+	try:
+		os.killpg(process.pid, signal.SIGKILL)
+	except OSError:
+		pass
+	process.wait()
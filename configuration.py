@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Configuration – the configuration of Gedit Markdown, with its default values.
+
+The configuration is read without importing the pipeline, so that the plugin
+can read it, e.g. for the accelerator of its menu, at little cost.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+
+from simpleconfig import SimpleConfig
+from xdg.BaseDirectory import xdg_config_home
+
+# Older versions of PyXDG don't know about the state directory.
+try:
+	from xdg.BaseDirectory import xdg_state_home
+except ImportError:
+	xdg_state_home = os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state')
+
+CONFIG_FILE = os.path.join(xdg_config_home, "gedit", "gedit-markdown")
+"""Default configuration file."""
+
+def configurate(config_file = CONFIG_FILE, write = False):
+
+	"""
+		Returns a `SimpleConfig` with the default configuration, updated from
+		the configuration file. If `write` is `True` and the file doesn't
+		exist, it is created with the default values.
+	"""
+
+	# Create a configuration object.
+	cfg = SimpleConfig()
+
+	# Default configuration for the application.
+	cfg.current_section = 'General'
+	cfg.current_dictionary = {
+		"show_hide_accelerator_key": "<Ctrl><Alt>m",
+		"use_external_markdown" : "No",
+		"use_external_smartypants" : "No",
+		"stages" : "markdown, smartypants",
+		"integrated_smartypants" : "No",
+		"prewarm_engines" : "No",
+		"profile_extensions" : "No",
+		"heading_navigator" : "No",
+		"use_bottom_panel" : "No",
+		"live_preview" : "No",
+		"live_preview_delay" : "500",
+		"patch_preview" : "No",
+		"render_cache_size" : "32",
+		"render_cache_on_disk" : "No",
+		"asset_cache_size" : "16",
+		"timing_log" : "No",
+		"lazy_preview" : "No",
+		"scroll_sync" : "No",
+		"document_previews" : "8",
+		"preview_release_delay" : "0",
+		"preview_pool_size" : "1",
+		"lazy_preview_section_lines" : "200"
+	}
+
+	# Default configuration for internal Markdown library.
+	cfg.current_section = 'Internal Markdown'
+	cfg.current_dictionary = {
+		"output_format": "html5",
+		"lazy_ol": "False",
+		"extensions": """
+				markdown.extensions.extra,
+				markdown.extensions.sane_lists
+		""",
+		"memoize": "markdown.extensions.codehilite:CodeHilite.hilite",
+		"memoize_cache_size": "8"
+	}
+
+	# Default configuration for external Markdown tool.
+	cfg.current_section = 'External Markdown'
+	cfg.current_dictionary = {
+		"command_line": "",
+		"timeout": "30",
+		"persistent": "No",
+		"framing": "nul"
+	}
+
+	# Default configuration for internal SmartyPants library.
+	cfg.current_section = 'Internal SmartyPants'
+	cfg.current_dictionary = {
+		'left-double-quote'                 : '“',
+		'right-double-quote'                : '”',
+		'left-single-quote'                 : '‘',
+		'right-single-quote_and_apostrophe' : '’',
+		'en-dash'                           : '–',
+		'em-dash'                           : '—',
+		'ellipsis'                          : '…'
+	}
+
+	# Default configuration for external SmartyPants tool.
+	cfg.current_section = 'External SmartyPants'
+	cfg.current_dictionary = {
+		"command_line": "",
+		"timeout": "30",
+		"persistent": "No",
+		"framing": "nul"
+	}
+
+	# Read configuration file.
+	files = cfg.read_files(config_file)
+
+	# If no configuration file exists, create one with default values.
+	if write and not files:
+		cfg.write_file(config_file)
+
+	return cfg
+
+# The configuration shared by all windows, and the modification time and size
+# of the configuration file it was read from.
+_shared_configuration = (None, None, None)
+
+def shared_configuration(config_file = CONFIG_FILE, write = False):
+
+	"""
+		Returns the configuration as `configurate()` does, but only reads the
+		configuration file again if it has changed. The returned object is
+		shared, and must not be modified.
+	"""
+
+	global _shared_configuration
+	state = _file_state(config_file)
+	cfg, file, previous_state = _shared_configuration
+
+	# A configuration read when there was no file is read again when the
+	# file is to be written, so that it is.
+	if cfg is None or file != config_file or state != previous_state or (write and state is None):
+		cfg = configurate(config_file, write)
+		_shared_configuration = (cfg, config_file, _file_state(config_file) if write else state)
+	return cfg
+
+def _file_state(path):
+
+	# Returns the modification time and size of the file, or `None` if there
+	# is no file.
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return None
+	return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CoProcess – a long-running external tool that converts one document after
+another, so that the cost of starting the tool is only paid once.
+
+Documents and results are exchanged as framed messages over the tool's stdin
+and stdout. Two framings are supported:
+
+* `nul`: the UTF-8 encoded text followed by a NUL byte.
+* `length`: the length of the UTF-8 encoded text in bytes as a decimal
+  number, a newline, and the text itself.
+
+A tool that crashes or doesn't answer in time is killed and started again on
+the next conversion.
+
+Any program speaking the protocol can be used. `serve()` implements the tool
+side of it, and running this module as a script starts a tool that returns
+every document unchanged:
+
+	python3 coprocess.py [nul|length]
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os, selectors, shlex, signal, sys
+
+from subprocess import Popen, PIPE, DEVNULL, TimeoutExpired
+from threading import Lock
+from time import monotonic
+
+FRAMINGS = ('nul', 'length')
+"""Supported framings of messages."""
+
+class CoProcessError(Exception):
+	"""The tool exited or broke the protocol."""
+
+def encode(text, framing):
+
+	# A NUL ends a message in the NUL framing, so it is dropped from the text.
+	# The length framing passes the text unchanged.
+	if framing == 'nul':
+		return text.replace('\0', '').encode('utf-8') + b'\0'
+	data = text.encode('utf-8')
+	return str(len(data)).encode('ascii') + b'\n' + data
+
+def decode(buffer, framing):
+
+	"""
+		Returns the text of the first complete message in the buffer and the
+		number of bytes it occupies, or `None` if no message is complete yet.
+	"""
+
+	if framing == 'nul':
+		end = buffer.find(b'\0')
+		if end < 0:
+			return None
+		return bytes(buffer[:end]).decode('utf-8'), end + 1
+
+	newline = buffer.find(b'\n')
+	if newline < 0:
+		return None
+	try:
+		length = int(buffer[:newline])
+	except ValueError:
+		raise CoProcessError("Malformed message header: {0!r}".format(bytes(buffer[:newline])))
+	end = newline + 1 + length
+	if len(buffer) < end:
+		return None
+	return bytes(buffer[newline + 1:end]).decode('utf-8'), end
+
+class CoProcess:
+
+	"""
+		Converts text with a long-running external tool.
+	"""
+
+	def __init__(self, command_line, timeout = 30, framing = 'nul'):
+
+		if framing not in FRAMINGS:
+			raise ValueError("Unknown framing: {0}".format(framing))
+
+		self.command_line = command_line
+		"""Command line starting the tool."""
+
+		self.timeout = timeout
+		"""Seconds to wait for the result of a conversion."""
+
+		self.framing = framing
+		"""Framing of messages; one of `FRAMINGS`."""
+
+		# The running tool, if any.
+		self._process = None
+
+		# Conversions may be requested from more than one thread.
+		self._lock = Lock()
+
+	def convert(self, text):
+
+		"""
+			Sends the text to the tool and returns the result. Raises `OSError`
+			if the tool can't be started, `TimeoutExpired` if it doesn't answer
+			in time and `CoProcessError` if it exits or breaks the protocol.
+		"""
+
+		with self._lock:
+
+			# A tool that has been running for a while may have died while
+			# idle, so one retry with a fresh process is allowed.
+			while True:
+				is_fresh = self._process is None or self._process.poll() is not None
+				if is_fresh:
+					self._start()
+				try:
+					return self._exchange(text)
+				except (CoProcessError, BrokenPipeError):
+					self._kill()
+					if is_fresh:
+						raise
+				except:
+					self._kill()
+					raise
+
+	def stop(self):
+
+		"""
+			Stops the tool. It is started again by the next conversion.
+		"""
+
+		with self._lock:
+			if self._process is None:
+				return
+
+			# Closing stdin asks the tool to exit.
+			try:
+				self._process.stdin.close()
+				self._process.wait(1)
+			except (OSError, TimeoutExpired):
+				pass
+			self._kill()
+
+	def _start(self):
+		self._kill()
+		self._process = Popen(shlex.split(self.command_line), stdin = PIPE, stdout = PIPE, stderr = DEVNULL, bufsize = 0, start_new_session = True)
+		os.set_blocking(self._process.stdin.fileno(), False)
+
+	def _kill(self):
+		if self._process is None:
+			return
+
+		# Kill the whole process group, in case the tool has children.
+		if self._process.poll() is None:
+			try:
+				os.killpg(self._process.pid, signal.SIGKILL)
+			except OSError:
+				pass
+			self._process.wait()
+		self._process.stdin.close()
+		self._process.stdout.close()
+		self._process = None
+
+	def _exchange(self, text):
+
+		process = self._process
+		request = memoryview(encode(text, self.framing))
+		response = bytearray()
+		deadline = monotonic() + self.timeout
+
+		# Write the request and read the response at the same time, so that a
+		# tool which answers before it has read everything can't deadlock.
+		with selectors.DefaultSelector() as selector:
+			selector.register(process.stdin, selectors.EVENT_WRITE)
+			selector.register(process.stdout, selectors.EVENT_READ)
+
+			while True:
+				remaining = deadline - monotonic()
+				if remaining <= 0:
+					raise TimeoutExpired(self.command_line, self.timeout)
+
+				for key, events in selector.select(remaining):
+
+					if key.fileobj is process.stdin:
+						try:
+							written = os.write(process.stdin.fileno(), request[:65536])
+						except BlockingIOError:
+							continue
+						request = request[written:]
+						if not request:
+							selector.unregister(process.stdin)
+
+					else:
+						data = os.read(process.stdout.fileno(), 65536)
+						if not data:
+							raise CoProcessError("{0} exited with code {1}".format(self.command_line, process.wait()))
+						response += data
+						message = decode(response, self.framing)
+						if message is not None:
+							result, length = message
+							if length != len(response):
+								raise CoProcessError("{0} sent more than one message".format(self.command_line))
+
+							# The rest of the request would be taken for the
+							# beginning of the next one.
+							if request:
+								raise CoProcessError("{0} answered before it had read the whole message".format(self.command_line))
+							return result
+
+def serve(convert, framing = 'nul', input = None, output = None):
+
+	"""
+		Implements the tool side of the protocol: reads messages from `input`,
+		converts them with `convert(text)` and writes the results to `output`
+		until `input` is closed.
+	"""
+
+	input = sys.stdin.buffer if input is None else input
+	output = sys.stdout.buffer if output is None else output
+	buffer = bytearray()
+
+	while True:
+		message = decode(buffer, framing)
+		if message is None:
+			data = input.read1(65536)
+			if not data:
+				return
+			buffer += data
+			continue
+		text, length = message
+		del buffer[:length]
+		output.write(encode(convert(text), framing))
+		output.flush()
+
+if __name__ == '__main__':
+	serve(lambda text: text, sys.argv[1] if len(sys.argv) > 1 else 'nul')
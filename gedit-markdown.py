@@ -41,14 +41,77 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-import os, shlex, webbrowser
-
-from importlib import import_module
-from gettext import lgettext as _
-from gi.repository import GObject, Gtk, Gedit, WebKit
-from subprocess import Popen, PIPE, TimeoutExpired
-from simpleconfig import SimpleConfig
-from xdg.BaseDirectory import xdg_config_home
+import json, os
+
+from threading import Lock
+from time import monotonic
+
+from gettext import gettext, lgettext as _
+from gi.repository import Gio, GLib, GObject, Gtk, Gedit
+
+def _import_preview():
+
+	# The modules of the preview are imported when it is first shown, since
+	# they, and WebKit in particular, would otherwise slow down the start of
+	# gedit for a plugin that may not be used.
+	global WebKit, BaseDirectory, assets, blocks, configuration, lazy, memo, outline, patcher, pipeline, previews, profiler, rendercache, sourcemap, timings, worker
+	from gi.repository import WebKit
+	from xdg import BaseDirectory
+	import assets, blocks, configuration, lazy, memo, outline, patcher, pipeline, previews, profiler, rendercache, sourcemap, timings, worker
+
+# Rendered HTML shared by all windows. Created by the first window.
+_render_cache = None
+
+# Local files shown in the previews of all windows. Created by the first window.
+_asset_cache = None
+
+# Released web views shared by all windows, which are reused rather than
+# creating new ones.
+_view_pool = []
+
+# Number of windows in which the plugin is set up. The pooled web views are
+# destroyed when the last of them is torn down.
+_set_up_windows = 0
+
+CHUNK_SIZE = 64 * 1024
+"""Approximate number of characters of the document in each chunk passed to
+the pipeline. Chunks end at line ends."""
+
+MAX_HEADINGS = 1000
+"""Maximum number of headings in the heading navigator."""
+
+BUSY_DELAY = 250
+"""Milliseconds a render may take before the preview shows that it is being
+rendered."""
+
+STOP_TIMEOUT = 1
+"""Seconds to wait for a running render when the plugin is deactivated. A
+render that takes longer is left to finish on its own."""
+
+BUSY_SCRIPT = """
+(function () {
+	var badge = document.getElementById('gedit-markdown-busy');
+	if (badge === null) {
+		badge = document.createElement('div');
+		badge.id = 'gedit-markdown-busy';
+		badge.style.cssText = 'position: fixed; top: 0; right: 0; z-index: 2147483647; padding: 0.2em 0.6em; background: #ffc; color: #000; border: 1px solid #cc9; font: 12px sans-serif;';
+		document.documentElement.appendChild(badge);
+	}
+	badge.textContent = %s;
+})();
+"""
+"""JavaScript showing that the preview is being rendered. The label is filled
+in with the % operator."""
+
+IDLE_SCRIPT = """
+(function () {
+	var badge = document.getElementById('gedit-markdown-busy');
+	if (badge !== null) {
+		badge.parentNode.removeChild(badge);
+	}
+})();
+"""
+"""JavaScript removing what BUSY_SCRIPT shows."""
 
 class GeditMarkdownWindowActivatable(GObject.Object, Gedit.WindowActivatable):
 
@@ -60,90 +123,272 @@ class GeditMarkdownWindowActivatable(GObject.Object, Gedit.WindowActivatable):
 
 		GObject.Object.__init__(self)
 
-		# Configurate the plugin.
-		self._configurate(True)
+		# The plugin is set up by _set_up() when the preview is first shown,
+		# and until then it only adds itself to the menu. The pending idle
+		# callback of the activation, if any, and the pipeline it prewarmed.
+		self._is_set_up = False
+		self._action_group = None
+		self._preview_window = None
+		self._preview = None
+		self._idle_id = None
+		self._prewarmed_pipeline = None
 
-		# Dynamically assign which Markdown and SmartyPants methods to use.
-		self._cfg.current_section = 'General'
-		self._markdown = self._markdown_external if self._cfg['use_external_markdown'] else self._markdown_internal
-		self._smartypants = self._smartypants_external if self._cfg['use_external_smartypants'] else self._smartypants_internal
+	def _set_up(self):
 
-		# Lazy initialization of internal Markdown and SmartyPants
-		# implementation.
-		self._markdown_internal_object = None
-		self._smartypants_internal_object = None
+		# Import the modules of the preview and configurate the plugin.
+		_import_preview()
+		self._is_set_up = True
+		global _set_up_windows
+		_set_up_windows += 1
+		self._configurate(True)
 
-		# Lazy initialization of the preview window.
-		self._preview_window = None
+		# Scroll synchronization scrolls the preview to the block with the
+		# cursor, and the document to the block at the top of the preview. It
+		# needs the whole document on one page, so lazy preview excludes it.
+		self._is_scroll_sync = self._general['scroll_sync'] and not self._general['lazy_preview']
+
+		# The Markdown and SmartyPants conversion. The prewarmed pipeline holds
+		# the loaded engines, and is used if the configuration is unchanged.
+		self._pipeline = pipeline.Pipeline(self._cfg, source_lines = self._is_scroll_sync)
+		if self._prewarmed_pipeline is not None and not self._pipeline.changed_sections(self._prewarmed_pipeline):
+			self._pipeline = self._prewarmed_pipeline
+		self._prewarmed_pipeline = None
+
+		# A pipeline for a reloaded configuration, waiting to be picked up by
+		# the worker thread, which is the only one switching pipelines.
+		self._next_pipeline = None
+		self._next_pipeline_lock = Lock()
+
+		# The MIME type the preview was last loaded with.
+		self._mime = "text/html"
+
+		# Live preview re-renders the preview when the active document changes.
+		self._is_live = self._general['live_preview']
+		self._live_delay = int(self._general['live_preview_delay'])
+
+		# With patching, the blocks are loaded into the preview once and then
+		# only changed blocks are replaced. Holds the ids of the blocks in the
+		# preview, or None if the preview wasn't loaded by patching.
+		self._is_patch_preview = self._general['patch_preview']
+		self._page_ids = None
+
+		# The block cache and patching depend on the pipeline.
+		self._use_pipeline(self._pipeline)
+
+		# The document whose changes are watched, the handler of its changed
+		# signal and the pending debounce timeout.
+		self._live_document = None
+		self._live_handler_id = None
+		self._live_timeout_id = None
+
+		# Markdown and SmartyPants are converted on a background thread. A
+		# newer job cancels the running one, killing its external commands.
+		self._worker = worker.RenderWorker(self._convert, self.on_render_done)
+
+		# The timeout showing that the preview is being rendered, and whether
+		# it is shown.
+		self._busy_timeout_id = None
+		self._is_busy_shown = False
+
+		# Lazy preview renders the sections around the cursor first, and the
+		# other sections when the preview is scrolled near them. They are
+		# rendered by a worker of their own, so they don't cancel the page.
+		self._is_lazy = self._general['lazy_preview']
+		self._lazy_section_lines = int(self._general['lazy_preview_section_lines'])
+		self._lazy_document = None
+		self._lazy_requested = set()
+		self._section_worker = worker.RenderWorker(self._convert_sections, self.on_sections_done) if self._is_lazy else None
+
+		# The sorted first lines of the blocks in the preview, the document
+		# the preview shows and the line the shown text starts at, the
+		# document whose cursor is followed and the handler of its cursor
+		# movements, and the line the preview was last scrolled to.
+		self._line_index = []
+		self._preview_document = None
+		self._preview_first_line = 0
+		self._cursor_document = None
+		self._cursor_handler_id = None
+		self._synced_line = None
+
+		# Rendered HTML is cached by the text and the configuration of the
+		# pipeline that rendered it.
+		global _render_cache
+		if _render_cache is None:
+			directory = os.path.join(BaseDirectory.xdg_cache_home, "gedit-markdown") if self._general['render_cache_on_disk'] else None
+			_render_cache = rendercache.RenderCache(int(self._general['render_cache_size'] * 1024 * 1024), directory)
+
+		# Images next to the documents are kept in memory.
+		global _asset_cache
+		if _asset_cache is None:
+			_asset_cache = assets.AssetCache(int(self._general['asset_cache_size'] * 1024 * 1024))
+
+		# Timings of the most recent renders, and optionally a log of all.
+		self._timings = timings.Timings()
+		self._timing_log = timings.TimingLog() if self._general['timing_log'] else None
+
+		# The internal engines may profile their components. The next render
+		# may be profiled with cProfile, when asked for from the popup menu.
+		self._is_profiled = self._general['profile_extensions']
+		self._is_profiling_render = False
+
+		# The web view is released when the preview has been hidden for the
+		# configured number of seconds, and created again, with the last
+		# loaded result and scroll position, when it is shown. Holds the
+		# arguments of the last _load(), the scroll position of the released
+		# view and the pending release timeout.
+		self._release_delay = int(self._general['preview_release_delay'])
+		self._view_pool_size = int(self._general['preview_pool_size'])
+		self._view_handler_ids = []
+		self._last_load = None
+		self._released_scroll = None
+		self._release_timeout_id = None
+
+		# The heading navigator lists the headings of the active document
+		# from an outline, which is kept up to date edit by edit. Holds the
+		# document, the handlers of its edits and the first line and number
+		# of lines of the range being deleted.
+		self._is_outlined = self._general['heading_navigator']
+		self._outline = None
+		self._outline_document = None
+		self._outline_handler_ids = []
+		self._outline_deleting = None
+
+		# The render state of recently previewed documents, so that switching
+		# back to an unchanged document doesn't convert it again. Holds the
+		# state and its number of changes for the render in progress, and the
+		# scroll position to restore when the preview has been loaded.
+		self._states = previews.PreviewStates(int(self._general['document_previews']))
+		self._rendering = None
+		self._restore_scroll = None
+
+		# Reload the configuration when the configuration file changes.
+		self._config_monitor = Gio.File.new_for_path(configuration.CONFIG_FILE).monitor_file(Gio.FileMonitorFlags.NONE, None)
+		self._config_monitor.connect("changed", self.on_config_file_changed)
+		self._tab_changed_handler_id = self.window.connect("active-tab-changed", self.on_active_tab_changed)
+		self._tab_removed_handler_id = self.window.connect("tab-removed", self.on_tab_removed)
+		if self._is_live:
+			self._watch_document(self.window.get_active_document())
+		if self._is_scroll_sync:
+			self._watch_cursor(self.window.get_active_document())
+		if self._is_outlined:
+			self._watch_outline(self.window.get_active_document())
+
+	def _use_pipeline(self, pipeline):
+
+		# Internal Markdown is converted block by block by live preview, and
+		# only blocks that have changed since the last rendering are converted
+		# again. External tools are run once for the whole text, and their
+		# result can't be patched block by block.
+		self._pipeline = pipeline
+		self._block_cache = blocks.BlockCache(pipeline.render) if self._is_live and not pipeline.is_external else None
+		self._is_patching = self._block_cache is not None and self._is_patch_preview
 
 	def _configurate(self, write = False):
-
-		# Create a configuration object and its only section
-		self._cfg = SimpleConfig()
-
-		# Default configuration for the application.
-		self._cfg.current_section = 'General'
-		self._cfg.current_dictionary = {
-			"show_hide_accelerator_key": "<Ctrl><Alt>m",
-			"use_external_markdown" : "No",
-			"use_external_smartypants" : "No",
-			"use_bottom_panel" : "No"
-		}
-
-		# Default configuration for internal Markdown library.
-		self._cfg.current_section = 'Internal Markdown'
-		self._cfg.current_dictionary = {
-			"output_format": "html5",
-			"lazy_ol": "False",
-			"extensions": """
-					markdown.extensions.extra,
-					markdown.extensions.sane_lists
-			"""
-		}
-
-		# Default configuration for external Markdown tool.
-		self._cfg.current_section = 'External Markdown'
-		self._cfg.current_dictionary = {
-			"command_line": "",
-			"timeout": "30"
-		}
-
-		# Default configuration for internal SmartyPants library.
-		self._cfg.current_section = 'Internal SmartyPants'
-		self._cfg.current_dictionary = {
-			'left-double-quote'                 : '“',
-			'right-double-quote'                : '”',
-			'left-single-quote'                 : '‘',
-			'right-single-quote_and_apostrophe' : '’',
-			'en-dash'                           : '–',
-			'em-dash'                           : '—',
-			'ellipsis'                          : '…'
-		}
-
-		# Default configuration for external SmartyPants tool.
-		self._cfg.current_section = 'External SmartyPants'
-		self._cfg.current_dictionary = {
-			"command_line": "",
-			"timeout": "30"
-		}
-
-		# Read configuration file.
-		config_file = os.path.join(xdg_config_home, "gedit", "gedit-markdown")
-		files = self._cfg.read_files(config_file)
-
-		# If no configuration file exists, create one with default values.
-		if not files:
-			self._cfg.write_file(config_file)
+		# All windows share the configuration, which is only read again when
+		# the file has changed. It is read without importing the pipeline.
+		from configuration import CONFIG_FILE, shared_configuration
+		self._cfg = shared_configuration(CONFIG_FILE, write)
+		self._general = self._cfg.snapshot()['General']
 
 	def do_activate(self):
+
+		# The menu needs the accelerator from the configuration, so it is
+		# added when gedit is idle, after the window has been shown.
+		self._idle_id = GLib.idle_add(self.on_activate_idle)
+
+	def on_activate_idle(self):
+		self._idle_id = None
+		self._configurate(True)
 		self._add_to_menu()
+		self.do_update_state()
+
+		# Optionally load the internal Markdown and SmartyPants ahead of the
+		# first preview, when nothing else is going on.
+		if self._general['prewarm_engines']:
+			self._idle_id = GLib.idle_add(self.on_prewarm_idle, priority = GLib.PRIORITY_LOW)
+		return False
+
+	def on_prewarm_idle(self):
+
+		# The pipeline is kept for the preview, since the engines are dropped
+		# when no pipeline refers to them. External tools aren't started until
+		# they are needed.
+		self._idle_id = None
+		from pipeline import Pipeline
+		pipeline = Pipeline(self._cfg, source_lines = self._general['scroll_sync'] and not self._general['lazy_preview'])
+		if not pipeline.is_external:
+			pipeline.render('')
+			self._prewarmed_pipeline = pipeline
+		return False
 
 	def do_deactivate(self):
-		self._remove_from_menu()
-		self._remove_preview();
+		if self._idle_id is not None:
+			GLib.source_remove(self._idle_id)
+			self._idle_id = None
+		if self._is_set_up:
+			self._tear_down()
+		if self._action_group is not None:
+			self._remove_from_menu()
+		self._remove_preview()
+
+	def _tear_down(self):
+		self._config_monitor.cancel()
+		self._worker.stop(STOP_TIMEOUT)
+		if self._busy_timeout_id is not None:
+			GLib.source_remove(self._busy_timeout_id)
+			self._busy_timeout_id = None
+		if self._section_worker is not None:
+			self._section_worker.stop(STOP_TIMEOUT)
+		self._pipeline.stop()
+		if self._next_pipeline is not None:
+			self._next_pipeline.stop()
+		self.window.disconnect(self._tab_changed_handler_id)
+		self.window.disconnect(self._tab_removed_handler_id)
+		for doc, state in self._states.clear():
+			doc.disconnect(state.handler_id)
+		self._preview_document = None
+		if self._is_live:
+			self._watch_document(None)
+		if self._is_scroll_sync:
+			self._watch_cursor(None)
+		if self._is_outlined:
+			self._watch_outline(None)
+		if self._release_timeout_id is not None:
+			GLib.source_remove(self._release_timeout_id)
+			self._release_timeout_id = None
+		if self._preview is not None:
+			self._release_view()
+
+		# No window is left to reuse the pooled web views.
+		global _set_up_windows
+		_set_up_windows -= 1
+		if _set_up_windows == 0:
+			while _view_pool:
+				_view_pool.pop().destroy()
+
+	def on_config_file_changed(self, monitor, file, other_file, event_type):
+		if event_type in (Gio.FileMonitorEvent.CHANGES_DONE_HINT, Gio.FileMonitorEvent.CREATED, Gio.FileMonitorEvent.DELETED):
+			self._reload_configuration()
+
+	def _reload_configuration(self):
+
+		# Build a new pipeline, which takes over the engines of the old one
+		# whose configuration is unchanged. The worker picks it up with the
+		# next job. Settings of the user interface take effect on restart.
+		self._configurate()
+		with self._next_pipeline_lock:
+			current = self._next_pipeline or self._pipeline
+			next_pipeline = pipeline.Pipeline(self._cfg, current, self._is_scroll_sync)
+			if not next_pipeline.changed_sections(current):
+				return
+			self._next_pipeline = next_pipeline
+
+		if self._is_preview_visible():
+			self._show_preview(self._mime)
 
 	def do_update_state(self):
-		self._action_group.set_sensitive(self.window.get_active_document() is not None)
+		if self._action_group is not None:
+			self._action_group.set_sensitive(self.window.get_active_document() is not None)
 
 	def _add_to_menu(self):
 
@@ -155,13 +400,12 @@ class GeditMarkdownWindowActivatable(GObject.Object, Gedit.WindowActivatable):
 		manager.insert_action_group(self._action_group, -1)
 
 		# Add preview action to Gedit Markdown's action group.
-		self._cfg.current_section = 'General'
 		self._action_group.add_actions([
 			(
 				"geditmarkdown_show_hide",
 				None,
 				_("Show/hide Markdown preview"),
-				self._cfg['show_hide_accelerator_key'],
+				self._general['show_hide_accelerator_key'],
 				_("Toggles the markdown preview on/off."),
 				self.on_markdown_preview_activate
 			)
@@ -199,28 +443,224 @@ class GeditMarkdownWindowActivatable(GObject.Object, Gedit.WindowActivatable):
 		if self._preview_window is not None:
 			self._panel.remove_item(self._preview_window)
 
+	def _is_preview_visible(self):
+		return self._preview is not None and self._panel.is_visible() and self._panel.item_is_active(self._preview_window)
+
+	def _watch_document(self, doc):
+
+		# Stop watching the previous document.
+		if self._live_document is not None:
+			self._live_document.disconnect(self._live_handler_id)
+			self._live_document = None
+		if self._live_timeout_id is not None:
+			GLib.source_remove(self._live_timeout_id)
+			self._live_timeout_id = None
+
+		# Blocks of another document are of no use. The worker thread may
+		# replace the block cache meanwhile.
+		block_cache = self._block_cache
+		if block_cache is not None:
+			block_cache.clear()
+
+		if doc is not None:
+			self._live_document = doc
+			self._live_handler_id = doc.connect("changed", self.on_document_changed)
+
+	def on_active_tab_changed(self, window, tab):
+
+		# Remember how far the preview of the previous document was scrolled.
+		if self._preview_document is not None and self._preview_first_line == 0 and self._preview is not None:
+			state = self._states.get(self._preview_document)
+			if state is not None:
+				state.scroll = self._preview_window.get_vadjustment().get_value()
+
+		doc = tab.get_document()
+		if self._is_scroll_sync:
+			self._watch_cursor(doc)
+		if self._is_live:
+			self._watch_document(doc)
+		if self._is_outlined:
+			self._watch_outline(doc)
+
+		# Restore the preview of the document, or render it if it is live.
+		if self._is_preview_visible() and not self._restore_preview(doc) and self._is_live:
+			self._show_preview(self._mime)
+
+	def on_tab_removed(self, window, tab):
+
+		# The state of a closed document is of no use.
+		doc = tab.get_document()
+		state = self._states.pop(doc)
+		if state is not None:
+			doc.disconnect(state.handler_id)
+		if doc is self._preview_document:
+			self._preview_document = None
+		if doc is self._outline_document:
+			self._watch_outline(None)
+
+	def _state(self, doc):
+
+		# Returns the state of the document, which is created if there is
+		# none. The changes of the document are counted from then on.
+		state = self._states.get(doc)
+		if state is None:
+			state = previews.PreviewState()
+			state.handler_id = doc.connect("changed", self.on_state_document_changed, state)
+			for dropped_doc, dropped_state in self._states.add(doc, state):
+				dropped_doc.disconnect(dropped_state.handler_id)
+		return state
+
+	def on_state_document_changed(self, doc, state):
+		state.changes += 1
+
+	def _restore_preview(self, doc):
+
+		# Loads the last result of the document, if it still reflects the
+		# document and the configuration. Returns whether it did.
+		state = self._states.get(doc)
+		pipeline = self._next_pipeline or self._pipeline
+		if state is None or not state.is_current or state.mime != self._mime or state.fingerprint != pipeline.fingerprint():
+			return False
+
+		# A render in progress is of another document.
+		self._worker.cancel()
+		self._rendering = None
+		self._hide_busy()
+
+		self._preview_document = doc
+		self._preview_first_line = 0
+		self._load(state.result, state.mime)
+
+		# A patched page isn't loaded again, so it can be scrolled at once.
+		if self._preview.get_load_status() == WebKit.LoadStatus.FINISHED:
+			self._preview_window.get_vadjustment().set_value(state.scroll)
+		else:
+			self._restore_scroll = state.scroll
+		return True
+
+	def _watch_cursor(self, doc):
+		if self._cursor_document is not None:
+			self._cursor_document.disconnect(self._cursor_handler_id)
+			self._cursor_document = None
+		if doc is not None:
+			self._cursor_document = doc
+			self._cursor_handler_id = doc.connect("notify::cursor-position", self.on_cursor_moved)
+
+	def on_cursor_moved(self, doc, pspec):
+		self._sync_preview()
+
+	def _watch_outline(self, doc):
+
+		# The outline of another document is of no use. The outline of the
+		# document is built when it is first used.
+		if self._outline_document is not None:
+			for handler_id in self._outline_handler_ids:
+				self._outline_document.disconnect(handler_id)
+			self._outline_document = None
+			self._outline = None
+		if doc is not None:
+			self._outline_document = doc
+			self._outline = outline.Outline(lambda line: self._get_line(doc, line), doc.get_line_count)
+			self._outline_handler_ids = [
+				doc.connect_after("insert-text", self.on_outline_text_inserted),
+				doc.connect("delete-range", self.on_outline_range_deleting),
+				doc.connect_after("delete-range", self.on_outline_range_deleted)
+			]
+
+	def _get_line(self, doc, line):
+		start = doc.get_iter_at_line(line)
+		end = start.copy()
+		if not end.ends_line():
+			end.forward_to_line_end()
+		return doc.get_text(start, end, True)
+
+	def on_outline_text_inserted(self, doc, location, text, length):
+
+		# The location has been moved to the end of the inserted text. The
+		# line it was inserted in is replaced by as many lines as it has.
+		line_ends = text.count('\n')
+		self._outline.edit(location.get_line() - line_ends, 1, line_ends + 1)
+
+	def on_outline_range_deleting(self, doc, start, end):
+		self._outline_deleting = (start.get_line(), end.get_line() - start.get_line() + 1)
+
+	def on_outline_range_deleted(self, doc, start, end):
+
+		# The deleted lines are replaced by the one line where they met.
+		first, old_count = self._outline_deleting
+		self._outline.edit(first, old_count, 1)
+
+	def _go_to_heading(self, heading, anchor):
+
+		# Move the cursor to the heading. With scroll synchronization, the
+		# preview follows the cursor, and otherwise it is scrolled to the id
+		# that the toc or attr_list extension gave the heading, if any.
+		doc = self._outline_document
+		view = self.window.get_active_view()
+		if view is None or view.get_buffer() is not doc:
+			return
+		doc.place_cursor(doc.get_iter_at_line(heading.line))
+		view.scroll_to_mark(doc.get_insert(), 0.0, True, 0.0, 0.0)
+		if not self._is_scroll_sync and anchor is not None and self._preview is not None and self._mime == "text/html" and doc is self._preview_document:
+			self._preview.execute_script("(function () { var node = document.getElementById(%s); if (node !== null) { node.scrollIntoView(); } })();" % json.dumps(anchor))
+
+	def _sync_preview(self):
+
+		# Scroll the preview to the block with the cursor, if the preview shows
+		# the active document as a web page and the block has changed.
+		doc = self._cursor_document
+		if doc is None or doc is not self._preview_document or self._mime != "text/html" or not self._is_preview_visible():
+			return
+		line = sourcemap.block_line(self._line_index, doc.get_iter_at_mark(doc.get_insert()).get_line() - self._preview_first_line)
+		if line is not None and line != self._synced_line:
+			self._synced_line = line
+			self._preview.execute_script('geditMarkdownScrollToLine({0});'.format(line))
+
+	def _sync_document(self, line):
+
+		# Scroll the document to the line at the top of the preview, without
+		# moving the cursor.
+		view = self.window.get_active_view()
+		if view is None or view.get_buffer() is not self._preview_document:
+			return
+		self._synced_line = line
+		view.scroll_to_iter(self._preview_document.get_iter_at_line(line + self._preview_first_line), 0.0, True, 0.0, 0.0)
+
+	def on_document_changed(self, doc):
+
+		# Restart the debounce timeout on every change, so the preview is
+		# rendered once the user pauses.
+		if self._live_timeout_id is not None:
+			GLib.source_remove(self._live_timeout_id)
+		self._live_timeout_id = GLib.timeout_add(self._live_delay, self.on_live_preview_timeout)
+
+	def on_live_preview_timeout(self):
+		self._live_timeout_id = None
+		if self._is_preview_visible():
+			self._show_preview(self._mime)
+		return False
+
 	# Menu activate handler
 	def on_markdown_preview_activate(self, action):
 
-		# Setup the preview on the first call.
+		# Set up the plugin and the preview on the first call.
+		if not self._is_set_up:
+			self._set_up()
 		if self._preview_window is None:
 
-			# Create an empty preview
-			self._preview = WebKit.WebView()
-			self._preview.connect("navigation-policy-decision-requested", self.on_navigation_policy_decision_requested)
-			self._preview.connect("populate-popup", self.on_populate_popup)
-
-			# Add the preview to a window
+			# Create a window for the preview, which follows whether it is
+			# shown, and an empty preview in it.
 			self._preview_window = Gtk.ScrolledWindow()
 			self._preview_window.set_property("hscrollbar-policy", Gtk.PolicyType.AUTOMATIC)
 			self._preview_window.set_property("vscrollbar-policy", Gtk.PolicyType.AUTOMATIC)
 			self._preview_window.set_property("shadow-type", Gtk.ShadowType.IN)
-			self._preview_window.add(self._preview)
+			self._preview_window.connect("map", self.on_preview_window_mapped)
+			self._preview_window.connect("unmap", self.on_preview_window_unmapped)
+			self._create_view()
 			self._preview_window.show_all()
 
 			# Get the panel
-			self._cfg.current_section = 'General'
-			self._panel = self.window.get_bottom_panel() if self._cfg['use_bottom_panel'] else self.window.get_side_panel()
+			self._panel = self.window.get_bottom_panel() if self._general['use_bottom_panel'] else self.window.get_side_panel()
 
 			# Add the window to te bottom panel
 			image = Gtk.Image()
@@ -228,35 +668,294 @@ class GeditMarkdownWindowActivatable(GObject.Object, Gedit.WindowActivatable):
 			self._panel.add_item(self._preview_window, "GeditMarkdown", _("Markdown Preview"), image)
 
 		# show/hide preview
-		if self._panel.is_visible() and self._panel.item_is_active(self._preview_window):
+		if self._is_preview_visible():
 			self._hide_preview()
 		else:
 			self._show_preview()
 
+	def _create_view(self):
+
+		# Take a web view from the pool, or create one, and add it to the
+		# preview window.
+		self._preview = _view_pool.pop() if _view_pool else WebKit.WebView()
+		self._view_handler_ids = [
+			self._preview.connect("navigation-policy-decision-requested", self.on_navigation_policy_decision_requested),
+			self._preview.connect("populate-popup", self.on_populate_popup),
+			self._preview.connect("notify::load-status", self.on_preview_load_status_changed),
+			self._preview.connect("resource-request-starting", self.on_resource_request_starting)
+		]
+		if self._is_lazy or self._is_scroll_sync:
+			self._view_handler_ids.append(self._preview.connect("notify::title", self.on_preview_title_changed))
+		self._preview_window.add(self._preview)
+		self._preview.show()
+
+	def _release_view(self):
+
+		# Remove the web view from the preview window, and put it in the pool
+		# with an empty page, or destroy it if the pool is full.
+		view = self._preview
+		self._preview = None
+		self._released_scroll = self._preview_window.get_vadjustment().get_value()
+		self._preview_window.remove(view)
+		for handler_id in self._view_handler_ids:
+			view.disconnect(handler_id)
+		self._view_handler_ids = []
+		if len(_view_pool) < self._view_pool_size:
+			view.load_string("", "text/html", "utf-8", "about:blank")
+			_view_pool.append(view)
+		else:
+			view.destroy()
+
+		# The page is gone, and so is what was shown or requested in it.
+		self._page_ids = None
+		self._is_busy_shown = False
+		self._lazy_requested = set()
+
+	def on_preview_window_unmapped(self, widget):
+		if self._preview is not None and self._release_delay > 0 and self._release_timeout_id is None:
+			self._release_timeout_id = GLib.timeout_add_seconds(self._release_delay, self.on_release_timeout)
+
+	def on_release_timeout(self):
+		self._release_timeout_id = None
+		if self._preview is not None and not self._preview_window.get_mapped():
+			self._release_view()
+		return False
+
+	def on_preview_window_mapped(self, widget):
+		if self._release_timeout_id is not None:
+			GLib.source_remove(self._release_timeout_id)
+			self._release_timeout_id = None
+
+		# Create the released web view again, with what it showed.
+		if self._preview is None:
+			self._create_view()
+			if self._last_load is not None:
+				self._restore_scroll = self._released_scroll
+				self._load(*self._last_load)
+
 	def _show_preview(self, mime = "text/html"):
 
+		self._mime = mime
+
 		# Get the selected text. If no text is selected, get all text.
 		view = self.window.get_active_view()
+		if view is None:
+			return
 		doc = view.get_buffer()
 		if doc.get_selection_bounds():
-			start = doc.get_iter_at_mark(doc.get_insert())
-			end = doc.get_iter_at_mark(doc.get_selection_bound())
+			start, end = doc.get_selection_bounds()
 		else:
 			start = doc.get_start_iter()
 			end = doc.get_end_iter()
-		text = doc.get_text(start, end, True)
+		self._preview_document = doc
+		self._preview_first_line = start.get_line()
+
+		# The result of a render of the whole document is kept in its state.
+		self._restore_scroll = None
+		if self._states.size > 0 and not doc.get_selection_bounds():
+			state = self._state(doc)
+			self._rendering = (state, state.changes)
+		else:
+			self._rendering = None
 
-		# Convert Markdown and SmartyPants to HTML
-		html = self._markdown(text)
-		html = self._smartypants(html)
+		started = monotonic()
+		chunks = self._get_chunks(doc, start, end)
+		record = {'get_text': monotonic() - started}
 
-		# Update the preview.
-		self._preview.load_string(html, mime, "utf-8", "file:///")
+		# A lazy preview of the whole document starts at the cursor.
+		if self._is_lazy and mime == "text/html" and not doc.get_selection_bounds():
+			cursor_line = doc.get_iter_at_mark(doc.get_insert()).get_line()
+		else:
+			cursor_line = None
+
+		# Convert Markdown and SmartyPants to HTML on the worker thread. The
+		# preview is updated by on_render_done().
+		self._worker.submit(chunks, mime, record, cursor_line)
+
+		# Show that the preview is being rendered, unless it is done soon.
+		if self._busy_timeout_id is None:
+			self._busy_timeout_id = GLib.timeout_add(BUSY_DELAY, self.on_busy_timeout)
 
 		# Make sure the preview is shown.
 		self._panel.activate_item(self._preview_window)
 		self._panel.show()
 
+	def on_busy_timeout(self):
+		self._busy_timeout_id = None
+		if self._worker.is_busy and self._preview is not None:
+			# The label goes into JavaScript, so it must be text, not bytes.
+			self._preview.execute_script(BUSY_SCRIPT % json.dumps(gettext("Rendering…")))
+			self._is_busy_shown = True
+		return False
+
+	def _get_chunks(self, doc, start, end):
+
+		# The text between the iterators as a list of line-aligned chunks, so
+		# that the pipeline can stream it without the whole text ever being
+		# one string.
+		chunks = []
+		chunk_start = start.copy()
+		while chunk_start.compare(end) < 0:
+			chunk_end = chunk_start.copy()
+			chunk_end.forward_chars(CHUNK_SIZE)
+			if not chunk_end.starts_line():
+				chunk_end.forward_line()
+			if chunk_end.compare(end) > 0:
+				chunk_end = end
+			chunks.append(doc.get_text(chunk_start, chunk_end, True))
+			chunk_start = chunk_end
+		return chunks
+
+	def on_render_done(self, html, mime, record, cursor_line):
+
+		started = monotonic()
+		self._hide_busy()
+
+		# Keep the result of a render of the whole document in its state.
+		if self._rendering is not None:
+			state, state.rendered_changes = self._rendering
+			state.result, state.mime, state.fingerprint = html, mime, self._pipeline.fingerprint()
+			self._rendering = None
+
+		record['output_bytes'] = self._load(html, mime)
+		self._record_timings(record, started)
+
+	def _hide_busy(self):
+
+		# Stop showing that the preview is being rendered. A page that is
+		# patched rather than reloaded would show it otherwise.
+		if self._busy_timeout_id is not None:
+			GLib.source_remove(self._busy_timeout_id)
+			self._busy_timeout_id = None
+		if self._is_busy_shown:
+			self._preview.execute_script(IDLE_SCRIPT)
+			self._is_busy_shown = False
+
+	def _load(self, html, mime):
+
+		# Loads the result of a render into the preview, and returns its size
+		# in bytes. A released preview loads it when it is created again.
+		self._last_load = (html, mime)
+		self._lazy_document = None
+
+		# Lazy preview gives the document and its first page.
+		if isinstance(html, tuple):
+			self._lazy_document, html = html
+			self._lazy_requested = set()
+
+		# Patching gives a list of blocks.
+		if isinstance(html, list):
+			size = sum(len(block_html.encode('utf-8')) for key, block_html, first_line in html)
+			if mime == "text/html":
+				self._line_index = [first_line for key, block_html, first_line in html]
+				if self._preview is not None:
+					self._patch_preview(html)
+					self._sync_preview()
+				return size
+			html = '\n'.join(block_html for key, block_html, first_line in html)
+		else:
+			size = len(html.encode('utf-8'))
+
+		# The lines are only of use in a web page.
+		if self._is_scroll_sync:
+			if mime == "text/html":
+				self._line_index = sourcemap.index(html)
+			else:
+				self._line_index = []
+				html = sourcemap.strip(html)
+
+		# Update the preview.
+		self._page_ids = None
+		if self._preview is not None:
+			self._preview.load_string(html, mime, "utf-8", self._base_uri())
+		return size
+
+	def _base_uri(self):
+
+		# Relative links and images are resolved from the directory of the
+		# shown document. A document that hasn't been saved has none.
+		location = self._preview_document.get_location() if self._preview_document is not None else None
+		directory = location.get_parent() if location is not None else None
+		if directory is None:
+			return "file:///"
+		uri = directory.get_uri()
+		return uri if uri.endswith('/') else uri + '/'
+
+	def on_resource_request_starting(self, view, frame, resource, request, response):
+
+		# Local images are given from the asset cache, rather than being read
+		# again on every refresh.
+		uri = request.get_uri()
+		if uri.startswith('file://'):
+			path = Gio.File.new_for_uri(uri).get_path()
+			data_uri = _asset_cache.data_uri(path) if path is not None else None
+			if data_uri is not None:
+				request.set_uri(data_uri)
+
+	def on_preview_load_status_changed(self, view, pspec):
+
+		# A loaded page gets the script of the scroll synchronization. It is
+		# scrolled to where it was when it is restored, and otherwise to the
+		# cursor. The page may not be laid out yet, so it is scrolled when
+		# the main loop is idle.
+		if view.get_load_status() != WebKit.LoadStatus.FINISHED:
+			return
+		if self._is_scroll_sync:
+			view.execute_script(sourcemap.SYNC_SCRIPT)
+			self._synced_line = None
+		if self._restore_scroll is not None:
+			GLib.idle_add(self._preview_window.get_vadjustment().set_value, self._restore_scroll)
+			self._restore_scroll = None
+		elif self._is_scroll_sync:
+			self._sync_preview()
+
+	def on_preview_title_changed(self, view, pspec):
+
+		# The page reports the line at its top when it has been scrolled.
+		line = sourcemap.parse_title(view.get_title())
+		if line is not None:
+			self._sync_document(line)
+			return
+
+		# The lazy page asks for sections by setting its title. Sections that
+		# have been asked for but not yet filled in are asked for again, since
+		# a newer job replaces an unfinished one.
+		indices = lazy.parse_title(view.get_title())
+		if indices and self._lazy_document is not None:
+			self._lazy_requested |= indices
+			self._section_worker.submit(frozenset(self._lazy_requested), self._lazy_document)
+
+	def _convert_sections(self, indices, document):
+		# Called on the worker thread of the sections.
+		return document.render_sections(indices)
+
+	def on_sections_done(self, sections, document):
+
+		# Sections of a page that has been replaced or released are of no use.
+		if document is not self._lazy_document or self._preview is None:
+			return
+		self._lazy_requested -= set(sections)
+		self._preview.execute_script(document.fill_script(sections))
+
+	def _record_timings(self, record, started):
+		record['load_string'] = monotonic() - started
+		record['total'] = sum(seconds for stage, seconds in record.items() if not stage.endswith('_bytes'))
+		self._timings.add(record)
+		if self._timing_log is not None:
+			self._timing_log.write(record)
+
+	def _patch_preview(self, blocks):
+
+		# Patch the page if it is loaded and hasn't been navigated away from,
+		# or loaded for another directory.
+		base_uri = self._base_uri()
+		if self._page_ids is not None and self._preview.get_load_status() == WebKit.LoadStatus.FINISHED and self._preview.get_uri() == base_uri:
+			script, self._page_ids = patcher.build_patch(blocks, self._page_ids)
+			self._preview.execute_script(script)
+		else:
+			page, self._page_ids = patcher.build_page(blocks)
+			self._preview.load_string(page, "text/html", "utf-8", base_uri)
+
 	def _hide_preview(self):
 		self._panel.hide()
 
@@ -264,6 +963,7 @@ class GeditMarkdownWindowActivatable(GObject.Object, Gedit.WindowActivatable):
 		uri = request.get_uri()
 		if navigation_action.get_reason().value_nick == "link-clicked" and (uri.startswith('http://') or uri.startswith('https://')):
 			policy_decision.ignore()
+			import webbrowser
 			webbrowser.open(uri)
 		else:			
 			policy_decision.use()
@@ -288,137 +988,134 @@ class GeditMarkdownWindowActivatable(GObject.Object, Gedit.WindowActivatable):
 		menu.append(item)
 		item.show()
 
-	def _markdown(self, text):
-		# This method is an alias for the one of _markdown_internal() and
-		# _markdown_external() selected in the constructor. Its body is never
-		# executed.
-		assert True
-
-	def _markdown_internal(self, text):
-
-		self._cfg.current_section = 'Internal Markdown'
-
-		if self._markdown_internal_object is None:
-
-			# Import Waylan Limberg's Python-Markdown module and its extension.
-			try:
-				import markdown
-			except ImportError:
-				return "<p>Error: Markdown implementation is missing.</p>"
-
-			# Build a list of extension objects.
-			extensions = self._cfg['extensions']
-			extensions = [ext.strip() for ext in extensions.split(',')]
-			extension_objects = []
-			for ext in extensions:
-				try:
-					obj = self._extension_factory(ext)
-				except (ImportError, AttributeError) as e:
-					return "<p>Error: " + e.args[0] + "</p>"
-				else:
-					extension_objects.append(obj)
-
-			self._markdown_internal_object = markdown.Markdown(
-				extensions = extension_objects,
-				output_format = self._cfg['output_format'],
-				lazy_ol = self._cfg['lazy_ol']
-			)
-
-		# Convert markdwon to HTML.
-		# Following line should work according to documentation, but the
-		# reset() doesn't do it. So therefore we don't use the obkect
-		# for current being.
-		return self._markdown_internal_object.reset().convert(text)
-
-	def _extension_factory(self, extension):
-
-		# Build a dictonary with the arguments.
-		arguments = {}
-		pos = extension.find('(')
-		if pos > 0:
-
-			# Get the arguments.
-			args = extension[pos+1:-1]
-			args = [arg.split('=') for arg in args.split(',')]
-			arguments.update((key.strip(), val.strip()) for (key, val) in args)
-
-			# Remove the arguments from the extension parameter.
-			extension = extension[:pos]
-
-		# Get class name (if provided): `path.to.module:ClassName`
-		module_name, class_name = extension.split(':', 1) if ':' in extension else (extension, '')
-
-		# Load the extension module.
-		try:
-			module = import_module(module_name)
-		except ImportError as e:
-			msg = _("Error: Failed loading extension {0} from {1}.").format(class_name, module_name)
-			e.args = (msg, ) + e.args[1:]
-			raise e
-
-		# Return the class.
+		# Add the timings of the latest render, and their 95th percentile, as
+		# a submenu.
+		lines = self._timings.summary()
+		if lines:
+			submenu = Gtk.Menu()
+			for line in lines:
+				line_item = Gtk.MenuItem(line)
+				line_item.set_sensitive(False)
+				submenu.append(line_item)
+			item = Gtk.MenuItem(_("Render timings"))
+			item.set_submenu(submenu)
+			menu.append(item)
+			item.show_all()
+
+		# Add the headings of the active document as a submenu, indented by
+		# their level, with the heading of the section with the cursor
+		# marked. A menu can't usefully hold every heading of a huge
+		# document, so the list is cut short.
+		if self._outline is not None:
+			headings = self._outline.headings()[:MAX_HEADINGS]
+			doc = self._outline_document
+			current = self._outline.heading_at(doc.get_iter_at_mark(doc.get_insert()).get_line())
+			ids = outline.anchors(headings) or [None] * len(headings)
+			submenu = Gtk.Menu()
+			for heading, anchor in zip(headings, ids):
+				label = "    " * (heading.level - 1) + heading.title
+				heading_item = Gtk.MenuItem(("▸ " if heading == current else "") + label)
+				heading_item.connect("activate", lambda x, heading = heading, anchor = anchor: self._go_to_heading(heading, anchor))
+				submenu.append(heading_item)
+			item = Gtk.MenuItem(_("Headings"))
+			item.set_submenu(submenu)
+			item.set_sensitive(bool(headings))
+			menu.append(item)
+			item.show_all()
+
+		# Add the profile of the components of the internal engines, the
+		# most expensive first, as a submenu, with the profiling actions.
+		if self._is_profiled:
+			submenu = Gtk.Menu()
+			for line in profiler.profile.report(20):
+				line_item = Gtk.MenuItem(line)
+				line_item.set_sensitive(False)
+				submenu.append(line_item)
+			if len(profiler.profile):
+				submenu.append(Gtk.SeparatorMenuItem())
+			# The file names go into the labels, so they must be text.
+			actions = [
+				(gettext("Save profile to {0}").format(profiler.REPORT_FILE), lambda x: self._save_profile()),
+				(gettext("Reset profile"), lambda x: profiler.profile.clear()),
+				(gettext("Profile next render with cProfile to {0}").format(profiler.STATS_FILE), lambda x: self._profile_render())
+			]
+			for label, callback in actions:
+				action_item = Gtk.MenuItem(label)
+				action_item.connect("activate", callback)
+				submenu.append(action_item)
+			item = Gtk.MenuItem(_("Extension profile"))
+			item.set_submenu(submenu)
+			menu.append(item)
+			item.show_all()
+
+	def _save_profile(self):
 		try:
-			if class_name:
-				# If class name was given, instantiate an object of the named class.
-				return getattr(module, class_name)(**arguments)
-			else:
-				# No class given. Let's hope the module has implemented the
-				# makeExtension method described in API documentation:
-				# https://pythonhosted.org/Markdown/extensions/api.html#makeextension
-				return module.makeExtension(**arguments)
-		except AttributeError as e:
-			msg = _("Error: Failed loading extension {0} from {1}.").format(class_name, module_name)
-			e.args = (msg, ) + e.args[1:]
-			raise e
-
-	def _markdown_external(self, text):
-		self._cfg.current_section = 'External Markdown'
-		return self._execute_command_line(text, self._cfg['command_line'], self._cfg['timeout'])
-
-	def _smartypants(self, html):
-		# This method is an alias for the one of _smartypants_internal() and
-		# _smartypants_external() selected in the constructor. Its body is
-		# never executed.
-		assert True
-
-	def _smartypants_internal(self, html):
-
-		self._cfg.current_section = 'Internal SmartyPants'
-
-		if self._smartypants_internal_object is None:
-
-			# Import Thomas Barregren's Smarty module.
-			try:
-				import smarty
-			except ImportError:
-				return "<p>" + _("Error: SmartyPants implementation is missing.") + "</p>"
-
-			# Initalize the internal SmartyPants library.
-			self._smartypants_internal_object = smarty.Smarty()
-			self._smartypants_internal_object.substitutions = self._cfg.current_dictionary
-
-		try:
-			return self._smartypants_internal_object.reset().feed(html).close()
-		except Exception as err:
-			return "<p>" + _("Error while calling internal SmartyPants library: {0}").format(err) + "</p>"
-
-	def _smartypants_external(self, html):
-		self._cfg.current_section = 'External SmartyPants'
-		return self._execute_command_line(text, self._cfg['command_line'], self._cfg['timeout'])
-
-	def _execute_command_line(self, text, command_line, timeout):
-		try:
-			args = shlex.split(command_line)
-			cmd = Popen(args, stdin = PIPE, stdout = PIPE, stderr = PIPE, universal_newlines = True)
-			text, error = cmd.communicate(text, timeout)
+			profiler.profile.write()
 		except OSError as err:
-			text = "<p>" + _("OS error: {0}").format(err) + "</p>"
-		except TimeoutExpired:
-			cmd.kill()
-			text = "<p>" + _("Timeout error: {0} has not returned after {1} seconds").format(command_line, timeout) + "</p>"
-		except Exception as err:
-			text = "<p>" + _("Unexpected error when calling {0}: {1}").format(command_line, err) + "</p>"
+			self._show_error(gettext("Error: Failed saving the profile to {0}: {1}").format(profiler.REPORT_FILE, err))
+
+	def _profile_render(self):
+		self._is_profiling_render = True
+		self._show_preview(self._mime)
+
+	def _show_error(self, message):
+		dialog = Gtk.MessageDialog(transient_for = self.window, modal = True, message_type = Gtk.MessageType.ERROR, buttons = Gtk.ButtonsType.CLOSE, text = message)
+		dialog.run()
+		dialog.destroy()
+		return False
+
+	def _convert(self, chunks, mime, record, cursor_line):
+
+		# Called on the worker thread. Switch to the pipeline of a reloaded
+		# configuration first. Blocks rendered by the old pipeline are of no
+		# use, and an external tool of the new one is run for the whole text.
+		with self._next_pipeline_lock:
+			if self._next_pipeline is not None:
+				self._use_pipeline(self._next_pipeline)
+				self._next_pipeline = None
+
+		# The time spent in each stage is recorded in the record.
+		pipeline = self._pipeline
+		pipeline.stage_times = {}
+		record['input_bytes'] = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+		try:
+			# A render profiled with cProfile converts the whole text, without
+			# the caches, so that it shows the cost of the pipeline. Failing
+			# to save the statistics is reported from the main loop.
+			if self._is_profiling_render:
+				self._is_profiling_render = False
+				with memo.memo.bypassed():
+					html, err = profiler.profile_call(lambda: ''.join(pipeline.render_chunks(chunks, self._worker.cancelled)))
+				if err is not None:
+					GLib.idle_add(self._show_error, gettext("Error: Failed saving the profile to {0}: {1}").format(profiler.STATS_FILE, err))
+				return html
+			if cursor_line is not None:
+				document = lazy.LazyDocument(''.join(chunks), pipeline.render, self._lazy_section_lines)
+				return document, document.page(cursor_line)
+			return self._convert_text(chunks, pipeline)
+		finally:
+			record.update(pipeline.stage_times)
+
+	def _convert_text(self, chunks, pipeline):
+
+		# Blocks are split from the whole text, but otherwise the chunks are
+		# streamed through the pipeline.
+		if self._is_patching:
+			return self._block_cache.render_blocks(''.join(chunks))
+
+		key = rendercache.make_key(chunks, pipeline.fingerprint())
+		html = _render_cache.get(key)
+		if html is not None:
+			return html
+
+		pipeline.has_error = False
+		if self._block_cache is not None:
+			blocks = self._block_cache.render_blocks(''.join(chunks))
+			html = '\n'.join(sourcemap.shift(block_html, first_line) for key, block_html, first_line in blocks)
 		else:
-			if error:
-				text = "<p>" + _("Error: {0} failed with following error message: \"{1}\"").format(command_line, error) + "</p>"
-		return text
+			html = ''.join(pipeline.render_chunks(chunks, self._worker.cancelled))
+
+		# Don't cache error messages.
+		if not pipeline.has_error:
+			_render_cache.put(key, html)
+		return html
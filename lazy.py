@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lazy – renders a large document section by section, as the preview is
+scrolled.
+
+The document is split into sections of whole top-level blocks. At first, only
+the section around the cursor and its neighbours are rendered. The other
+sections are represented by empty placeholders, with a height estimated from
+their number of lines. A script in the page reports the placeholders that come
+near the viewport by setting the page title, and the sections are filled in
+when they have been rendered. The time to first paint therefore depends on the
+size of a section, not on the size of the document.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import json
+
+from bisect import bisect_right
+from blocks import split_document
+
+TITLE_PREFIX = "gedit-markdown-fill:"
+"""Prefix of the page title when the page asks for sections."""
+
+LAZY_SCRIPT = """
+var geditMarkdownRequests = 0;
+var geditMarkdownTimeout = null;
+function geditMarkdownCheck() {
+	geditMarkdownTimeout = null;
+	var margin = window.innerHeight;
+	var nodes = document.getElementsByClassName('gedit-markdown-placeholder');
+	var wanted = [];
+	for (var i = 0; i < nodes.length; i++) {
+		var rect = nodes[i].getBoundingClientRect();
+		if (rect.bottom > -margin && rect.top < window.innerHeight + margin) {
+			wanted.push(nodes[i].id.substring(1));
+		}
+	}
+	if (wanted.length > 0) {
+		geditMarkdownRequests++;
+		document.title = '%s' + geditMarkdownRequests + ':' + wanted.join(',');
+	}
+}
+function geditMarkdownScheduleCheck() {
+	if (geditMarkdownTimeout === null) {
+		geditMarkdownTimeout = setTimeout(geditMarkdownCheck, 50);
+	}
+}
+function geditMarkdownFill(id, html) {
+	var node = document.getElementById(id);
+	if (node === null || node.className !== 'gedit-markdown-placeholder') {
+		return;
+	}
+	var rect = node.getBoundingClientRect();
+	node.className = 'gedit-markdown-section';
+	node.style.height = '';
+	node.innerHTML = html;
+	if (rect.bottom <= 0) {
+		window.scrollBy(0, node.getBoundingClientRect().height - rect.height);
+	}
+	geditMarkdownScheduleCheck();
+}
+window.addEventListener('scroll', geditMarkdownScheduleCheck);
+window.addEventListener('load', function () {
+	var current = document.getElementById('s%%d');
+	if (current !== null) {
+		current.scrollIntoView();
+	}
+	geditMarkdownCheck();
+});
+""" % TITLE_PREFIX
+"""JavaScript that requests and fills in sections. The id of the section to
+scroll to is filled in with the % operator."""
+
+def parse_title(title):
+
+	"""
+		Returns the set of section indices requested by a page title, or `None`
+		if the title isn't a request.
+	"""
+
+	if not title or not title.startswith(TITLE_PREFIX):
+		return None
+	counter, separator, indices = title[len(TITLE_PREFIX):].partition(':')
+	return {int(index) for index in indices.split(',') if index.isdigit()}
+
+class LazyDocument:
+
+	"""
+		A document split into sections that are rendered on demand.
+	"""
+
+	def __init__(self, text, convert, section_lines = 200):
+
+		self.convert = convert
+		"""Function converting Markdown text to HTML."""
+
+		# Definitions may be referred to from any section.
+		blocks, self._definitions, is_splittable = split_document(text)
+
+		# Footnotes and constructs left open need the whole document, so then
+		# there is one section.
+		if not is_splittable:
+			section_lines = float('inf')
+
+		# Group the blocks into sections of about the given number of lines.
+		# Each section is given as its first line, number of lines and text.
+		self._sections = []
+		first_line = 0
+		texts = []
+		for line, block in blocks:
+			if texts and line - first_line >= section_lines:
+				self._sections.append((first_line, line - first_line, '\n\n'.join(texts)))
+				texts = []
+			if not texts:
+				first_line = line
+			texts.append(block)
+		if texts:
+			self._sections.append((first_line, text.count('\n') + 1 - first_line, '\n\n'.join(texts)))
+
+		# First lines of the sections, for bisection.
+		self._first_lines = [section[0] for section in self._sections]
+
+	def __len__(self):
+		return len(self._sections)
+
+	def section_at(self, line):
+
+		"""
+			Returns the index of the section containing the line.
+		"""
+
+		return max(0, bisect_right(self._first_lines, line) - 1)
+
+	def render_section(self, index):
+		return self.convert(self._sections[index][2] + '\n\n' + self._definitions)
+
+	def render_sections(self, indices):
+
+		"""
+			Returns a dictionary with the HTML of the sections.
+		"""
+
+		return {index: self.render_section(index) for index in indices if 0 <= index < len(self._sections)}
+
+	def page(self, line):
+
+		"""
+			Returns a page where the section containing the line and its
+			neighbours are rendered and the other sections are placeholders.
+		"""
+
+		current = self.section_at(line)
+		body = []
+		for index, (first_line, lines, text) in enumerate(self._sections):
+			if abs(index - current) <= 1:
+				body.append('<div id="s{0}" class="gedit-markdown-section">{1}</div>\n'.format(index, self.render_section(index)))
+			else:
+				body.append('<div id="s{0}" class="gedit-markdown-placeholder" style="height: {1:.1f}em"></div>\n'.format(index, lines * 1.3))
+		return '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<script>{0}</script>\n</head>\n<body>{1}</body>\n</html>\n'.format(LAZY_SCRIPT % current, ''.join(body))
+
+	def fill_script(self, sections):
+
+		"""
+			Returns the JavaScript filling in rendered sections, given as a
+			dictionary such as `render_sections()` returns.
+		"""
+
+		return ''.join('geditMarkdownFill({0}, {1});'.format(json.dumps('s{0}'.format(index)), json.dumps(html)) for index, html in sorted(sections.items()))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LRU – a least recently used mapping bounded by the total size of its values.
+
+It holds the entries of the render cache, the asset cache and the memo of
+extension functions. It isn't thread-safe, so its users hold their own locks.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from collections import OrderedDict
+
+class SizedLRU:
+
+	"""
+		A least recently used mapping of keys to values, bounded by the total
+		size of the values. The size of each value is given when it is put.
+	"""
+
+	def __init__(self, max_size):
+
+		self.max_size = max_size
+		"""Maximum total size of the values. Use `resize()` to change it."""
+
+		# Values and their sizes, least recently used first.
+		self._entries = OrderedDict()
+		self._size = 0
+
+	def __len__(self):
+		return len(self._entries)
+
+	def __contains__(self, key):
+		return key in self._entries
+
+	@property
+	def size(self):
+		return self._size
+
+	def get(self, key, default = None):
+
+		"""
+			Returns the value of the key, or `default`, and marks it as the
+			most recently used.
+		"""
+
+		entry = self._entries.get(key)
+		if entry is None:
+			return default
+		self._entries.move_to_end(key)
+		return entry[0]
+
+	def put(self, key, value, size):
+
+		"""
+			Puts the value under the key, evicting the least recently used
+			values until it fits. A value larger than the maximum total size
+			isn't put, and any value the key had is dropped. Returns whether
+			the value was put.
+		"""
+
+		if key in self._entries:
+			self._size -= self._entries.pop(key)[1]
+		if size > self.max_size:
+			return False
+		self._entries[key] = (value, size)
+		self._size += size
+		self._evict()
+		return True
+
+	def resize(self, max_size):
+
+		"""
+			Changes the maximum total size, evicting values if needed.
+		"""
+
+		self.max_size = max_size
+		self._evict()
+
+	def clear(self):
+		self._entries.clear()
+		self._size = 0
+
+	def _evict(self):
+		while self._size > self.max_size:
+			self._size -= self._entries.popitem(last = False)[1][1]
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Memo – memoization of expensive functions of Markdown extensions, e.g. the
+syntax highlighting of code blocks by Pygments in `codehilite`.
+
+A function or method is replaced by a wrapper that caches its results, keyed
+by its arguments and, for a method, by the attributes of the instance, e.g. the
+code and the options of a `CodeHilite`. A block that hasn't changed since the
+previous render is therefore not highlighted again. The functions must return
+a result that only depends on what they are keyed by. The results of all
+functions are kept in one cache, which is shared by all engines, bounded by
+the total size of the results, and evicts the least recently used first.
+
+The pipelines using the cache ask for the functions to memoize and the size of
+the cache with `use()`, and give them back with `release()`. A function is
+restored when no pipeline uses it anymore, and the cache has the largest size
+asked for by the pipelines using it.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import sys
+
+from contextlib import contextmanager
+from functools import partial, wraps
+from hashlib import sha256
+from importlib import import_module
+from threading import Lock, RLock, local
+from lru import SizedLRU
+
+class Memo:
+
+	"""
+		A least recently used cache of results, bounded by their total size
+		in bytes.
+	"""
+
+	def __init__(self, max_size = 8 * 1024 * 1024):
+
+		# Cached results, sized in bytes.
+		self._entries = SizedLRU(max_size)
+
+		# The engines of several windows may be used at the same time.
+		self._lock = Lock()
+
+		# Whether the cache is bypassed, per thread.
+		self._local = local()
+
+		self.hits = 0
+		"""Number of results given from the cache."""
+
+		self.misses = 0
+		"""Number of results that had to be computed."""
+
+	def __len__(self):
+		return len(self._entries)
+
+	@property
+	def size(self):
+		return self._entries.size
+
+	@property
+	def max_size(self):
+
+		"""
+			Maximum total size in bytes of the cached results. Use `resize()`
+			to change it.
+		"""
+
+		return self._entries.max_size
+
+	def call(self, name, function, state, args, kwargs):
+
+		"""
+			Returns the result of the function called with the arguments,
+			cached under its name, the state of its instance and the arguments.
+		"""
+
+		if getattr(self._local, 'is_bypassed', False):
+			return function(*args, **kwargs)
+
+		key = sha256(repr((name, state, args, sorted(kwargs.items()))).encode('utf-8')).digest()
+		with self._lock:
+			if key in self._entries:
+				self.hits += 1
+				return self._entries.get(key)
+
+		result = function(*args, **kwargs)
+		size = len(result.encode('utf-8')) if isinstance(result, str) else sys.getsizeof(result)
+
+		with self._lock:
+			self.misses += 1
+			self._entries.put(key, result, size)
+		return result
+
+	@contextmanager
+	def bypassed(self):
+
+		"""
+			Returns a context in which the functions called by the current
+			thread are computed, without the cache. Other threads still use
+			it.
+		"""
+
+		self._local.is_bypassed = True
+		try:
+			yield
+		finally:
+			self._local.is_bypassed = False
+
+	def resize(self, max_size):
+
+		"""
+			Changes the maximum total size, evicting results if needed.
+		"""
+
+		with self._lock:
+			self._entries.resize(max_size)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+memo = Memo()
+"""The process-wide cache of results."""
+
+# Memoized targets, each with the owner and name of the replaced function, the
+# function itself and the number of uses of the target.
+_memoized = {}
+
+# The sizes of the cache asked for by its current users.
+_sizes = []
+
+# Pipelines may be created and dropped in several threads.
+_lock = RLock()
+
+def use(targets, max_size):
+
+	"""
+		Memoizes the targets, and asks for a cache of `max_size` bytes, until
+		`release()` is called with the same arguments. Nothing is memoized if
+		a target can't be.
+	"""
+
+	with _lock:
+		memoized = []
+		try:
+			for target in targets:
+				memoize(target)
+				memoized.append(target)
+		except:
+			for target in memoized:
+				unmemoize(target)
+			raise
+		_sizes.append(max_size)
+		memo.resize(max(_sizes))
+
+def release(targets, max_size):
+
+	"""
+		Gives back what `use()` was given. When the cache has no users left,
+		it is cleared.
+	"""
+
+	with _lock:
+		for target in targets:
+			unmemoize(target)
+		_sizes.remove(max_size)
+		if _sizes:
+			memo.resize(max(_sizes))
+		else:
+			memo.clear()
+
+def memoize(target):
+
+	"""
+		Replaces a function or method, given as `module:function` or
+		`module:Class.method`, with one that caches its results in `memo`. A
+		target that already is memoized is counted as used once more.
+	"""
+
+	with _lock:
+		if target in _memoized:
+			_memoized[target][3] += 1
+			return
+
+		module_name, separator, name = target.partition(':')
+		owner = import_module(module_name)
+		*path, attribute = name.split('.')
+		for part in path:
+			owner = getattr(owner, part)
+		function = getattr(owner, attribute)
+
+		# A method is keyed by the attributes of its instance as well.
+		if path:
+			@wraps(function)
+			def wrapper(self, *args, **kwargs):
+				return memo.call(target, partial(function, self), sorted(vars(self).items()), args, kwargs)
+		else:
+			@wraps(function)
+			def wrapper(*args, **kwargs):
+				return memo.call(target, function, None, args, kwargs)
+		setattr(owner, attribute, wrapper)
+		_memoized[target] = [owner, attribute, function, 1]
+
+def unmemoize(target):
+
+	"""
+		Restores a function memoized by `memoize()`, when it has been called
+		as many times for the target as `memoize()` was.
+	"""
+
+	with _lock:
+		entry = _memoized[target]
+		entry[3] -= 1
+		if not entry[3]:
+			owner, attribute, function, uses = _memoized.pop(target)
+			setattr(owner, attribute, function)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Outline – an index of the headings of a Markdown document, which is kept up to
+date edit by edit.
+
+The index holds the ATX headings, e.g. `## Heading`, and the setext headings,
+i.e. a line underlined with `=` or `-`, as Python-Markdown finds them, the
+fence lines of fenced code, and the lines with tags that may start or end a raw
+HTML block. A heading between an odd number of fence lines is in code, and a
+heading in a raw HTML block is in HTML, and both are left out. An edit only has
+the edited lines and their neighbours parsed again, and the lines of the
+entries after them shifted, so the cost of an edit doesn't depend on the length
+of the document. The raw HTML blocks are found again from the lines with tags
+after an edit, when the headings are next asked for. The heading at a line is
+found by bisection.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import re
+
+from html import unescape
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from blocks import FENCE, _close_html, _open_html
+
+ATX = re.compile(r'^(#{1,6})(.*?)#*$')
+"""Regular expression matching an ATX heading, as Python-Markdown does."""
+
+UNDERLINE = re.compile(r'^(=+|-+)[ ]*$')
+"""Regular expression matching the underline of a setext heading."""
+
+# Id of a heading in HTML.
+_HEADING_ID = re.compile(r'<h[1-6]\b[^>]*?\sid="([^"]*)"')
+
+# The levels and titles of the headings last given to anchors(), and their ids.
+_anchors_key = None
+_anchors_ids = None
+
+Heading = namedtuple('Heading', 'line level title')
+"""A heading, with its line counted from zero, its level and its text."""
+
+class Outline:
+
+	"""
+		The headings of a document, whose lines are given by the function
+		`get_line(line)`, and whose number of lines by `line_count()`. The
+		index is built when it is first used, and must then be told about
+		every edit with `edit()`.
+	"""
+
+	def __init__(self, get_line, line_count):
+		self.get_line = get_line
+		self.line_count = line_count
+
+		# Sorted lines of the headings and their levels and texts, sorted
+		# lines of the fences, and sorted lines with tags. None until the index
+		# is built.
+		self._heading_lines = None
+		self._headings = None
+		self._fence_lines = None
+		self._tag_lines = None
+
+		# Sorted first and last lines of the raw HTML blocks. None until they
+		# are found after the index is built or edited.
+		self._html_starts = None
+		self._html_ends = None
+
+	def _build(self):
+		self._heading_lines = []
+		self._headings = []
+		self._fence_lines = []
+		self._tag_lines = []
+		self._html_starts = None
+		self._parse(0, self.line_count())
+
+	def edit(self, first, old_count, new_count):
+
+		"""
+			Updates the index after the `old_count` lines from the line `first`
+			have been replaced by `new_count` lines. Inserting text within a
+			line, for instance, replaces one line with as many lines as the
+			text has line ends plus one.
+		"""
+
+		if self._headings is None:
+			return
+
+		# Remove the entries of the replaced lines and shift the ones after
+		# them.
+		delta = new_count - old_count
+		self._html_starts = None
+		for lines, entries in ((self._heading_lines, self._headings), (self._fence_lines, None), (self._tag_lines, None)):
+			start = bisect_left(lines, first)
+			end = bisect_left(lines, first + old_count)
+			del lines[start:end]
+			if entries is not None:
+				del entries[start:end]
+			if delta:
+				lines[start:] = [line + delta for line in lines[start:]]
+
+		# Whether a line is a setext heading depends on the next line, so the
+		# line before the new lines is parsed again, and so is the line after
+		# them, since it may have been an underline.
+		start = max(0, first - 1)
+		end = min(self.line_count(), first + new_count + 1)
+		for lines, entries in ((self._heading_lines, self._headings), (self._fence_lines, None), (self._tag_lines, None)):
+			i = bisect_left(lines, start)
+			j = bisect_left(lines, end)
+			del lines[i:j]
+			if entries is not None:
+				del entries[i:j]
+		self._parse(start, end)
+
+	def _parse(self, start, end):
+
+		# Parse the lines from start to end, and the one after end that may
+		# underline the last of them, and insert what is found.
+		headings = []
+		fence_lines = []
+		tag_lines = []
+		text = self.get_line(start) if start < end else ''
+		for line in range(start, end):
+			next_text = self.get_line(line + 1) if line + 1 < self.line_count() else ''
+			if FENCE.match(text):
+				fence_lines.append(line)
+			else:
+				if '<' in text or '-->' in text:
+					tag_lines.append(line)
+				match = ATX.match(text)
+				if match:
+					headings.append((line, len(match.group(1)), match.group(2).strip()))
+				elif text.strip() and UNDERLINE.match(next_text):
+					headings.append((line, 1 if next_text[0] == '=' else 2, text.strip()))
+			text = next_text
+
+		i = bisect_left(self._heading_lines, start)
+		self._heading_lines[i:i] = [line for line, level, title in headings]
+		self._headings[i:i] = [(level, title) for line, level, title in headings]
+		i = bisect_left(self._fence_lines, start)
+		self._fence_lines[i:i] = fence_lines
+		i = bisect_left(self._tag_lines, start)
+		self._tag_lines[i:i] = tag_lines
+
+	def _find_html(self):
+
+		# Find the raw HTML blocks from the lines with tags outside of code, as
+		# blocks.split_document() finds them. A block left open ends with the
+		# document, except a comment, which Python-Markdown leaves as text when
+		# it isn't closed. The lines after such a comment are searched again,
+		# without starting comments, since none of them is closed either.
+		self._html_starts = []
+		self._html_ends = []
+		lines = [line for line in self._tag_lines if not self._is_in_code(line)]
+		html = None
+		is_comment_closed = True
+		i = 0
+		while i < len(lines):
+			text = self.get_line(lines[i])
+			if html is None:
+				html = _open_html(text)
+				if html is not None and html[0] == '!--' and not is_comment_closed:
+					html = None
+				if html is not None:
+					start = i
+					self._html_starts.append(lines[i])
+					self._html_ends.append(None)
+			else:
+				html = _close_html(html, text)
+				if html is None:
+					self._html_ends[-1] = lines[i]
+			i += 1
+			if i == len(lines) and html is not None and html[0] == '!--':
+				del self._html_starts[-1], self._html_ends[-1]
+				html = None
+				is_comment_closed = False
+				i = start + 1
+		if html is not None:
+			self._html_ends[-1] = self.line_count()
+
+	def _is_in_code(self, line):
+		return bisect_left(self._fence_lines, line) % 2 == 1
+
+	def _is_in_html(self, line):
+		if self._html_starts is None:
+			self._find_html()
+		i = bisect_right(self._html_starts, line) - 1
+		return i >= 0 and line <= self._html_ends[i]
+
+	def _is_hidden(self, line):
+		return self._is_in_code(line) or self._is_in_html(line)
+
+	def headings(self):
+
+		"""
+			Returns the list of headings of the document.
+		"""
+
+		if self._headings is None:
+			self._build()
+		return [Heading(line, *heading) for line, heading in zip(self._heading_lines, self._headings) if not self._is_hidden(line)]
+
+	def heading_at(self, line):
+
+		"""
+			Returns the heading of the section containing the line, i.e. the
+			last heading at or before it, or `None`.
+		"""
+
+		if self._headings is None:
+			self._build()
+		i = bisect_right(self._heading_lines, line) - 1
+		while i >= 0 and self._is_hidden(self._heading_lines[i]):
+			i -= 1
+		return Heading(self._heading_lines[i], *self._headings[i]) if i >= 0 else None
+
+def anchors(headings):
+
+	"""
+		Returns the ids that Python-Markdown gives the headings, with their
+		inline markup rendered, with the attr_list and toc extensions and
+		their default options, or `None` if it is missing. The ids of the
+		headings last given are kept, and returned again as long as their
+		levels and titles are unchanged.
+	"""
+
+	global _anchors_key, _anchors_ids
+	key = tuple((heading.level, heading.title) for heading in headings)
+	if key != _anchors_key:
+		_anchors_key = key
+		_anchors_ids = _convert_anchors(headings)
+	return list(_anchors_ids) if _anchors_ids is not None else None
+
+def _convert_anchors(headings):
+	try:
+		import markdown
+	except ImportError:
+		return None
+	md = markdown.Markdown(extensions = ['attr_list', 'toc'])
+	html = md.convert('\n\n'.join('{0} {1}'.format('#' * heading.level, heading.title.strip()) for heading in headings))
+	ids = tuple(unescape(id) for id in _HEADING_ID.findall(html))
+	return ids if len(ids) == len(headings) else None
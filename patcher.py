@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Patcher – updates a preview page block by block instead of reloading it.
+
+The page is loaded once with every block of the document wrapped in an element
+whose id is derived from the content of the block. Later updates are sent as a
+JavaScript call listing the ids of the new blocks in order, together with the
+HTML of the blocks the page doesn't have yet. Blocks that are unchanged are
+left alone, so they are neither parsed nor laid out again, and the scroll
+position is kept.
+
+The elements wrapping the blocks carry the first line of their block, as the
+top-level elements do in `sourcemap`, and are updated when a block moves.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import json, sourcemap
+
+PATCH_SCRIPT = """
+function geditMarkdownPatch(blocks) {
+	var body = document.body;
+	var next = body.firstElementChild;
+	for (var i = 0; i < blocks.length; i++) {
+		var node = document.getElementById(blocks[i][0]);
+		if (node === null) {
+			node = document.createElement('div');
+			node.id = blocks[i][0];
+			node.className = 'gedit-markdown-block';
+			node.innerHTML = blocks[i][1];
+		}
+		node.setAttribute('%s', blocks[i][2]);
+		if (node === next) {
+			next = next.nextElementSibling;
+		} else {
+			body.insertBefore(node, next);
+		}
+	}
+	while (next !== null) {
+		var following = next.nextElementSibling;
+		body.removeChild(next);
+		next = following;
+	}
+}
+""" % sourcemap.ATTRIBUTE
+"""JavaScript function that patches the page."""
+
+def block_ids(blocks):
+
+	"""
+		Returns the element ids of a list of blocks given as (key, html, first
+		line). Equal blocks get distinct ids.
+	"""
+
+	ids = []
+	seen = {}
+	for key, html, first_line in blocks:
+		count = seen.get(key, 0)
+		seen[key] = count + 1
+		ids.append('b{0}-{1}'.format(key[:16], count) if count else 'b' + key[:16])
+	return ids
+
+def build_page(blocks):
+
+	"""
+		Returns the HTML of a page with the blocks, and the ids of the blocks.
+	"""
+
+	# The lines within a block are of no use, since they are counted from
+	# the start of the block.
+	ids = block_ids(blocks)
+	body = ''.join('<div id="{0}" class="gedit-markdown-block" {1}="{2}">{3}</div>\n'.format(id, sourcemap.ATTRIBUTE, first_line, sourcemap.strip(html)) for id, (key, html, first_line) in zip(ids, blocks))
+	page = '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<script>{0}</script>\n</head>\n<body>{1}</body>\n</html>\n'.format(PATCH_SCRIPT, body)
+	return page, ids
+
+def build_patch(blocks, page_ids):
+
+	"""
+		Returns the JavaScript that turns a page with the blocks `page_ids` into
+		a page with the blocks, and the ids of the blocks.
+	"""
+
+	ids = block_ids(blocks)
+	present = set(page_ids)
+	patch = [[id, None if id in present else sourcemap.strip(html), first_line] for id, (key, html, first_line) in zip(ids, blocks)]
+	return 'geditMarkdownPatch({0});'.format(json.dumps(patch)), ids
@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pipeline – the conversion of Markdown text to HTML, as configured in the
+configuration file of Gedit Markdown.
+
+The text is converted by the stages listed, in order, by `stages` in the
+General section of the configuration. By default, these are `markdown` and
+`smartypants`, i.e. the internal or external Markdown implementation and then
+the internal or external SmartyPants implementation. Any other stage `name` is
+configured in a section `[Stage name]`, either as an internal Python function
+taking and returning text, given as `function = path.to.module:function`, or
+as an external command, given with `command_line`, `timeout`, `persistent` and
+`framing` as for the external Markdown tool. Adjacent external commands that
+aren't persistent are connected with pipes and run at the same time.
+
+The text can also be given as a list of chunks, which are streamed through
+external commands and SmartyPants without being joined. The module doesn't
+depend on GTK, so the pipeline can be used outside of Gedit.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import chain, profiler
+
+from importlib import import_module
+from gettext import gettext as _
+from subprocess import TimeoutExpired
+from threading import Lock, Thread
+from time import monotonic
+from weakref import WeakValueDictionary, finalize
+from coprocess import CoProcess, CoProcessError
+from memo import release as release_memo, use as use_memo
+from rendercache import fingerprint
+
+class Engine:
+
+	"""
+		A Markdown or SmartyPants engine shared by pipelines. The engines aren't
+		thread-safe, so the lock must be held while one is used.
+	"""
+
+	def __init__(self, engine):
+		self.engine = engine
+		self.lock = Lock()
+
+class EngineRegistry:
+
+	"""
+		Engines shared by all pipelines of the process, keyed by the normalized
+		configuration of the engine. An engine is dropped when no pipeline
+		refers to it anymore.
+	"""
+
+	def __init__(self):
+		self._engines = WeakValueDictionary()
+		self._lock = Lock()
+
+	def __len__(self):
+		return len(self._engines)
+
+	def get(self, key, factory):
+
+		"""
+			Returns the engine for the key, creating it with `factory()` if
+			there is none.
+		"""
+
+		with self._lock:
+			engine = self._engines.get(key)
+			if engine is None:
+				engine = Engine(factory())
+				self._engines[key] = engine
+			return engine
+
+engines = EngineRegistry()
+"""The process-wide engine registry."""
+
+class Stage:
+
+	"""
+		A stage of a pipeline, which is either a function converting a list of
+		text chunks, or an external command.
+	"""
+
+	def __init__(self, name, convert = None, command_line = None, timeout = 30):
+
+		self.name = name
+		"""Name of the stage in the configuration."""
+
+		self.convert = convert
+		"""Function taking and returning a list of text chunks, or `None` if
+		the stage is an external command run in a chain."""
+
+		self.command_line = command_line
+		"""Command line of an external tool, or `None` if the stage is
+		internal."""
+
+		self.timeout = timeout
+		"""Seconds an external command may run."""
+
+class Pipeline:
+
+	"""
+		Converts Markdown text to HTML with the Markdown and SmartyPants
+		implementations selected in the configuration.
+
+		The configuration is read once, into a typed snapshot. To change it,
+		create a new pipeline and pass the old one as `previous`. The new
+		pipeline takes over the persistent tools whose configuration is
+		unchanged. The internal engines are shared through `engines`.
+
+		If `source_lines` is `True`, the internal Markdown gives the top-level
+		elements the line they were converted from, as described in
+		`sourcemap`.
+	"""
+
+	def __init__(self, cfg, previous = None, source_lines = False):
+
+		# Snapshot of the configuration. The substitutions of SmartyPants are
+		# used as they are written.
+		self._settings = cfg.snapshot()
+		self._substitutions = dict(cfg.snapshot(False)['Internal SmartyPants'])
+
+		# Dynamically assign which Markdown and SmartyPants methods to use.
+		general = self._settings['General']
+		self.markdown = self._markdown_external if general['use_external_markdown'] else self._markdown_internal
+		self.smartypants = self._smartypants_external if general['use_external_smartypants'] else self._smartypants_internal
+
+		# The internal SmartyPants may make its substitutions on the element
+		# tree of the internal Markdown, if it directly follows it.
+		names = [name.strip() for name in str(general['stages']).split(',') if name.strip()]
+		is_internal = not general['use_external_markdown'] and not general['use_external_smartypants']
+		self._is_smartypants_integrated = bool(general['integrated_smartypants']) and is_internal and ('markdown', 'smartypants') in zip(names, names[1:])
+
+		# The stages, in groups of one internal stage or of adjacent external
+		# commands, which are run as a chain.
+		self._groups = []
+		for name in names:
+			stage = self._create_stage(name)
+			if stage.convert is None and self._groups and self._groups[-1][-1].convert is None:
+				self._groups[-1].append(stage)
+			else:
+				self._groups.append([stage])
+
+		# Whether the internal engines count the calls and time of each of
+		# their components, in `profiler.profile`.
+		self._is_profiled = bool(general['profile_extensions'])
+
+		# Functions of internal stages, imported when first needed.
+		self._functions = {}
+
+		self.source_lines = source_lines
+		"""Whether the internal Markdown tells the source lines of the
+		top-level elements."""
+
+		# Lazy initialization of internal Markdown and SmartyPants
+		# implementation, as shared engines.
+		self._markdown_engine = None
+		self._smartypants_engine = None
+
+		# Lazy initialization of persistent external tools, keyed by section.
+		self._coprocesses = {}
+
+		# Gives back the memoized functions of internal Markdown, once they
+		# have been asked for.
+		self._memo_release = None
+
+		# Computed when first needed.
+		self._fingerprint = None
+
+		if previous is not None:
+			self._take_over(previous)
+
+		self.has_error = False
+		"""Set when a conversion fails. It is never reset by the pipeline, so
+		that it covers several conversions, e.g. of the blocks of a text."""
+
+		self.stage_times = {}
+		"""Seconds spent in each stage, keyed by its name. Stages run as a
+		chain are timed together, under their names joined by `|`. Like
+		`has_error`, never reset by the pipeline."""
+
+	def render(self, text, cancelled = None):
+		return ''.join(self.render_chunks([text], cancelled))
+
+	def render_chunks(self, chunks, cancelled = None):
+
+		"""
+			Like `render()`, but takes and returns the text as a list of
+			chunks. External commands get the chunks written to them one by
+			one, and SmartyPants converts them as they come, so no stage but
+			the internal Markdown needs the whole text as one string.
+
+			The errors of a chain of external commands are reported together,
+			and end the rendering. Running commands are killed if the
+			`threading.Event` given as `cancelled` is set.
+		"""
+
+		for group in self._groups:
+			start = monotonic()
+			if group[0].convert is not None:
+				chunks, errors = group[0].convert(chunks), []
+			else:
+				chunks, errors = self._execute_chain(chunks, group, cancelled)
+			name = '|'.join(stage.name for stage in group)
+			self.stage_times[name] = self.stage_times.get(name, 0.0) + monotonic() - start
+			if errors:
+				return [self._error('<br>\n'.join(errors))]
+		return chunks
+
+	def markdown(self, text):
+		# This method is an alias for the one of _markdown_internal() and
+		# _markdown_external() selected in the constructor. Its body is never
+		# executed.
+		assert True
+
+	def smartypants(self, html):
+		# This method is an alias for the one of _smartypants_internal() and
+		# _smartypants_external() selected in the constructor. Its body is
+		# never executed.
+		assert True
+
+	@property
+	def is_external(self):
+
+		"""
+			Whether any stage is an external tool.
+		"""
+
+		return any(stage.command_line is not None for group in self._groups for stage in group)
+
+	def fingerprint(self):
+
+		"""
+			Returns a string identifying everything in the configuration that
+			affects the rendered HTML.
+		"""
+
+		if self._fingerprint is None:
+			configuration = {section: self._settings[section] for section in self._settings if section.startswith('Stage ')}
+			configuration.update((section, self._settings[section]) for section in ('Internal Markdown', 'Internal SmartyPants', 'External Markdown', 'External SmartyPants'))
+			configuration['General'] = {key: self._settings['General'][key] for key in ('use_external_markdown', 'use_external_smartypants', 'stages', 'integrated_smartypants')}
+			configuration['General']['source_lines'] = self.source_lines
+			self._fingerprint = fingerprint(configuration)
+		return self._fingerprint
+
+	def changed_sections(self, other):
+
+		"""
+			Returns the set of sections whose configuration differs between
+			this pipeline and another.
+		"""
+
+		sections = set(self._settings) | set(other._settings)
+		return {section for section in sections if self._settings.get(section) != other._settings.get(section)}
+
+	def stop(self):
+
+		"""
+			Stops persistent external tools, and gives back the memoized
+			functions.
+		"""
+
+		for coprocess in self._coprocesses.values():
+			coprocess.stop()
+		if self._memo_release is not None:
+			self._memo_release()
+
+	def _take_over(self, previous):
+
+		changed = self.changed_sections(previous)
+
+		# Keep persistent tools that are unchanged and stop the others. The old
+		# pipeline may still be using them, so they are stopped in the
+		# background.
+		for section, coprocess in previous._coprocesses.items():
+			if section not in changed:
+				self._coprocesses[section] = coprocess
+			else:
+				Thread(target = coprocess.stop, daemon = True).start()
+
+	def _error(self, message):
+		self.has_error = True
+		return "<p>" + message + "</p>"
+
+	def _create_stage(self, name):
+
+		general = self._settings['General']
+
+		# Markdown and SmartyPants are internal or external as configured.
+		if name == 'markdown':
+			section, is_external = 'External Markdown', general['use_external_markdown']
+			convert = self._markdown_internal_chunks
+		elif name == 'smartypants':
+			section, is_external = 'External SmartyPants', general['use_external_smartypants']
+			convert = self._smartypants_internal_chunks
+			if self._is_smartypants_integrated:
+				return Stage(name, lambda chunks: chunks)
+
+		# Other stages have a section of their own.
+		else:
+			section, is_external = 'Stage ' + name, True
+			settings = self._settings.get(section)
+			if settings is None:
+				message = _("Error: There is no section [{0}] in the configuration.").format(section)
+				return Stage(name, lambda chunks: [self._error(message)])
+			if 'function' in settings:
+				return Stage(name, lambda chunks: [self._call_function(settings['function'], ''.join(chunks))])
+
+		if not is_external:
+			return Stage(name, convert)
+
+		# The protocol of a persistent tool needs the whole text.
+		settings = self._settings[section]
+		if settings.get('persistent', False):
+			return Stage(name, lambda chunks: [self._execute_external(''.join(chunks), section)], settings['command_line'])
+		return Stage(name, command_line = settings.get('command_line', ''), timeout = settings.get('timeout', 30))
+
+	def _call_function(self, function, text):
+		try:
+			if function not in self._functions:
+				module_name, function_name = function.split(':', 1)
+				self._functions[function] = getattr(import_module(module_name), function_name)
+			return self._functions[function](text)
+		except Exception as err:
+			return self._error(_("Error while calling {0}: {1}").format(function, err))
+
+	def _markdown_internal(self, text):
+
+		settings = self._settings['Internal Markdown']
+
+		if self._markdown_engine is None:
+
+			# Import Waylan Limberg's Python-Markdown module and its extension.
+			try:
+				import markdown
+			except ImportError:
+				return self._error(_("Error: Markdown implementation is missing."))
+
+			# Windows with the same extensions and options share the engine.
+			extensions = [ext.strip() for ext in settings['extensions'].split(',')]
+			key = ('markdown', tuple(''.join(ext.split()) for ext in extensions), settings['output_format'], settings['lazy_ol'], self.source_lines, self._is_smartypants_integrated and tuple(self._substitutions.items()), self._is_profiled)
+			try:
+				self._memoize(settings)
+				self._markdown_engine = engines.get(key, lambda: self._create_markdown(markdown, extensions, settings))
+			except (ImportError, AttributeError, KeyError, ValueError) as e:
+				return self._error(e.args[0])
+
+		# Convert markdwon to HTML.
+		# Following line should work according to documentation, but the
+		# reset() doesn't do it. So therefore we don't use the obkect
+		# for current being.
+		with self._markdown_engine.lock:
+			return self._markdown_engine.engine.reset().convert(text)
+
+	def _memoize(self, settings):
+
+		# Memoize the expensive functions of the extensions, so that blocks
+		# that haven't changed aren't processed again. The functions are
+		# replaced for the whole process, so all engines share the results.
+		# They are restored when no pipeline uses them anymore, i.e. when
+		# this pipeline is stopped or dropped.
+		if self._memo_release is not None:
+			return
+		targets = [''.join(target.split()) for target in str(settings['memoize'] or '').split(',')]
+		targets = [target for target in targets if target]
+		max_size = int(settings['memoize_cache_size'] * 1024 * 1024)
+		try:
+			use_memo(targets, max_size)
+		except (ImportError, AttributeError, ValueError) as e:
+			e.args = (_("Error: Failed memoizing {0}.").format(', '.join(targets)), ) + e.args[1:]
+			raise e
+		self._memo_release = finalize(self, release_memo, targets, max_size)
+
+	def _create_markdown(self, markdown, extensions, settings):
+
+		# Build a list of extension objects.
+		extension_objects = [self._extension_factory(ext) for ext in extensions]
+		if self.source_lines:
+			extension_objects.append(self._extension_factory('sourcemap'))
+		if self._is_smartypants_integrated:
+			import smarty
+			extension_objects.append(smarty.SmartyExtension(self._create_smarty(smarty)))
+
+		md = markdown.Markdown(
+			extensions = extension_objects,
+			output_format = settings['output_format'],
+			lazy_ol = settings['lazy_ol']
+		)
+		if self._is_profiled:
+			profiler.instrument_markdown(md)
+		return md
+
+	def _extension_factory(self, extension):
+
+		# Build a dictonary with the arguments.
+		arguments = {}
+		pos = extension.find('(')
+		if pos > 0:
+
+			# Get the arguments.
+			args = extension[pos+1:-1]
+			args = [arg.split('=') for arg in args.split(',')]
+			arguments.update((key.strip(), val.strip()) for (key, val) in args)
+
+			# Remove the arguments from the extension parameter.
+			extension = extension[:pos]
+
+		# Get class name (if provided): `path.to.module:ClassName`
+		module_name, class_name = extension.split(':', 1) if ':' in extension else (extension, '')
+
+		# Load the extension module.
+		try:
+			module = import_module(module_name)
+		except ImportError as e:
+			msg = _("Error: Failed loading extension {0} from {1}.").format(class_name, module_name)
+			e.args = (msg, ) + e.args[1:]
+			raise e
+
+		# Return the class.
+		try:
+			if class_name:
+				# If class name was given, instantiate an object of the named class.
+				return getattr(module, class_name)(**arguments)
+			else:
+				# No class given. Let's hope the module has implemented the
+				# makeExtension method described in API documentation:
+				# https://pythonhosted.org/Markdown/extensions/api.html#makeextension
+				return module.makeExtension(**arguments)
+		except AttributeError as e:
+			msg = _("Error: Failed loading extension {0} from {1}.").format(class_name, module_name)
+			e.args = (msg, ) + e.args[1:]
+			raise e
+
+	def _markdown_internal_chunks(self, chunks):
+		# Python-Markdown needs the whole text.
+		return [self._markdown_internal(''.join(chunks))]
+
+	def _markdown_external(self, text):
+		return self._execute_external(text, 'External Markdown')
+
+	def _smartypants_internal(self, html):
+		return ''.join(self._smartypants_internal_chunks([html]))
+
+	def _smartypants_internal_chunks(self, chunks):
+
+		# Import Thomas Barregren's Smarty module.
+		if self._smartypants_engine is None:
+			try:
+				import smarty
+			except ImportError:
+				return [self._error(_("Error: SmartyPants implementation is missing."))]
+
+		try:
+			# Initalize the internal SmartyPants library. Windows with the
+			# same substitutions share the engine. A substitution without a
+			# pattern is reported like any other error of the library.
+			if self._smartypants_engine is None:
+				key = ('smarty', tuple(self._substitutions.items()), self._is_profiled)
+				self._smartypants_engine = engines.get(key, lambda: self._create_smarty(smarty))
+
+			with self._smartypants_engine.lock:
+				return list(self._smartypants_engine.engine.stream(chunks))
+		except Exception as err:
+			return [self._error(_("Error while calling internal SmartyPants library: {0}").format(err))]
+
+	def _create_smarty(self, smarty):
+		engine = smarty.Smarty()
+		engine.substitutions = self._substitutions
+		if self._is_profiled:
+			profiler.instrument_smarty(engine)
+		return engine
+
+	def _smartypants_external(self, html):
+		return self._execute_external(html, 'External SmartyPants')
+
+	def _execute_external(self, text, section):
+
+		settings = self._settings[section]
+
+		# A persistent tool is started once and kept running.
+		if settings.get('persistent', False):
+			if section not in self._coprocesses:
+				try:
+					self._coprocesses[section] = CoProcess(settings['command_line'], settings.get('timeout', 30), settings.get('framing', 'nul'))
+				except ValueError as err:
+					return self._error(_("Error: {0} in section [{1}] of the configuration.").format(err, section))
+			return self._execute_coprocess(text, self._coprocesses[section])
+
+		return self._execute_command_line(text, settings['command_line'], settings['timeout'])
+
+	def _execute_coprocess(self, text, coprocess):
+		try:
+			text = coprocess.convert(text)
+		except OSError as err:
+			text = self._error(_("OS error: {0}").format(err))
+		except TimeoutExpired:
+			text = self._error(_("Timeout error: {0} has not returned after {1} seconds").format(coprocess.command_line, coprocess.timeout))
+		except CoProcessError as err:
+			text = self._error(_("Error: {0}").format(err))
+		except Exception as err:
+			text = self._error(_("Unexpected error when calling {0}: {1}").format(coprocess.command_line, err))
+		return text
+
+	def _execute_command_line(self, text, command_line, timeout):
+		chunks, errors = self._execute_chain([text], [Stage(command_line, command_line = command_line, timeout = timeout)])
+		return self._error('<br>\n'.join(errors)) if errors else ''.join(chunks)
+
+	def _execute_chain(self, chunks, stages, cancelled = None):
+
+		# Returns the output chunks and a list of error messages, which is
+		# empty if all went well.
+		command_line = ' | '.join(stage.command_line for stage in stages)
+		try:
+			chunks, outputs, timed_out = chain.run([stage.command_line for stage in stages], chunks, [stage.timeout for stage in stages], cancelled)
+		except chain.Cancelled:
+			return [], [_("Cancelled: {0}").format(command_line)]
+		except OSError as err:
+			return [], [_("OS error: {0}").format(err)]
+		except Exception as err:
+			return [], [_("Unexpected error when calling {0}: {1}").format(command_line, err)]
+
+		errors = []
+		for i, stage in enumerate(stages):
+			if i in timed_out:
+				errors.append(_("Timeout error: {0} has not returned after {1} seconds").format(stage.command_line, stage.timeout))
+			elif outputs[i]:
+				errors.append(_("Error: {0} failed with following error message: \"{1}\"").format(stage.command_line, outputs[i]))
+		return chunks, errors
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Previews – the render state of the documents of a window, so that switching
+back to a document that hasn't changed restores its preview without
+converting it again.
+
+The state of a document holds the result of its last render, the number of
+changes of the document when the text was taken and now, and how far its
+preview was scrolled. The states of the least recently used documents are
+dropped, so only a bounded number of previews is kept.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from collections import OrderedDict
+
+class PreviewState:
+
+	"""
+		The render state of a document.
+	"""
+
+	def __init__(self):
+
+		self.changes = 0
+		"""Number of changes of the document."""
+
+		self.result = None
+		"""Result of the last render of the whole document, or `None`."""
+
+		self.mime = None
+		"""MIME type the result was loaded with."""
+
+		self.fingerprint = None
+		"""Fingerprint of the pipeline that rendered the result."""
+
+		self.rendered_changes = None
+		"""Value of `changes` when the text of the result was taken."""
+
+		self.scroll = 0.0
+		"""Vertical scroll position of the preview."""
+
+		self.handler_id = None
+		"""Id of the handler counting the changes of the document."""
+
+	@property
+	def is_current(self):
+
+		"""
+			Whether the result reflects the document as it is.
+		"""
+
+		return self.result is not None and self.rendered_changes == self.changes
+
+class PreviewStates:
+
+	"""
+		The render states of the most recently used documents, keyed by the
+		document.
+	"""
+
+	def __init__(self, size = 8):
+
+		self.size = size
+		"""Maximum number of states kept."""
+
+		# The states, least recently used first.
+		self._states = OrderedDict()
+
+	def __len__(self):
+		return len(self._states)
+
+	def __contains__(self, key):
+		return key in self._states
+
+	def get(self, key):
+
+		"""
+			Returns the state of the key, or `None`, and marks it as the most
+			recently used.
+		"""
+
+		state = self._states.get(key)
+		if state is not None:
+			self._states.move_to_end(key)
+		return state
+
+	def add(self, key, state):
+
+		"""
+			Adds the state of the key, and returns a list of the keys and
+			states dropped to make room for it.
+		"""
+
+		self._states[key] = state
+		self._states.move_to_end(key)
+		dropped = []
+		while len(self._states) > self.size:
+			dropped.append(self._states.popitem(last = False))
+		return dropped
+
+	def pop(self, key):
+		return self._states.pop(key, None)
+
+	def clear(self):
+
+		"""
+			Drops all states, and returns a list of their keys and states.
+		"""
+
+		dropped = list(self._states.items())
+		self._states.clear()
+		return dropped
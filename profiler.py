@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Profiler – the cost of each component of the internal Markdown and
+SmartyPants.
+
+Every preprocessor, block processor, inline pattern, tree processor and
+postprocessor of a Markdown engine, and the handlers of a Smarty engine, are
+wrapped in functions that count their calls and add up their time. The times
+are inclusive, so the time of the tree processor `inline` includes the time of
+the inline patterns, and the time of a block processor includes the time of
+the block processors it runs on nested blocks.
+
+A single render can also be profiled with cProfile, and its statistics dumped
+to a file that `pstats` reads.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import cProfile, os
+
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+from configuration import xdg_state_home
+
+REPORT_FILE = os.path.join(xdg_state_home, "gedit-markdown", "profile.txt")
+"""Default file of the report."""
+
+STATS_FILE = os.path.join(xdg_state_home, "gedit-markdown", "render.pstats")
+"""Default file of the statistics of a profiled render."""
+
+SMARTY_HANDLERS = ('handle_starttag', 'handle_endtag', 'handle_data', 'handle_comment', '_flush_data')
+"""Methods of Smarty that are profiled. `_flush_data` makes the substitutions."""
+
+class Profile:
+
+	"""
+		Number of calls and seconds spent in each component, keyed by its
+		name.
+	"""
+
+	def __init__(self):
+
+		# The components are the calls and the seconds of each name.
+		self._components = {}
+
+		# The engines of several windows may be used at the same time.
+		self._lock = Lock()
+
+	def __len__(self):
+		return len(self._components)
+
+	def add(self, name, seconds, calls = 1):
+		with self._lock:
+			component = self._components.setdefault(name, [0, 0.0])
+			component[0] += calls
+			component[1] += seconds
+
+	def clear(self):
+		with self._lock:
+			self._components.clear()
+
+	def report(self, limit = None):
+
+		"""
+			Returns a list of lines with the calls and time of the components,
+			the most expensive first.
+		"""
+
+		with self._lock:
+			components = sorted(self._components.items(), key = lambda item: item[1][1], reverse = True)
+		return ["{0}: {1:.1f} ms in {2:,d} calls".format(name, seconds * 1000, calls) for name, (calls, seconds) in components[:limit]]
+
+	def write(self, path = REPORT_FILE):
+
+		"""
+			Writes the report to the file. Raises `OSError` if it can't be
+			written.
+		"""
+
+		os.makedirs(os.path.dirname(path), exist_ok = True)
+		with open(path, 'w', encoding = 'utf-8') as f:
+			f.write('\n'.join(self.report()) + '\n')
+
+profile = Profile()
+"""The process-wide profile, since engines are shared by all windows."""
+
+def _wrap(target, method, name, calls = 1):
+
+	# Replace the method of the object with one that is timed. The instance
+	# attribute hides the method of the class.
+	function = getattr(target, method)
+
+	@wraps(function)
+	def timed(*args, **kwargs):
+		started = perf_counter()
+		try:
+			return function(*args, **kwargs)
+		finally:
+			profile.add(name, perf_counter() - started, calls)
+
+	setattr(target, method, timed)
+
+def instrument_markdown(md):
+
+	"""
+		Profiles the processors and patterns of a `markdown.Markdown`.
+	"""
+
+	registries = [
+		('preprocessor', md.preprocessors, ['run']),
+		('blockprocessor', md.parser.blockprocessors, ['test', 'run']),
+		('inlinepattern', md.inlinePatterns, ['handleMatch']),
+		('treeprocessor', md.treeprocessors, ['run']),
+		('postprocessor', md.postprocessors, ['run'])
+	]
+	for kind, registry, methods in registries:
+		# The registries don't tell the names of their items other than by
+		# their keys, and the names tell apart items of the same class.
+		for key in list(registry._data):
+			item = registry[key]
+			name = "{0} {1} ({2})".format(kind, key, type(item).__module__)
+			for method in methods:
+				# A block processor is tested on many blocks it doesn't run on,
+				# so only its runs are counted as calls.
+				_wrap(item, method, name, 1 if method == methods[-1] else 0)
+
+def instrument_smarty(smarty):
+
+	"""
+		Profiles the handlers of a `smarty.Smarty`.
+	"""
+
+	for method in SMARTY_HANDLERS:
+		_wrap(smarty, method, "smarty " + method)
+
+def profile_call(function, path = STATS_FILE):
+
+	"""
+		Calls the function with cProfile and dumps the statistics to the file.
+		Returns the result of the function, and the `OSError` that kept the
+		statistics from being written or `None`. If the directory of the
+		file can't be created, the function is called without cProfile.
+	"""
+
+	try:
+		os.makedirs(os.path.dirname(path), exist_ok = True)
+	except OSError as err:
+		return function(), err
+	profiler = cProfile.Profile()
+	result = profiler.runcall(function)
+	try:
+		profiler.dump_stats(path)
+	except OSError as err:
+		return result, err
+	return result, None
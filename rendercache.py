@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+RenderCache – a content-addressed cache of rendered HTML.
+
+The HTML is keyed by a hash of the Markdown text and of the configuration of
+the pipeline that rendered it, so the same text is never rendered twice with
+the same configuration. The cache is bounded by the total size of the HTML it
+holds, and the least recently used entries are evicted first. Optionally, the
+cache is also kept on disk, so it survives a restart of Gedit.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+
+from hashlib import sha256
+from threading import Lock
+from lru import SizedLRU
+
+def fingerprint(configuration):
+
+	"""
+		Returns a string identifying a configuration, given as a dictionary of
+		dictionaries such as `SimpleConfig.to_dict()` returns.
+	"""
+
+	return repr(sorted((section, sorted(values.items())) for section, values in configuration.items()))
+
+def make_key(text, fingerprint):
+
+	"""
+		Returns the cache key of a text, given as a string or as a list of
+		chunks, rendered with a configuration. Both give the same key.
+	"""
+
+	digest = sha256((fingerprint + '\0').encode('utf-8'))
+	for chunk in ([text] if isinstance(text, str) else text):
+		digest.update(chunk.encode('utf-8'))
+	return digest.hexdigest()
+
+class RenderCache:
+
+	"""
+		A least recently used cache of HTML, bounded by its total size in bytes.
+	"""
+
+	def __init__(self, max_size = 32 * 1024 * 1024, directory = None):
+
+		self.directory = directory
+		"""Directory where the cache is kept on disk, or `None`."""
+
+		# Cached HTML, sized in bytes.
+		self._entries = SizedLRU(max_size)
+
+		# Size in bytes of the files on disk.
+		self._disk_size = 0
+
+		# The cache is shared by the render workers of all windows.
+		self._lock = Lock()
+
+		if directory is not None:
+			os.makedirs(directory, exist_ok = True)
+			self._disk_size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith('.html'))
+
+	def __len__(self):
+		return len(self._entries)
+
+	@property
+	def size(self):
+		return self._entries.size
+
+	@property
+	def max_size(self):
+
+		"""
+			Maximum total size in bytes of the cached HTML, in memory as well
+			as on disk.
+		"""
+
+		return self._entries.max_size
+
+	def get(self, key):
+
+		"""
+			Returns the HTML cached under the key, or `None`.
+		"""
+
+		with self._lock:
+			html = self._entries.get(key)
+		if html is not None:
+			return html
+
+		# Fall back to the disk.
+		if self.directory is not None:
+			try:
+				with open(self._path(key), 'rb') as f:
+					html = f.read().decode('utf-8')
+				# The modification time orders the files by recent use.
+				os.utime(self._path(key))
+			except OSError:
+				return None
+			self._store(key, html)
+			return html
+
+		return None
+
+	def put(self, key, html):
+
+		"""
+			Caches the HTML under the key.
+		"""
+
+		self._store(key, html)
+
+		if self.directory is not None:
+			self._write(key, html)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+	def _store(self, key, html):
+		size = len(html.encode('utf-8'))
+		with self._lock:
+			self._entries.put(key, html, size)
+
+	def _path(self, key):
+		return os.path.join(self.directory, key + '.html')
+
+	def _write(self, key, html):
+		path = self._path(key)
+		data = html.encode('utf-8')
+		if len(data) > self.max_size or os.path.exists(path):
+			return
+
+		# Write to a temporary file first, so a reader never sees a partial
+		# file.
+		try:
+			temporary = '{0}.{1}.tmp'.format(path, os.getpid())
+			with open(temporary, 'wb') as f:
+				f.write(data)
+			os.replace(temporary, path)
+		except OSError:
+			return
+
+		with self._lock:
+			self._disk_size += len(data)
+			if self._disk_size > self.max_size:
+				self._prune_disk()
+
+	def _prune_disk(self):
+
+		# Remove the least recently modified files until the cache fits.
+		files = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in os.scandir(self.directory) if entry.name.endswith('.html'))
+		self._disk_size = sum(size for mtime, size, path in files)
+		for mtime, size, path in files:
+			if self._disk_size <= self.max_size:
+				break
+			try:
+				os.remove(path)
+			except OSError:
+				continue
+			self._disk_size -= size
@@ -26,6 +26,7 @@ THE SOFTWARE.
 """
 
 from configparser import ConfigParser, DuplicateSectionError
+from types import MappingProxyType
 
 class SimpleConfig:
 
@@ -94,7 +95,10 @@ class SimpleConfig:
 	def __getitem__(self, key):
 		if self._section is None:
 			raise LookupError("No current section set.")
-		val = self._config[self._section][key]
+		return SimpleConfig.typed(self._config[self._section][key])
+
+	@staticmethod
+	def typed(val):
 		if val.lower() in SimpleConfig.BOOLEAN_STATES:
 			return SimpleConfig.BOOLEAN_STATES[val.lower()]
 		try:
@@ -117,6 +121,22 @@ class SimpleConfig:
 	def get_ConfigParser(self):
 		return self._config
 
+	def snapshot(self, typed = True):
+
+		"""
+			Returns an immutable mapping from section names to immutable
+			mappings of the section's keys and values. The values are converted
+			as by __getitem__(), unless `typed` is `False`. The snapshot doesn't
+			change when the configuration does, and reading it involves no
+			parsing.
+		"""
+
+		convert = SimpleConfig.typed if typed else str
+		return MappingProxyType({
+			section: MappingProxyType({key: convert(val) for key, val in self._config.items(section)})
+			for section in self._config.sections()
+		})
+
 	def to_dict(self):
 		d = {}
 		for section in self._config.sections():
@@ -9,6 +9,12 @@ consecutive dots into curly quotes, EN- and EM-dashes and ellipsis.
 
 The name is a homage to John Gruber's SmartyPants, which serve the same purpose.
 
+The substitutions are made either on HTML, with `Smarty`, or on the element
+tree of Python-Markdown, with the extension `SmartyExtension`. The latter
+spares the parsing of the HTML that Python-Markdown has just serialized. Both
+give the same text, but the extension leaves &, < and > escaped, while `Smarty`
+unescapes them, as it does with all character references.
+
 © 2015 Thomas Barregren <thomas@barregren.se>
 
 Permission is hereby granted, free of charge, to any person obtaining a copy
@@ -31,6 +37,7 @@ THE SOFTWARE.
 """
 
 import re
+from html import escape, unescape
 from html.parser import HTMLParser
 
 class Smarty(HTMLParser):
@@ -48,7 +55,8 @@ class Smarty(HTMLParser):
 			'en-dash'                           : '–',
 			'em-dash'                           : '—'
 		}
-		"""Substitutions to perform."""
+		"""Substitutions to perform. Assign a new dictionary to change them,
+		since they are compiled together with the patterns."""
 	
 		self.patterns = {
 			'left-single-quote'                 : r"^'|(?<=\s)'",
@@ -71,11 +79,19 @@ class Smarty(HTMLParser):
 		"""If `True` the characters &, < and > are converted to corresponding
 		HTML entities. Default: False."""
 
-		# Stack of open elements.
-		self._stack = []
-		
-		# Resulting HTML.
-		self.html = ""
+	@property
+	def html(self):
+		"""Resulting HTML that has not been read yet."""
+		return ''.join(self._chunks)
+
+	@property
+	def substitutions(self):
+		return self._substitutions
+
+	@substitutions.setter
+	def substitutions(self, substitution_dictonary):
+		self._substitutions = substitution_dictonary
+		self._compile()
 
 	@property
 	def patterns(self):
@@ -84,30 +100,101 @@ class Smarty(HTMLParser):
 	@patterns.setter
 	def patterns(self, pattern_dictonary):
 		self._patterns = pattern_dictonary
-		self._regexs = {}
-		for key, pattern in self._patterns.items():
-			self._regexs[key] = re.compile(pattern)
+		self._compile()
+
+	def _compile(self):
+
+		# Both substitutions and patterns are needed, but the constructor sets
+		# one at a time.
+		if not hasattr(self, '_substitutions') or not hasattr(self, '_patterns'):
+			return
+
+		# Compile the patterns of all active substitutions into one regular
+		# expression, with a named group for each of them, and map the group
+		# names to the substitutions. The alternatives are tried in the order
+		# of the substitutions, as when they were applied one by one.
+		alternatives = []
+		self._dispatch = {}
+		for i, (key, substitution) in enumerate(self._substitutions.items()):
+			if substitution:
+				try:
+					pattern = self._patterns[key]
+				except KeyError:
+					raise KeyError("No pattern defined for {}.".format(key))
+				group = '_{}'.format(i)
+				alternatives.append('(?P<{0}>{1})'.format(group, pattern))
+				# Expand escapes the same way as re.sub() does.
+				self._dispatch[group] = re.sub(r'\A', substitution, '')
+		self._regex = re.compile('|'.join(alternatives)) if alternatives else None
 
 	def reset(self):
 		super().reset()
-		self.html = ""
+
+		# Stack of open elements.
+		self._stack = []
+
+		# Number of open raw elements.
+		self._raw = 0
+
+		# Pieces of the current text node. HTMLParser may split a text node
+		# across several calls to handle_data() when it is fed in parts, but
+		# the substitutions must see the whole node.
+		self._data = []
+
+		# Resulting HTML as a list of chunks, which are joined when read.
+		self._chunks = []
+
 		return self
 
 	def feed(self, text):
 		super().feed(text)
 		return self
 
+	def read(self):
+
+		"""
+			Returns the resulting HTML that is finished so far, and removes it
+			from the internal buffer.
+		"""
+
+		html = ''.join(self._chunks)
+		self._chunks = []
+		return html
+
 	def close(self):
 		super().close()
-		return self.html
+		self._flush_data()
+		return self.read()
+
+	def stream(self, pieces):
+
+		"""
+			Feeds an iterable of HTML pieces, yielding resulting HTML as soon as
+			it is finished. Only the unfinished tail of the input is kept in
+			memory.
+		"""
+
+		self.reset()
+		for piece in pieces:
+			super().feed(piece)
+			if self._chunks:
+				yield self.read()
+		html = self.close()
+		if html:
+			yield html
 
 	def handle_starttag(self, tag, attrs):
+		self._flush_data()
 		if tag not in self.empty_elements:
 			self._stack.append(tag)
-		self.html += self.get_starttag_text()
+			if tag in self.raw_elements:
+				self._raw += 1
+		self._chunks.append(self.get_starttag_text())
 
 	def handle_endtag(self, tag):
 
+		self._flush_data()
+
 		# Empty elements are already taken care of.
 		if tag in self.empty_elements: return
 
@@ -115,21 +202,150 @@ class Smarty(HTMLParser):
 		expected_end_tag = self._stack.pop()
 		if tag != expected_end_tag:
 			raise Exception("Expected </{0}> but got </{1}>.".format(expected_end_tag, tag))
+		if tag in self.raw_elements:
+			self._raw -= 1
 
 		# Close the element.
-		self.html += "</{}>".format(tag)
+		self._chunks.append("</{}>".format(tag))
 
 	def handle_data(self, data):
-		if len(self._stack) == 0 or self._stack[0] not in self.raw_elements:
-			for key, substitution in self.substitutions.items():
-				if substitution:
-					try:
-						data = self._regexs[key].sub(substitution, data)
-					except KeyError:
-						raise KeyError("No pattern defined for {}.".format(key))
+		self._data.append(data)
+
+	def handle_comment(self, data):
+		self._flush_data()
+		self._chunks.append('<!--' + data + '-->')
+
+	def _flush_data(self):
+
+		# Nothing to do unless a text node has been collected.
+		if not self._data:
+			return
+		data = ''.join(self._data)
+		self._data = []
+
+		# Nothing inside a raw element is substituted, however deeply nested.
+		if not self._raw:
+			data = self._substitute(data)
 		if self.is_escaping_after:
 			data = escape(data)
-		self.html += data
-		
-	def handle_comment(self, data):
-		self.html += '<!--' + data + '-->'
+		self._chunks.append(data)
+
+	def _substitute(self, data):
+
+		# All substitutions are made in one pass over the data.
+		if self._regex is None:
+			return data
+		dispatch = self._dispatch
+		return self._regex.sub(lambda match: dispatch[match.lastgroup], data)
+
+def makeExtension(**kwargs):
+	return SmartyExtension(**kwargs)
+
+_REFERENCE = re.compile(r'&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[a-zA-Z0-9]+);')
+"""Regular expression matching a character reference."""
+
+_TAG = re.compile(r'<(/?)([a-zA-Z][^\s/>]*)[^>]*>')
+"""Regular expression matching a start or end tag."""
+
+# Python-Markdown is only needed by the extension.
+try:
+	from markdown.extensions import Extension
+	from markdown.treeprocessors import Treeprocessor
+	from markdown.util import HTML_PLACEHOLDER, HTML_PLACEHOLDER_RE
+except ImportError:
+	pass
+else:
+
+	class SmartyExtension(Extension):
+
+		"""
+			Makes the substitutions of a `Smarty` on the element tree of
+			Python-Markdown, instead of on the HTML it produces.
+		"""
+
+		def __init__(self, smarty = None, **kwargs):
+			super().__init__(**kwargs)
+			self.smarty = smarty or Smarty()
+			"""The `Smarty` whose substitutions and elements are used."""
+
+		def extendMarkdown(self, md):
+
+			# The substitutions are made last, when backslash escapes have been
+			# put back, as Smarty would have seen them in the HTML.
+			md.treeprocessors.register(_SmartyTreeprocessor(md, self.smarty), 'smarty_substitutions', -10)
+
+	class _SmartyTreeprocessor(Treeprocessor):
+
+		def __init__(self, md, smarty):
+			super().__init__(md)
+			self.smarty = smarty
+
+		def run(self, root):
+
+			# Raw elements may also be opened and closed by raw HTML in the
+			# text, so those are counted in document order.
+			self._raw = 0
+			self._walk(root, False)
+
+		def _walk(self, element, is_raw):
+
+			# Comments have a function as tag, and their text is left as it is.
+			is_raw = is_raw or element.tag in self.smarty.raw_elements
+			if element.text and isinstance(element.tag, str):
+				element.text = self._substitute(element.text, is_raw)
+			for child in element:
+				self._walk(child, is_raw)
+				if child.tail:
+					child.tail = self._substitute(child.tail, is_raw)
+
+		def _substitute(self, text, is_raw):
+
+			# Most text holds no stashed raw HTML.
+			if '\x02' not in text:
+				return text if is_raw or self._raw else self.smarty._substitute(text)
+
+			# Stashed raw HTML ends the text node, as its tags would have in
+			# the HTML, but a stashed character reference is a part of it. The
+			# reference is put back as the character, as Smarty would have
+			# unescaped it.
+			stash = self.md.htmlStash.rawHtmlBlocks
+			result = []
+			data = []
+			for i, piece in enumerate(HTML_PLACEHOLDER_RE.split(text)):
+				if i % 2 == 0:
+					data.append(piece)
+					continue
+				html = stash[int(piece)]
+				if isinstance(html, str) and _REFERENCE.fullmatch(html):
+					data.append(unescape(html))
+					continue
+				result.append(self._substitute_data(data, is_raw))
+				result.append(HTML_PLACEHOLDER % piece)
+				data = []
+				if isinstance(html, str):
+					stash[int(piece)] = self._substitute_html(html, is_raw)
+			result.append(self._substitute_data(data, is_raw))
+			return ''.join(result)
+
+		def _substitute_data(self, data, is_raw):
+			data = ''.join(data)
+			return data if is_raw or self._raw else self.smarty._substitute(data)
+
+		def _substitute_html(self, html, is_raw):
+
+			# A single tag may open or close a raw element.
+			match = _TAG.fullmatch(html)
+			if match:
+				tag = match.group(2).lower()
+				if tag in self.smarty.raw_elements and tag not in self.smarty.empty_elements:
+					self._raw += -1 if match.group(1) else 1
+				return html
+
+			# Other raw HTML, e.g. a block, is given to Smarty. Raw HTML that
+			# Smarty can't make sense of on its own is left as it is.
+			if is_raw or self._raw:
+				return html
+			try:
+				return self.smarty.reset().feed(html).close()
+			except Exception:
+				return html
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Source map – links the lines of a Markdown document to the blocks of its
+preview, so that the editor and the preview can be scrolled together without
+converting the document again.
+
+A Python-Markdown extension gives each top-level element of the HTML a
+`data-line` attribute with the number, counted from zero, of the first line of
+the top-level block of Markdown it was converted from. The blocks are the ones
+of `blocks.split_blocks_with_lines()`. The sorted numbers in the HTML form the
+index of the preview. A line of the document is looked up in the index by
+bisection, and the page is scrolled to the element with the number found.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import re
+
+from bisect import bisect_right
+from blocks import DEFINITION, DEFINITION_LIST_ITEM, FOOTNOTE_DEFINITION, split_blocks_with_lines
+
+ATTRIBUTE = 'data-line'
+"""Attribute with the first line of the block an element was converted from."""
+
+TITLE_PREFIX = "gedit-markdown-line:"
+"""Prefix of the page title when the page reports the line at its top."""
+
+SYNC_SCRIPT = """
+var geditMarkdownIgnoreScroll = false;
+var geditMarkdownReported = null;
+function geditMarkdownScrollToLine(line) {
+	var node = document.querySelector('[%(attribute)s="' + line + '"]');
+	if (node !== null) {
+		var before = window.pageYOffset;
+		node.scrollIntoView();
+		geditMarkdownIgnoreScroll = window.pageYOffset !== before;
+		geditMarkdownReported = null;
+	}
+}
+window.addEventListener('scroll', function () {
+	if (geditMarkdownIgnoreScroll) {
+		geditMarkdownIgnoreScroll = false;
+		return;
+	}
+	var nodes = document.querySelectorAll('[%(attribute)s]');
+	for (var i = 0; i < nodes.length; i++) {
+		if (nodes[i].getBoundingClientRect().bottom > 0) {
+			var line = nodes[i].getAttribute('%(attribute)s');
+			if (line !== geditMarkdownReported) {
+				geditMarkdownReported = line;
+				document.title = '%(prefix)s' + line;
+			}
+			return;
+		}
+	}
+});
+""" % {'attribute': ATTRIBUTE, 'prefix': TITLE_PREFIX}
+"""JavaScript that scrolls the page to a line, and reports the line at the top
+of the page when the user scrolls it."""
+
+# Paragraph put before each block by the preprocessor. Python-Markdown removes
+# STX and ETX from the text before, so the marker can't occur in the document.
+_MARKER = '\x02gedit-markdown-line:{0}\x03'
+_MARKER_PATTERN = re.compile('\x02gedit-markdown-line:(\\d+)\x03')
+
+_ATTRIBUTE_PATTERN = re.compile(ATTRIBUTE + r'="(\d+)"')
+_STRIP_PATTERN = re.compile(r'<div ' + ATTRIBUTE + r'="\d+"></div>\n?| ' + ATTRIBUTE + r'="\d+"')
+
+def index(html):
+
+	"""
+		Returns the sorted list of the lines in the `data-line` attributes of
+		the HTML.
+	"""
+
+	return sorted({int(line) for line in _ATTRIBUTE_PATTERN.findall(html)})
+
+def block_line(index, line):
+
+	"""
+		Returns the first line of the block containing the line, given the
+		index of the preview, or `None` if the line is before the first block.
+	"""
+
+	i = bisect_right(index, line)
+	return index[i - 1] if i else None
+
+def parse_title(title):
+
+	"""
+		Returns the line reported by a page title, or `None` if the title
+		isn't a report.
+	"""
+
+	if not title or not title.startswith(TITLE_PREFIX) or not title[len(TITLE_PREFIX):].isdigit():
+		return None
+	return int(title[len(TITLE_PREFIX):])
+
+def shift(html, offset):
+
+	"""
+		Returns the HTML with `offset` added to the lines in its `data-line`
+		attributes, for HTML converted from a part of a document.
+	"""
+
+	if not offset:
+		return html
+	return _ATTRIBUTE_PATTERN.sub(lambda match: '{0}="{1}"'.format(ATTRIBUTE, int(match.group(1)) + offset), html)
+
+def strip(html):
+
+	"""
+		Returns the HTML without `data-line` attributes.
+	"""
+
+	return _STRIP_PATTERN.sub('', html)
+
+def _starts_with_definition(block):
+
+	# Whether the first line of the block, after any link reference,
+	# abbreviation and footnote definitions that are removed from it, is a
+	# definition of a definition list.
+	for line in block.split('\n'):
+		if line.strip() and not DEFINITION.match(line) and not FOOTNOTE_DEFINITION.match(line):
+			return DEFINITION_LIST_ITEM.match(line) is not None
+	return False
+
+def makeExtension(**kwargs):
+	return SourceLineExtension(**kwargs)
+
+# Python-Markdown is only needed by the extension.
+try:
+	from markdown.extensions import Extension
+	from markdown.postprocessors import Postprocessor
+	from markdown.preprocessors import Preprocessor
+	from markdown.treeprocessors import Treeprocessor
+	from markdown.util import HTML_PLACEHOLDER_RE
+except ImportError:
+	pass
+else:
+
+	class SourceLineExtension(Extension):
+
+		"""
+			Gives the top-level elements a `data-line` attribute.
+		"""
+
+		def extendMarkdown(self, md):
+
+			# The markers are put in after the whitespace is normalized, but
+			# before code and raw HTML are stashed away. They are taken out
+			# before any other tree processor, e.g. footnotes, sees them.
+			md.preprocessors.register(_MarkerPreprocessor(md), 'source_line', 28)
+			md.treeprocessors.register(_MarkerTreeprocessor(md), 'source_line', 55)
+			md.postprocessors.register(_MarkerPostprocessor(md), 'source_line', 1)
+
+	class _MarkerPreprocessor(Preprocessor):
+
+		def run(self, lines):
+			result = []
+			for first_line, block in split_blocks_with_lines('\n'.join(lines)):
+
+				# A marker before a definition would be taken as its term.
+				# Only the first block can start with one, since definitions
+				# continue the block before them.
+				if not _starts_with_definition(block):
+					result.append(_MARKER.format(first_line))
+					result.append('')
+				result.extend(block.split('\n'))
+				result.append('')
+
+			# The text ends with a blank line, as after the normalization.
+			result.append('')
+			return result
+
+	class _MarkerTreeprocessor(Treeprocessor):
+
+		def run(self, root):
+
+			# Remove the marker paragraphs, and give their line to the first
+			# element following each of them. A paragraph that only holds a
+			# placeholder for stashed code or raw HTML, or raw HTML that is
+			# stashed later, is replaced by the stash, so the line is given to
+			# an empty element before it.
+			line = None
+			for element in list(root):
+				text = (element.text or '').strip() if element.tag == 'p' and len(element) == 0 else ''
+				match = _MARKER_PATTERN.fullmatch(text)
+				if match:
+					root.remove(element)
+					line = match.group(1)
+				elif line is not None:
+					if HTML_PLACEHOLDER_RE.fullmatch(text) or text.startswith('<'):
+						anchor = element.makeelement('div', {ATTRIBUTE: line})
+						root.insert(list(root).index(element), anchor)
+					else:
+						element.set(ATTRIBUTE, line)
+					line = None
+
+	class _MarkerPostprocessor(Postprocessor):
+
+		def run(self, text):
+
+			# Markers that ended up in raw HTML are of no use.
+			return _MARKER_PATTERN.sub('', text)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stand-in for an external tool run as a co-process by the tests of `coprocess`.
+
+Speaks the protocol with `coprocess.serve()` and returns every document in
+upper case, except that a document of `crash` makes it exit and a document of
+`hang` makes it stop answering. With the argument `early`, it sends an answer
+before it has read anything.
+
+Usage: coprocess_stub.py [nul|length|early]
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coprocess import encode, serve
+
+def convert(text):
+	if text == 'crash':
+		os._exit(1)
+	if text == 'hang':
+		time.sleep(60)
+	return text.upper()
+
+if __name__ == '__main__':
+	mode = sys.argv[1] if len(sys.argv) > 1 else 'nul'
+	if mode == 'early':
+		sys.stdout.buffer.write(encode('early', 'nul'))
+		sys.stdout.buffer.flush()
+		time.sleep(60)
+	else:
+		serve(convert, mode)
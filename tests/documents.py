@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Random Markdown documents for the tests of `blocks` and `sourcemap`, which
+compare converting a document in parts with converting it whole.
+
+The documents are put together from pieces that are easily split wrong, with
+no, one or more blank lines between them.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import random
+
+PIECES = [
+	'para text', 'see [a]', '*a* "q"', 'HTML', '# head', '## Items', 'Setext\n---', '***',
+	'> quote', '> quote two\n> more', '- item', '- item\n\n  more', '* star', '  - nested',
+	'1. one', '2. two', '    indented', '    more', '```\ncode\n\nmore\n```', '<div>', '</div>',
+	'<div>inline</div>', '<p>', '</p>', '<hr>', '<!-- c', 'c -->', 'term', ': def', 'term\n: def',
+	'[a]: http://x', '*[HTML]: Hyper', '| a | b |\n|---|---|\n| 1 | 2 |'
+]
+"""Pieces of the documents."""
+
+SEPARATORS = ['\n', '\n\n', '\n\n', '\n\n\n']
+"""Separators of the pieces."""
+
+def random_documents(seed, count, size = 8):
+
+	"""
+		Returns a list of `count` documents of at most `size` pieces, the same
+		for the same seed.
+	"""
+
+	generator = random.Random(seed)
+	documents = []
+	for i in range(count):
+		pieces = [generator.choice(PIECES)]
+		for j in range(generator.randint(0, size - 1)):
+			pieces.append(generator.choice(SEPARATORS) + generator.choice(PIECES))
+		documents.append(''.join(pieces))
+	return documents
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `assets`, the cache of the local images of the previews.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os, tempfile, unittest
+
+from assets import AssetCache
+
+class AssetCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def write(self, name, data):
+		path = os.path.join(self.directory.name, name)
+		with open(path, 'wb') as f:
+			f.write(data)
+		return path
+
+	def test_image_is_read_once(self):
+		cache = AssetCache()
+		path = self.write('a.png', b'png')
+		self.assertEqual(cache.data_uri(path), 'data:image/png;base64,cG5n')
+		self.assertEqual(cache.data_uri(path), 'data:image/png;base64,cG5n')
+		self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+	def test_changed_image_is_read_again(self):
+		cache = AssetCache()
+		path = self.write('a.png', b'png')
+		cache.data_uri(path)
+		self.write('a.png', b'png!')
+		self.assertEqual(cache.data_uri(path), 'data:image/png;base64,cG5nIQ==')
+
+	def test_stylesheets_and_pages_are_not_cached(self):
+		cache = AssetCache()
+		self.assertIsNone(cache.data_uri(self.write('a.css', b'@import "b.css";')))
+		self.assertIsNone(cache.data_uri(self.write('a.html', b'<p>')))
+		self.assertIsNone(cache.data_uri(os.path.join(self.directory.name, 'missing.png')))
+		self.assertIsNone(cache.data_uri(self.directory.name + '.png'))
+
+	def test_least_recently_used_image_is_evicted(self):
+		cache = AssetCache(70)
+		a = self.write('a.png', b'a' * 24)
+		b = self.write('b.png', b'b' * 24)
+		cache.data_uri(a)
+		cache.data_uri(b)
+		self.assertEqual(len(cache), 1)
+		self.assertLessEqual(cache.size, 70)
+		cache.data_uri(b)
+		self.assertEqual(cache.hits, 1)
+		self.assertIsNone(cache.data_uri(self.write('c.png', b'c' * 60)))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `batchrender`, the rendering of a directory tree of Markdown files
+that skips the files that haven't changed since the last build.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import io, json, os, tempfile, unittest
+
+try:
+	from batchrender import MANIFEST, build
+except ImportError:
+	raise unittest.SkipTest("PyXDG is not installed")
+
+try:
+	import markdown
+except ImportError:
+	markdown = None
+
+@unittest.skipIf(markdown is None, "Python-Markdown is not installed")
+class BuildTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.source = os.path.join(self.directory.name, 'source')
+		self.output = os.path.join(self.directory.name, 'output')
+		self.config = os.path.join(self.directory.name, 'config')
+		os.makedirs(os.path.join(self.source, 'sub'))
+		self.write('a.md', '# A')
+		self.write('sub/b.md', '# B')
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def write(self, relative, text, mtime = None):
+		path = os.path.join(self.source, relative)
+		with open(path, 'w', encoding = 'utf-8') as f:
+			f.write(text)
+		if mtime is not None:
+			os.utime(path, (mtime, mtime))
+
+	def build(self, force = False):
+
+		# Returns the numbers of rendered, skipped and failed files.
+		out = io.StringIO()
+		build(self.source, self.output, self.config, 1, force, out)
+		words = out.getvalue().split('\n')[0].replace(',', '').split()
+		return int(words[1]), int(words[4]), int(words[6])
+
+	def test_unchanged_files_are_skipped(self):
+		self.assertEqual(self.build(), (2, 0, 0))
+		self.assertEqual(self.build(), (0, 2, 0))
+		with open(os.path.join(self.output, 'sub', 'b.html'), encoding = 'utf-8') as f:
+			self.assertIn('B</h1>', f.read())
+
+	def test_changed_files_are_rendered(self):
+		self.build()
+		self.write('a.md', '# Changed', 1)
+		self.assertEqual(self.build(), (1, 1, 0))
+		with open(os.path.join(self.output, 'a.html'), encoding = 'utf-8') as f:
+			self.assertIn('Changed</h1>', f.read())
+
+	def test_touched_files_with_same_content_are_skipped(self):
+		self.build()
+		self.write('a.md', '# A', 1)
+		self.assertEqual(self.build(), (0, 2, 0))
+		with open(os.path.join(self.output, MANIFEST), encoding = 'utf-8') as f:
+			self.assertEqual(json.load(f)['files']['a.md']['mtime'], 1)
+
+	def test_missing_targets_are_rendered(self):
+		self.build()
+		os.remove(os.path.join(self.output, 'a.html'))
+		self.assertEqual(self.build(), (1, 1, 0))
+
+	def test_force_and_changed_configuration_render_all(self):
+		self.build()
+		self.assertEqual(self.build(True), (2, 0, 0))
+		with open(self.config, 'w', encoding = 'utf-8') as f:
+			f.write('[Internal Markdown]\noutput_format = html\n')
+		self.assertEqual(self.build(), (2, 0, 0))
+
+if __name__ == '__main__':
+	unittest.main()
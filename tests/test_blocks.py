@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `blocks`, the splitting of Markdown text into top-level blocks.
+
+Converting a text block by block must give the same HTML as converting it as a
+whole, apart from the whitespace between the blocks.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import re, unittest
+
+from blocks import BlockCache, split_blocks_with_lines, split_document
+from .documents import random_documents
+
+try:
+	import markdown
+except ImportError:
+	markdown = None
+
+def _normalize(html):
+
+	# Whitespace between the top-level elements depends on how they are
+	# joined.
+	return re.sub(r'\s+', ' ', re.sub(r'>\s+<', '><', html)).strip()
+
+class SplitTest(unittest.TestCase):
+
+	def assertBlocks(self, text, blocks):
+		self.assertEqual(split_blocks_with_lines(text), blocks)
+
+	def test_paragraphs(self):
+		self.assertBlocks('a\nb\n\n\nc\n', [(0, 'a\nb'), (4, 'c')])
+
+	def test_fenced_code(self):
+		self.assertBlocks('```\na\n\nb\n```\n\nc', [(0, '```\na\n\nb\n```'), (6, 'c')])
+		self.assertBlocks('~~~~\n~~~\n\n~~~~\n\nc', [(0, '~~~~\n~~~\n\n~~~~'), (5, 'c')])
+
+	def test_lists(self):
+		self.assertBlocks('- a\n\n- b\n\nc', [(0, '- a\n\n- b'), (4, 'c')])
+		self.assertBlocks('1. a\n\n    b\n\n2. c', [(0, '1. a\n\n    b\n\n2. c')])
+		self.assertBlocks('## Items\n- a\n\n- b\n', [(0, '## Items\n- a\n\n- b')])
+
+	def test_definition_lists(self):
+		self.assertBlocks('a\n: b\n\nc\n\n: d\n\ne', [(0, 'a\n: b\n\nc\n\n: d'), (7, 'e')])
+		self.assertBlocks('a\n: b\n\n```\nc\n\n```\n\n: d', [(0, 'a\n: b\n\n```\nc\n\n```\n\n: d')])
+
+	def test_block_quotes(self):
+		self.assertBlocks('> a\n\n> b', [(0, '> a\n\n> b')])
+		self.assertBlocks('> a\n\nb', [(0, '> a'), (2, 'b')])
+
+	def test_raw_html(self):
+		self.assertBlocks('<div>\n\nx\n\n</div>\n\ny', [(0, '<div>\n\nx\n\n</div>'), (6, 'y')])
+		self.assertBlocks('<div>\n<div>\n\n</div>\n\n</div>\n\ny', [(0, '<div>\n<div>\n\n</div>\n\n</div>'), (7, 'y')])
+		self.assertBlocks('<div>a</div>\n\nb', [(0, '<div>a</div>'), (2, 'b')])
+		self.assertBlocks('<!-- a\n\n</div> -->\n\nb', [(0, '<!-- a\n\n</div> -->'), (4, 'b')])
+		self.assertBlocks('<span>\n\nb', [(0, '<span>'), (2, 'b')])
+
+	def test_definitions(self):
+		blocks, shared, is_splittable = split_document('[a]: http://a\n\n```\n[b]: http://b\n```\n\n<div>\n[c]: http://c\n</div>')
+		self.assertEqual(shared, '[a]: http://a')
+		self.assertTrue(is_splittable)
+
+		self.assertEqual(split_document('[a]:\n  http://a\n  "A"\n\nb')[1], '[a]:\n  http://a\n  "A"')
+
+	def test_not_splittable(self):
+		self.assertFalse(split_document('a[^1]\n\n[^1]: b')[2])
+		self.assertFalse(split_document('```\na\n\nb')[2])
+		self.assertFalse(split_document('<div>\n\na')[2])
+
+		# Lines that look like definitions, but are terms of a definition
+		# list, a heading or cells of a table.
+		self.assertFalse(split_document('[a]: http://x\nterm\n: def\n\nsee [a]')[2])
+		self.assertFalse(split_document('[a]: http://x\n---\n\nsee [a]')[2])
+		self.assertFalse(split_document('| a |\n|---|\n[a]: http://x\n\nsee [a]')[2])
+
+class BlockCacheTest(unittest.TestCase):
+
+	def test_unchanged_blocks_are_reused(self):
+		converted = []
+		cache = BlockCache(lambda text: converted.append(text) or text.upper())
+		cache.render('a\n\nb')
+		del converted[:]
+		self.assertEqual(cache.render('a\n\nc'), 'A\n\n\nC\n\n')
+		self.assertEqual(converted, ['c\n\n'])
+
+	def test_not_splittable_text_is_converted_whole(self):
+		converted = []
+		cache = BlockCache(lambda text: converted.append(text) or text)
+		cache.render('<div>\n\na')
+		self.assertEqual(converted, ['<div>\n\na'])
+
+@unittest.skipIf(markdown is None, "Python-Markdown is not installed")
+class EquivalenceTest(unittest.TestCase):
+
+	texts = [
+		'<div>\n\nx\n\n</div>',
+		'<div>\n<div>\n\nx\n</div>\n\ny\n\n</div>\n\nz',
+		'<div>\n\n<!-- c\n\n</div>\n\n# head\n\nc -->',
+		'<p>\n\n[a]: http://x\n\n</p>\n\nsee [a]',
+		'> a\n\n> b\n\nc',
+		'```\na\n\nb\n```\n\n- a\n\n- b\n\n    c\n\nd',
+		'1. one\n\n[a]: http://x\n\n    indented',
+		'term\n: def\n\nterm\n: def\n\npara',
+		'see [a]\n\n*[HTML]: Hyper Text\n\nHTML\n\n[a]: http://x',
+		'## Items\n- a\n\n- b\n',
+		'# Steps\n1. one\n\n2. two',
+		'[a]: http://x\nterm\n: def'
+	]
+	"""Texts that are easily split wrong."""
+
+	def test_block_by_block_is_whole(self):
+		md = markdown.Markdown(extensions = ['extra'])
+		convert = lambda text: md.reset().convert(text)
+		for text in self.texts:
+			with self.subTest(text = text):
+				self.assertEqual(_normalize(BlockCache(convert).render(text)), _normalize(convert(text)))
+
+	def test_random_documents(self):
+		md = markdown.Markdown(extensions = ['extra', 'sane_lists'])
+		convert = lambda text: md.reset().convert(text)
+		for text in random_documents(1, 500):
+			with self.subTest(text = text):
+				self.assertEqual(_normalize(BlockCache(convert).render(text)), _normalize(convert(text)))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `chain`, external commands connected by pipes.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import shlex, sys, unittest
+
+from threading import Event
+from time import monotonic
+
+import chain
+
+def python(code):
+	return ' '.join(shlex.quote(argument) for argument in (sys.executable, '-c', code))
+
+UPPER = python("import sys; sys.stdout.write(sys.stdin.read().upper())")
+"""Command writing its input in upper case."""
+
+class ChainTest(unittest.TestCase):
+
+	def test_commands_are_chained(self):
+		output, errors, timed_out = chain.run([UPPER, python("import sys; sys.stdout.write(sys.stdin.read()[::-1])")], ['ab', 'cd', 'é'], [10, 10])
+		self.assertEqual(''.join(output), 'ÉDCBA')
+		self.assertEqual(timed_out, set())
+
+	def test_large_input(self):
+		text = 'x' * 1000000
+		output, errors, timed_out = chain.run([UPPER, UPPER], [text[i:i + 4096] for i in range(0, len(text), 4096)], [10, 10])
+		self.assertEqual(''.join(output), text.upper())
+
+	def test_error_output(self):
+		output, errors, timed_out = chain.run([python("import sys; sys.stderr.write('bad'); sys.exit(1)"), UPPER], ['a'], [10, 10])
+		self.assertEqual(errors[0], 'bad')
+		self.assertEqual(errors[1], '')
+
+	def test_timeout(self):
+		started = monotonic()
+		output, errors, timed_out = chain.run([UPPER, python("import time; time.sleep(30)")], ['a'], [10, 0.5])
+		self.assertEqual(timed_out, {1})
+		self.assertLess(monotonic() - started, 10)
+
+	def test_cancelled(self):
+		cancelled = Event()
+		cancelled.set()
+		self.assertRaises(chain.Cancelled, chain.run, [python("import time; time.sleep(30)")], ['a'], [30], cancelled)
+
+	def test_missing_command(self):
+		self.assertRaises(OSError, chain.run, ['gedit-markdown-no-such-command'], ['a'], [10])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `configuration`, the reading and sharing of the configuration.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os, tempfile, unittest
+
+try:
+	import configuration
+except ImportError:
+	raise unittest.SkipTest("PyXDG is not installed")
+
+class SharedConfigurationTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file = os.path.join(self.directory.name, 'gedit-markdown')
+		configuration._shared_configuration = (None, None, None)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_defaults_are_written_after_read_without_file(self):
+		configuration.shared_configuration(self.file)
+		self.assertFalse(os.path.exists(self.file))
+		configuration.shared_configuration(self.file, True)
+		self.assertTrue(os.path.exists(self.file))
+
+	def test_unchanged_file_is_not_read_again(self):
+		cfg = configuration.shared_configuration(self.file, True)
+		self.assertIs(configuration.shared_configuration(self.file, True), cfg)
+		self.assertIs(configuration.shared_configuration(self.file), cfg)
+
+	def test_changed_file_is_read_again(self):
+		configuration.shared_configuration(self.file, True)
+		with open(self.file, 'w') as f:
+			f.write('[General]\nlive_preview = Yes\n')
+		cfg = configuration.shared_configuration(self.file)
+		self.assertIs(cfg.snapshot()['General']['live_preview'], True)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `coprocess`, the conversion of documents by a long-running tool.
+
+The tool is `coprocess_stub.py`, which speaks the protocol with
+`coprocess.serve()`.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import io, os, shlex, sys, unittest
+
+from subprocess import TimeoutExpired
+from coprocess import CoProcess, CoProcessError, decode, encode, serve
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'coprocess_stub.py')
+"""The stand-in for the tool."""
+
+def stub(mode = 'nul'):
+	return ' '.join(shlex.quote(argument) for argument in (sys.executable, STUB, mode))
+
+class FramingTest(unittest.TestCase):
+
+	def test_round_trip(self):
+		for framing in ('nul', 'length'):
+			with self.subTest(framing = framing):
+				data = encode('åb', framing) + encode('c', framing)
+				self.assertEqual(decode(data, framing), ('åb', len(encode('åb', framing))))
+				self.assertIsNone(decode(data[:3], framing))
+
+	def test_nul(self):
+		self.assertEqual(decode(encode('a\0b', 'nul'), 'nul'), ('ab', 3))
+		self.assertEqual(decode(encode('a\0b', 'length'), 'length'), ('a\0b', 5))
+
+	def test_malformed_header(self):
+		self.assertRaises(CoProcessError, decode, b'x\n', 'length')
+
+	def test_serve(self):
+		output = io.BytesIO()
+		serve(str.upper, 'length', io.BufferedReader(io.BytesIO(encode('a', 'length') + encode('b', 'length'))), output)
+		self.assertEqual(output.getvalue(), encode('A', 'length') + encode('B', 'length'))
+
+class CoProcessTest(unittest.TestCase):
+
+	def setUp(self):
+		self.coprocesses = []
+
+	def tearDown(self):
+		for coprocess in self.coprocesses:
+			coprocess.stop()
+
+	def coprocess(self, mode = 'nul', timeout = 10):
+		coprocess = CoProcess(stub(mode), timeout, 'length' if mode == 'length' else 'nul')
+		self.coprocesses.append(coprocess)
+		return coprocess
+
+	def test_tool_is_kept_running(self):
+		for mode in ('nul', 'length'):
+			with self.subTest(framing = mode):
+				coprocess = self.coprocess(mode)
+				self.assertEqual(coprocess.convert('a'), 'A')
+				pid = coprocess._process.pid
+				self.assertEqual(coprocess.convert('b' * 300000), 'B' * 300000)
+				self.assertEqual(coprocess._process.pid, pid)
+
+	def test_crash(self):
+		coprocess = self.coprocess()
+		coprocess.convert('a')
+		self.assertRaises(CoProcessError, coprocess.convert, 'crash')
+		self.assertEqual(coprocess.convert('b'), 'B')
+
+	def test_timeout(self):
+		coprocess = self.coprocess(timeout = 0.5)
+		self.assertRaises(TimeoutExpired, coprocess.convert, 'hang')
+		self.assertIsNone(coprocess._process)
+		coprocess.timeout = 10
+		self.assertEqual(coprocess.convert('b'), 'B')
+
+	def test_answer_before_request_is_read(self):
+		coprocess = self.coprocess('early')
+		self.assertRaises(CoProcessError, coprocess.convert, 'x' * 1000000)
+		self.assertIsNone(coprocess._process)
+
+	def test_unknown_framing(self):
+		self.assertRaises(ValueError, CoProcess, stub(), 10, 'lines')
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `lazy`, the preview that renders the sections of a large document
+as they are scrolled into view.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+from lazy import LazyDocument, TITLE_PREFIX, parse_title
+
+class LazyTest(unittest.TestCase):
+
+	def document(self, text, section_lines = 4):
+		return LazyDocument(text, lambda text: '<p>{0}</p>'.format(text.strip().replace('\n\n', '</p><p>')), section_lines)
+
+	def test_sections(self):
+		document = self.document('\n\n'.join('p{0}'.format(i) for i in range(10)))
+		self.assertEqual(len(document), 5)
+		self.assertEqual(document.section_at(0), 0)
+		self.assertEqual(document.section_at(9), 2)
+		self.assertEqual(document.render_section(1), '<p>p2</p><p>p3</p>')
+
+	def test_definitions_are_given_to_every_section(self):
+		document = self.document('[a]: http://x\n\np1\n\np2\n\np3\n\np4')
+		self.assertTrue(document.render_section(1).endswith('[a]: http://x</p>'))
+
+	def test_footnotes_and_open_constructs_give_one_section(self):
+		self.assertEqual(len(self.document('a[^1]\n\nb\n\nc\n\nd\n\n[^1]: e')), 1)
+		self.assertEqual(len(self.document('a\n\nb\n\nc\n\n<div>\n\nd')), 1)
+
+	def test_page_renders_around_the_line(self):
+		document = self.document('\n\n'.join('p{0}'.format(i) for i in range(20)))
+		page = document.page(20)
+		self.assertEqual(page.count('gedit-markdown-placeholder"'), len(document) - 3)
+		self.assertIn('<div id="s5" class="gedit-markdown-section"><p>p10</p><p>p11</p></div>', page)
+
+	def test_parse_title(self):
+		self.assertEqual(parse_title(TITLE_PREFIX + '3:1,4'), {1, 4})
+		self.assertIsNone(parse_title('Document'))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `lru`, the least recently used mapping bounded by the size of its
+values.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+from lru import SizedLRU
+
+class SizedLRUTest(unittest.TestCase):
+
+	def test_least_recently_used_is_evicted(self):
+		lru = SizedLRU(10)
+		lru.put('a', 1, 4)
+		lru.put('b', 2, 4)
+		self.assertEqual(lru.get('a'), 1)
+		lru.put('c', 3, 4)
+		self.assertNotIn('b', lru)
+		self.assertEqual((lru.get('a'), lru.get('b', 0), lru.get('c')), (1, 0, 3))
+		self.assertEqual((len(lru), lru.size), (2, 8))
+
+	def test_value_is_replaced(self):
+		lru = SizedLRU(10)
+		lru.put('a', 1, 4)
+		lru.put('a', 2, 6)
+		self.assertEqual((lru.get('a'), lru.size), (2, 6))
+
+	def test_value_too_large_is_not_put(self):
+		lru = SizedLRU(10)
+		lru.put('a', 1, 4)
+		self.assertFalse(lru.put('a', 2, 11))
+		self.assertNotIn('a', lru)
+		self.assertEqual(lru.size, 0)
+
+	def test_resize_and_clear(self):
+		lru = SizedLRU(10)
+		for key in 'abc':
+			lru.put(key, key, 3)
+		lru.resize(4)
+		self.assertEqual((list(key for key in 'abc' if key in lru), lru.size), (['c'], 3))
+		lru.clear()
+		self.assertEqual((len(lru), lru.size), (0, 0))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `memo`, the memoization of expensive functions of Markdown
+extensions.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+import memo
+
+class Highlighter:
+
+	"""
+		Stands in for an extension class with an expensive method.
+	"""
+
+	calls = 0
+
+	def __init__(self, code):
+		self.code = code
+
+	def hilite(self, linenums = False):
+		Highlighter.calls += 1
+		return '<pre>{0}</pre>'.format(self.code)
+
+TARGET = __name__ + ':Highlighter.hilite'
+"""The method as a target of `memo.memoize()`."""
+
+class MemoTest(unittest.TestCase):
+
+	def test_least_recently_used_result_is_evicted(self):
+		cache = memo.Memo(10)
+		cache.call('f', str.upper, None, ('aaaa',), {})
+		cache.call('f', str.upper, None, ('bbbb',), {})
+		cache.call('f', str.upper, None, ('aaaa',), {})
+		cache.call('f', str.upper, None, ('cccc',), {})
+		self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 3, 2))
+		cache.call('f', str.upper, None, ('aaaa',), {})
+		self.assertEqual(cache.hits, 2)
+		cache.resize(4)
+		self.assertEqual((len(cache), cache.size), (1, 4))
+
+	def test_bypassed(self):
+		cache = memo.Memo()
+		with cache.bypassed():
+			cache.call('f', str.upper, None, ('a',), {})
+			cache.call('f', str.upper, None, ('a',), {})
+		self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 0))
+		cache.call('f', str.upper, None, ('a',), {})
+		self.assertEqual(cache.misses, 1)
+
+	def test_results_too_large_are_not_cached(self):
+		cache = memo.Memo(2)
+		self.assertEqual(cache.call('f', str.upper, None, ('abc',), {}), 'ABC')
+		self.assertEqual(len(cache), 0)
+
+class UseTest(unittest.TestCase):
+
+	def setUp(self):
+		Highlighter.calls = 0
+		self.original = Highlighter.hilite
+
+	def tearDown(self):
+		Highlighter.hilite = self.original
+		memo._memoized.pop(TARGET, None)
+		memo.memo.clear()
+
+	def test_method_is_keyed_by_instance_and_arguments(self):
+		memo.use([TARGET], 1024)
+		try:
+			self.assertEqual(Highlighter('a').hilite(), '<pre>a</pre>')
+			Highlighter('a').hilite()
+			Highlighter('b').hilite()
+			Highlighter('a').hilite(linenums = True)
+			self.assertEqual(Highlighter.calls, 3)
+		finally:
+			memo.release([TARGET], 1024)
+
+	def test_method_is_restored_when_unused(self):
+		memo.use([TARGET], 1024)
+		memo.use([TARGET], 2048)
+		self.assertIsNot(Highlighter.hilite, self.original)
+		self.assertEqual(memo.memo.max_size, 2048)
+		memo.release([TARGET], 2048)
+		self.assertIsNot(Highlighter.hilite, self.original)
+		self.assertEqual(memo.memo.max_size, 1024)
+		memo.release([TARGET], 1024)
+		self.assertIs(Highlighter.hilite, self.original)
+
+	def test_nothing_is_memoized_if_a_target_fails(self):
+		self.assertRaises(AttributeError, memo.use, [TARGET, __name__ + ':Highlighter.missing'], 1024)
+		self.assertIs(Highlighter.hilite, self.original)
+		self.assertNotIn(TARGET, memo._memoized)
+
+if __name__ == '__main__':
+	unittest.main()
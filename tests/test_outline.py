@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `outline`, the incrementally updated outline of the headings of a
+document.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import random, unittest
+
+import outline as outline_module
+
+from outline import Heading, Outline, anchors
+
+try:
+	import markdown
+except ImportError:
+	markdown = None
+
+class Document:
+
+	"""
+		A document as a list of lines, with an outline that is told about
+		every edit.
+	"""
+
+	def __init__(self, text):
+		self.lines = text.split('\n')
+		self.outline = Outline(self.lines.__getitem__, self.lines.__len__)
+
+	def replace(self, first, old_count, text):
+		new_lines = text.split('\n')
+		self.lines[first:first + old_count] = new_lines
+		self.outline.edit(first, old_count, len(new_lines))
+
+class OutlineTest(unittest.TestCase):
+
+	text = '# One\n\nText\n\nTwo\n===\n\n```\n# Code\n```\n\n### Three ###\nSub\n---'
+
+	def test_headings(self):
+		self.assertEqual(Document(self.text).outline.headings(), [
+			Heading(0, 1, 'One'),
+			Heading(4, 1, 'Two'),
+			Heading(11, 3, 'Three'),
+			Heading(12, 2, 'Sub')
+		])
+
+	def test_heading_at(self):
+		outline = Document(self.text).outline
+		self.assertEqual(outline.heading_at(3), Heading(0, 1, 'One'))
+		self.assertEqual(outline.heading_at(8), Heading(4, 1, 'Two'))
+		self.assertIsNone(Document('Text\n# One').outline.heading_at(0))
+
+	def test_edits(self):
+		document = Document(self.text)
+		document.outline.headings()
+
+		# Removing the underline makes a paragraph of the heading.
+		document.replace(5, 1, '')
+		self.assertEqual([heading.title for heading in document.outline.headings()], ['One', 'Three', 'Sub'])
+
+		# Removing the opening fence makes the closing fence open code.
+		document.replace(7, 1, 'x')
+		self.assertEqual([heading.title for heading in document.outline.headings()], ['One', 'Code'])
+		document.replace(9, 1, 'y')
+		self.assertEqual([heading.title for heading in document.outline.headings()], ['One', 'Code', 'Three', 'Sub'])
+
+		# Inserting lines shifts the headings after them.
+		document.replace(0, 1, '# Zero\n\n# One')
+		self.assertEqual(document.outline.headings()[1], Heading(2, 1, 'One'))
+
+	def test_raw_html(self):
+		document = Document('<div>\n# In\n<div>\n</div>\n# Nested\n</div>\n# Out\n\n<!-- a\n# Comment\n-->\n# After\n\n<p>x</p>\n# Line')
+		self.assertEqual([heading.title for heading in document.outline.headings()], ['Out', 'After', 'Line'])
+		self.assertIsNone(document.outline.heading_at(5))
+		self.assertEqual(document.outline.heading_at(10), Heading(6, 1, 'Out'))
+
+		# A comment that isn't closed is text.
+		document.replace(10, 1, '')
+		self.assertEqual([heading.title for heading in document.outline.headings()], ['Out', 'Comment', 'After', 'Line'])
+
+		# An element that isn't closed is open to the end.
+		document.replace(4, 2, '')
+		self.assertEqual([heading.title for heading in document.outline.headings()], [])
+
+		# Tags in code don't start a block.
+		document = Document('```\n<div>\n```\n# Out')
+		self.assertEqual([heading.title for heading in document.outline.headings()], ['Out'])
+
+	def test_random_edits_equal_rebuild(self):
+		rng = random.Random(2015)
+		pieces = ['# a', '## b', 'text', '', '===', '---', '```', '~~~', 'x\ny', '#### c ##', '<div>', '</div>', '<!--', '-->', '<p>x</p>']
+		document = Document(self.text)
+		document.outline.headings()
+		for i in range(500):
+			first = rng.randrange(len(document.lines))
+			old_count = rng.randint(0, min(3, len(document.lines) - first))
+			document.replace(first, old_count, '\n'.join(rng.choice(pieces) for j in range(rng.randint(1, 3))))
+			self.assertEqual(document.outline.headings(), Document('\n'.join(document.lines)).outline.headings())
+
+@unittest.skipIf(markdown is None, "Python-Markdown is not installed")
+class AnchorsTest(unittest.TestCase):
+
+	def test_anchors_are_the_ids_of_the_page(self):
+		text = '# Hello [world](http://x.y)\n\n## Title {#custom}\n\nHello world\n-----------\n\n### *a* & "b"'
+		headings = Document(text).outline.headings()
+		html = markdown.markdown(text, extensions = ['extra', 'toc'])
+		for anchor in anchors(headings):
+			self.assertIn('id="{0}"'.format(anchor), html)
+		self.assertEqual(anchors(headings), ['hello-world', 'custom', 'hello-world_1', 'a-b'])
+
+	def test_anchors_are_cached(self):
+		convert = outline_module._convert_anchors
+		calls = []
+		def counting(headings):
+			calls.append(headings)
+			return convert(headings)
+		outline_module._convert_anchors = counting
+		try:
+			ids = anchors([Heading(0, 1, 'Cached'), Heading(2, 2, 'Twice')])
+			ids.append(None)
+			self.assertEqual(anchors([Heading(4, 1, 'Cached'), Heading(6, 2, 'Twice')]), ['cached', 'twice'])
+			self.assertEqual(len(calls), 1)
+			self.assertEqual(anchors([Heading(0, 1, 'Cached')]), ['cached'])
+			self.assertEqual(len(calls), 2)
+		finally:
+			outline_module._convert_anchors = convert
+
+if __name__ == '__main__':
+	unittest.main()
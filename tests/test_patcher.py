@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `patcher`, the preview that is patched block by block.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import json, unittest
+
+from patcher import block_ids, build_page, build_patch
+
+def blocks(*texts):
+
+	# Blocks as the block cache gives them, keyed by their text.
+	return [(text * 8, '<p>{0}</p>'.format(text), line) for line, text in enumerate(texts)]
+
+class PatcherTest(unittest.TestCase):
+
+	def test_equal_blocks_get_distinct_ids(self):
+		ids = block_ids(blocks('a', 'b', 'a'))
+		self.assertEqual(len(set(ids)), 3)
+		self.assertEqual(ids[0], block_ids(blocks('a'))[0])
+
+	def test_page(self):
+		page, ids = build_page(blocks('a', 'b'))
+		self.assertIn('<div id="{0}" class="gedit-markdown-block" data-line="1"><p>b</p></div>'.format(ids[1]), page)
+
+	def test_patch_only_sends_new_blocks(self):
+		page, page_ids = build_page(blocks('a', 'b'))
+		script, ids = build_patch(blocks('c', 'a'), page_ids)
+		patch = json.loads(script[len('geditMarkdownPatch('):-len(');')])
+		self.assertEqual(patch, [[ids[0], '<p>c</p>', 0], [page_ids[0], None, 1]])
+
+if __name__ == '__main__':
+	unittest.main()
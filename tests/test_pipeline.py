@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `pipeline`, the conversion of Markdown text to HTML as configured.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import gc, os, unittest
+
+from tests.test_coprocess import stub
+from tests.test_memo import TARGET, Highlighter
+
+try:
+	from configuration import configurate
+	from pipeline import EngineRegistry, Pipeline, engines
+except ImportError:
+	raise unittest.SkipTest("PyXDG is not installed")
+
+try:
+	import markdown
+except ImportError:
+	markdown = None
+
+def external(section, **settings):
+
+	# Returns a configuration with the Markdown stage only, given by an
+	# external tool with the settings.
+	cfg = configurate(os.devnull)
+	cfg.current_section = 'General'
+	cfg['use_external_markdown'] = 'Yes'
+	cfg['stages'] = 'markdown'
+	cfg.current_section = section
+	for key, value in settings.items():
+		cfg[key] = value
+	return cfg
+
+def internal(**settings):
+
+	# Returns a configuration with internal Markdown with the settings.
+	cfg = configurate(os.devnull)
+	cfg.current_section = 'Internal Markdown'
+	for key, value in settings.items():
+		cfg[key] = value
+	return cfg
+
+class EngineRegistryTest(unittest.TestCase):
+
+	def test_engine_is_shared_until_unreferenced(self):
+		registry = EngineRegistry()
+		created = []
+		factory = lambda: created.append(object()) or created[-1]
+		engine = registry.get('a', factory)
+		self.assertIs(registry.get('a', factory), engine)
+		self.assertIsNot(registry.get('b', factory), engine)
+		self.assertEqual(len(created), 2)
+
+		# The engine of b isn't referred to, so it is dropped.
+		gc.collect()
+		self.assertEqual(len(registry), 1)
+		del engine
+		gc.collect()
+		self.assertEqual(len(registry), 0)
+		registry.get('a', factory)
+		self.assertEqual(len(created), 3)
+
+	@unittest.skipIf(markdown is None, "Python-Markdown is not installed")
+	def test_equal_configurations_share_engines(self):
+		first, second = Pipeline(internal()), Pipeline(internal())
+		first.render('a')
+		second.render('a')
+		self.assertIs(first._markdown_engine, second._markdown_engine)
+		self.assertIs(first._smartypants_engine, second._smartypants_engine)
+		other = Pipeline(internal(output_format = 'html'))
+		other.render('a')
+		self.assertIsNot(other._markdown_engine, first._markdown_engine)
+		self.assertIs(other._smartypants_engine, first._smartypants_engine)
+
+		# The engines are dropped with the last pipeline referring to them.
+		gc.collect()
+		count = len(engines)
+		del first, second
+		gc.collect()
+		self.assertEqual(len(engines), count - 1)
+		del other
+		gc.collect()
+		self.assertEqual(len(engines), count - 3)
+
+class ExternalTest(unittest.TestCase):
+
+	def render(self, cfg, text):
+		pipeline = Pipeline(cfg)
+		try:
+			return pipeline.render(text), pipeline.has_error
+		finally:
+			pipeline.stop()
+
+	def test_persistent_tool(self):
+		cfg = external('External Markdown', command_line = stub(), persistent = 'Yes')
+		self.assertEqual(self.render(cfg, 'a'), ('A', False))
+
+	def test_crashing_persistent_tool_gives_error_page(self):
+		cfg = external('External Markdown', command_line = stub(), persistent = 'Yes')
+		html, has_error = self.render(cfg, 'crash')
+		self.assertTrue(has_error)
+		self.assertTrue(html.startswith('<p>Error: '))
+
+	def test_unknown_framing_gives_error_page(self):
+		cfg = external('External Markdown', command_line = stub(), persistent = 'Yes', framing = 'lines')
+		html, has_error = self.render(cfg, 'a')
+		self.assertTrue(has_error)
+		self.assertIn('lines', html)
+
+@unittest.skipIf(markdown is None, "Python-Markdown is not installed")
+class SmartyPantsTest(unittest.TestCase):
+
+	def render(self, integrated):
+
+		# A substitution whose name is misspelled has no pattern.
+		cfg = configurate(os.devnull)
+		cfg.current_section = 'General'
+		cfg['integrated_smartypants'] = 'Yes' if integrated else 'No'
+		cfg.current_section = 'Internal SmartyPants'
+		cfg['left-dubble-quote'] = '«'
+		pipeline = Pipeline(cfg)
+		try:
+			return pipeline.render('"a"'), pipeline.has_error
+		finally:
+			pipeline.stop()
+
+	def test_substitution_without_pattern_gives_error_page(self):
+		for integrated in (False, True):
+			with self.subTest(integrated = integrated):
+				html, has_error = self.render(integrated)
+				self.assertTrue(has_error)
+				self.assertIn('No pattern defined for left-dubble-quote.', html)
+
+@unittest.skipIf(markdown is None, "Python-Markdown is not installed")
+class MemoizeTest(unittest.TestCase):
+
+	def setUp(self):
+		self.original = Highlighter.hilite
+
+	def test_targets_are_restored_when_no_pipeline_uses_them(self):
+		pipeline = Pipeline(internal(memoize = TARGET))
+		pipeline.render('a')
+		self.assertIsNot(Highlighter.hilite, self.original)
+
+		# A reloaded configuration without the target takes over.
+		pipeline = Pipeline(internal(memoize = ''), pipeline)
+		pipeline.render('a')
+		gc.collect()
+		self.assertIs(Highlighter.hilite, self.original)
+
+	def test_targets_are_restored_when_pipeline_stops(self):
+		pipeline = Pipeline(internal(memoize = TARGET))
+		pipeline.render('a')
+		pipeline.stop()
+		self.assertIs(Highlighter.hilite, self.original)
+
+if __name__ == '__main__':
+	unittest.main()
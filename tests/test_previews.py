@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `previews`, the render states of the most recently used documents.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+from previews import PreviewState, PreviewStates
+
+class PreviewStateTest(unittest.TestCase):
+
+	def test_is_current(self):
+		state = PreviewState()
+		self.assertFalse(state.is_current)
+		state.result, state.rendered_changes = '<p>a</p>', 0
+		self.assertTrue(state.is_current)
+		state.changes += 1
+		self.assertFalse(state.is_current)
+
+class PreviewStatesTest(unittest.TestCase):
+
+	def test_least_recently_used_is_dropped(self):
+		states = PreviewStates(2)
+		a, b, c = PreviewState(), PreviewState(), PreviewState()
+		self.assertEqual(states.add('a', a), [])
+		states.add('b', b)
+		self.assertIs(states.get('a'), a)
+		self.assertEqual(states.add('c', c), [('b', b)])
+		self.assertNotIn('b', states)
+		self.assertIsNone(states.get('b'))
+
+	def test_pop_and_clear(self):
+		states = PreviewStates()
+		a, b = PreviewState(), PreviewState()
+		states.add('a', a)
+		states.add('b', b)
+		self.assertIs(states.pop('a'), a)
+		self.assertIsNone(states.pop('a'))
+		self.assertEqual(states.clear(), [('b', b)])
+		self.assertEqual(len(states), 0)
+
+if __name__ == '__main__':
+	unittest.main()
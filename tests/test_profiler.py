@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `profiler`, the cost of the components of the internal engines.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os, pstats, tempfile, unittest
+
+try:
+	from profiler import Profile, profile, profile_call
+except ImportError:
+	raise unittest.SkipTest("PyXDG is not installed")
+
+try:
+	import markdown
+except ImportError:
+	markdown = None
+
+class ProfileTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_report(self):
+		components = Profile()
+		components.add('a', 0.001)
+		components.add('b', 0.003, 0)
+		components.add('a', 0.001)
+		self.assertEqual(components.report(), ["b: 3.0 ms in 0 calls", "a: 2.0 ms in 2 calls"])
+		self.assertEqual(components.report(1), ["b: 3.0 ms in 0 calls"])
+		components.clear()
+		self.assertEqual(len(components), 0)
+
+	def test_write(self):
+		components = Profile()
+		components.add('a', 0.001)
+		path = os.path.join(self.directory.name, 'state', 'profile.txt')
+		components.write(path)
+		with open(path, encoding = 'utf-8') as f:
+			self.assertEqual(f.read(), "a: 1.0 ms in 1 calls\n")
+
+	def test_write_error_is_raised(self):
+		blocker = os.path.join(self.directory.name, 'file')
+		open(blocker, 'w').close()
+		self.assertRaises(OSError, Profile().write, os.path.join(blocker, 'profile.txt'))
+
+	def test_profile_call(self):
+		path = os.path.join(self.directory.name, 'state', 'render.pstats')
+		self.assertEqual(profile_call(lambda: 'html', path), ('html', None))
+		self.assertTrue(pstats.Stats(path).total_calls > 0)
+
+	def test_profile_call_keeps_result_when_statistics_fail(self):
+		blocker = os.path.join(self.directory.name, 'file')
+		open(blocker, 'w').close()
+		html, err = profile_call(lambda: 'html', os.path.join(blocker, 'render.pstats'))
+		self.assertEqual(html, 'html')
+		self.assertIsInstance(err, OSError)
+
+@unittest.skipIf(markdown is None, "Python-Markdown is not installed")
+class InstrumentTest(unittest.TestCase):
+
+	def test_instrument_markdown(self):
+		from profiler import instrument_markdown
+		md = markdown.Markdown()
+		instrument_markdown(md)
+		profile.clear()
+		md.convert('# a\n\n*b*')
+		names = [line.partition(':')[0] for line in profile.report()]
+		self.assertIn('treeprocessor inline (markdown.treeprocessors)', names)
+		self.assertIn('blockprocessor hashheader (markdown.blockprocessors)', names)
+		profile.clear()
+
+if __name__ == '__main__':
+	unittest.main()
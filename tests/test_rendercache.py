@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `rendercache`, the content-addressed cache of rendered HTML.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os, tempfile, unittest
+
+from rendercache import RenderCache, fingerprint, make_key
+
+class KeyTest(unittest.TestCase):
+
+	def test_chunks_give_the_same_key_as_text(self):
+		self.assertEqual(make_key(['ab', 'c'], 'f'), make_key('abc', 'f'))
+
+	def test_configuration_is_part_of_the_key(self):
+		self.assertNotEqual(make_key('abc', 'f'), make_key('abc', 'g'))
+		self.assertEqual(fingerprint({'b': {'y': '1', 'x': '2'}, 'a': {}}), fingerprint({'a': {}, 'b': {'x': '2', 'y': '1'}}))
+
+class RenderCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_least_recently_used_is_evicted(self):
+		cache = RenderCache(10)
+		cache.put('a', 'aaaa')
+		cache.put('b', 'bbbb')
+		cache.get('a')
+		cache.put('c', 'cccc')
+		self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), ('aaaa', None, 'cccc'))
+		self.assertEqual(cache.size, 8)
+
+	def test_html_too_large_is_not_cached(self):
+		cache = RenderCache(3)
+		cache.put('a', 'aaaa')
+		self.assertIsNone(cache.get('a'))
+
+	def test_disk_is_shared(self):
+		RenderCache(100, self.directory.name).put('a', '<p>å</p>')
+		cache = RenderCache(100, self.directory.name)
+		self.assertEqual(cache.get('a'), '<p>å</p>')
+		self.assertEqual(len(cache), 1)
+
+	def test_disk_is_pruned(self):
+		cache = RenderCache(10, self.directory.name)
+		for key in 'abc':
+			cache.put(key, key * 4)
+		self.assertLessEqual(sum(entry.stat().st_size for entry in os.scandir(self.directory.name)), 10)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `simpleconfig`, the facade of `configparser.ConfigParser`.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+from types import MappingProxyType
+from simpleconfig import SimpleConfig
+
+class SnapshotTest(unittest.TestCase):
+
+	def setUp(self):
+		self.cfg = SimpleConfig()
+		self.cfg.current_section = 'General'
+		self.cfg.current_dictionary = {'flag': 'Yes', 'off': 'off', 'delay': '500', 'ratio': '0.5', 'name': 'gedit', 'empty': ''}
+
+	def test_values_are_typed(self):
+		general = self.cfg.snapshot()['General']
+		self.assertEqual(dict(general), {'flag': True, 'off': False, 'delay': 500.0, 'ratio': 0.5, 'name': 'gedit', 'empty': ''})
+		self.assertIs(general['flag'], True)
+
+	def test_values_are_strings_if_not_typed(self):
+		self.assertEqual(self.cfg.snapshot(False)['General']['delay'], '500')
+		self.assertEqual(self.cfg.snapshot(False)['General']['flag'], 'Yes')
+
+	def test_snapshot_is_read_only(self):
+		snapshot = self.cfg.snapshot()
+		self.assertIsInstance(snapshot, MappingProxyType)
+		self.assertIsInstance(snapshot['General'], MappingProxyType)
+		with self.assertRaises(TypeError):
+			snapshot['General']['flag'] = False
+		with self.assertRaises(TypeError):
+			snapshot['Other'] = {}
+
+	def test_snapshot_does_not_follow_configuration(self):
+		snapshot = self.cfg.snapshot()
+		self.cfg['delay'] = 250
+		self.cfg.current_section = 'Other'
+		self.assertEqual(snapshot['General']['delay'], 500)
+		self.assertNotIn('Other', snapshot)
+		self.assertEqual(self.cfg.snapshot()['General']['delay'], 250)
+
+if __name__ == '__main__':
+	unittest.main()
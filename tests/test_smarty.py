@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `smarty`, the SmartyPants substitutions on HTML and on the element
+tree of Python-Markdown.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+from html import unescape
+from smarty import Smarty
+
+try:
+	import markdown
+	from smarty import SmartyExtension
+except ImportError:
+	markdown = None
+
+def smarten(html):
+	return Smarty().reset().feed(html).close()
+
+class SmartyTest(unittest.TestCase):
+
+	def test_substitutions(self):
+		self.assertEqual(smarten('<p>"a" -- b --- c... it\'s \'d\'</p>'), '<p>“a” – b — c… it’s ‘d’</p>')
+
+	def test_raw_elements(self):
+		self.assertEqual(smarten('<pre><code>"x"</code>"y"</pre><p>"z"</p>'), '<pre><code>"x"</code>"y"</pre><p>“z”</p>')
+		self.assertEqual(smarten('<p><kbd>"k"</kbd> "t"</p>'), '<p><kbd>"k"</kbd> “t”</p>')
+
+	def test_substitutions_can_be_changed(self):
+		smarty = Smarty()
+		smarty.substitutions = {'em-dash': '&mdash;'}
+		self.assertEqual(smarty.reset().feed('<p>"a" --- b</p>').close(), '<p>"a" &mdash; b</p>')
+
+	def test_stream_equals_whole(self):
+		html = '<p>"quoted" -- and...</p><pre>"raw"</pre><p>it\'s</p>'
+		for size in (1, 2, 5, 17):
+			with self.subTest(size = size):
+				pieces = [html[i:i + size] for i in range(0, len(html), size)]
+				self.assertEqual(''.join(Smarty().stream(pieces)), smarten(html))
+
+	def test_read_returns_what_is_finished(self):
+		smarty = Smarty().reset()
+		smarty.feed('<p>"a" <b>')
+		self.assertEqual(smarty.read(), '<p>“a” <b>')
+		smarty.feed('b</b></p>')
+		self.assertEqual(smarty.close(), 'b</b></p>')
+
+@unittest.skipIf(markdown is None, "Python-Markdown is not installed")
+class ExtensionTest(unittest.TestCase):
+
+	texts = [
+		'Say "hi" -- it\'s *"here"*...',
+		'    "code"\n\n`"inline"` and <kbd>"k"</kbd> &amp; "x"',
+		'<div>\n"raw" <pre>"p"</pre> "after"\n</div>',
+		'A <code>"c"</code> "d" and \\"escaped\\"',
+		'"[link](http://x "title")" --- "![img](a.png)"'
+	]
+	"""Texts with substitutions in and around raw elements and raw HTML."""
+
+	def test_tree_equals_html(self):
+
+		# Smarty decodes character references in the HTML, so only the text
+		# is compared.
+		for text in self.texts:
+			with self.subTest(text = text):
+				on_html = smarten(markdown.markdown(text))
+				on_tree = markdown.markdown(text, extensions = [SmartyExtension()])
+				self.assertEqual(unescape(on_tree), unescape(on_html))
+
+if __name__ == '__main__':
+	unittest.main()
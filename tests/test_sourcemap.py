@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `sourcemap`, the links between the lines of a document and the blocks
+of its HTML.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+import sourcemap
+
+from .documents import random_documents
+
+try:
+	import markdown
+except ImportError:
+	markdown = None
+
+class IndexTest(unittest.TestCase):
+
+	def test_index(self):
+		html = '<p data-line="4">a</p><div data-line="0"></div><p data-line="4">b</p>'
+		self.assertEqual(sourcemap.index(html), [0, 4])
+
+	def test_block_line(self):
+		self.assertIsNone(sourcemap.block_line([2, 5], 1))
+		self.assertEqual(sourcemap.block_line([2, 5], 2), 2)
+		self.assertEqual(sourcemap.block_line([2, 5], 9), 5)
+
+	def test_shift_and_strip(self):
+		html = '<div data-line="0"></div>\n<pre>a</pre>\n<p data-line="3">b</p>'
+		self.assertEqual(sourcemap.shift(html, 10), '<div data-line="10"></div>\n<pre>a</pre>\n<p data-line="13">b</p>')
+		self.assertEqual(sourcemap.strip(html), '<pre>a</pre>\n<p>b</p>')
+
+	def test_parse_title(self):
+		self.assertEqual(sourcemap.parse_title(sourcemap.TITLE_PREFIX + '12'), 12)
+		self.assertIsNone(sourcemap.parse_title('Document'))
+		self.assertIsNone(sourcemap.parse_title(sourcemap.TITLE_PREFIX + 'x'))
+
+@unittest.skipIf(markdown is None, "Python-Markdown is not installed")
+class ExtensionTest(unittest.TestCase):
+
+	texts = [
+		'# Title\n\nText with "quotes".\n\n    code\n\n- a\n\n- b',
+		'> a\n\n> b\n\nc',
+		'<div>\n\nx\n\n</div>\n\ny',
+		'<div>\n<!-- a\n\n-->\n</div>\n\n</p>\n\nz',
+		'```\na\n\n\nb\n```\n\n\n\nc',
+		'- a\n\n[^1]: b\n\n- c\n\nd[^1]',
+		'term\n: def\n\nterm\n: def\n\n| a | b |\n|---|---|\n| 1 | 2 |',
+		'para\n\n[a]: http://x\n\n    more\n\nsee [a]',
+		'## Items\n- a\n\n- b\n',
+		': def\n\nterm\n\n: def',
+		'[a]: http://x\n\n: def'
+	]
+	"""Texts where markers could change the HTML."""
+
+	def setUp(self):
+		self.plain = markdown.Markdown(extensions = ['extra', 'sane_lists'])
+		self.mapped = markdown.Markdown(extensions = ['extra', 'sane_lists', sourcemap.SourceLineExtension()])
+
+	def test_html_is_unchanged(self):
+		for text in self.texts:
+			with self.subTest(text = text):
+				self.assertEqual(sourcemap.strip(self.mapped.reset().convert(text)), self.plain.reset().convert(text))
+
+	def test_html_of_random_documents_is_unchanged(self):
+		for text in random_documents(2, 500):
+			with self.subTest(text = text):
+				self.assertEqual(sourcemap.strip(self.mapped.reset().convert(text)), self.plain.reset().convert(text))
+
+	def test_lines(self):
+		html = self.mapped.reset().convert('# Title\n\nText\n\n<div>\nx\n</div>\n\n> a\n\n> b')
+		self.assertEqual(sourcemap.index(html), [0, 2, 4, 8])
+		self.assertIn('<h1 data-line="0">', html)
+
+if __name__ == '__main__':
+	unittest.main()
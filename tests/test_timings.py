@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `timings`, the timings of the most recent renders and their log.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import json, os, tempfile, unittest
+
+try:
+	from timings import TimingLog, Timings
+except ImportError:
+	raise unittest.SkipTest("PyXDG is not installed")
+
+class TimingsTest(unittest.TestCase):
+
+	def timings(self, values):
+		timings = Timings()
+		for value in values:
+			timings.add({'markdown': value})
+		return timings
+
+	def test_percentile_boundaries(self):
+		timings = self.timings(range(1, 101))
+		self.assertEqual(timings.percentile('markdown', 0), 1)
+		self.assertEqual(timings.percentile('markdown', 1), 1)
+		self.assertEqual(timings.percentile('markdown', 50), 50)
+		self.assertEqual(timings.percentile('markdown', 95), 95)
+		self.assertEqual(timings.percentile('markdown', 100), 100)
+
+	def test_percentile_of_few_renders(self):
+		timings = self.timings([2, 1])
+		self.assertEqual(timings.percentile('markdown', 50), 1)
+		self.assertEqual(timings.percentile('markdown', 51), 2)
+		self.assertEqual(self.timings([3]).percentile('markdown', 95), 3)
+		self.assertIsNone(self.timings([]).percentile('markdown', 95))
+		self.assertIsNone(timings.percentile('smartypants', 95))
+
+	def test_only_the_most_recent_renders_are_kept(self):
+		timings = self.timings(range(1, 151))
+		self.assertEqual(len(timings), 100)
+		self.assertEqual(timings.percentile('markdown', 0), 51)
+		self.assertEqual(timings.latest(), {'markdown': 150})
+
+	def test_summary(self):
+		timings = self.timings([0.001, 0.002])
+		timings.add({'markdown': 0.003, 'input_bytes': 1000, 'output_bytes': 2000})
+		self.assertEqual(timings.summary(), ["markdown: 3.0 ms (p95 3.0 ms)", "1,000 bytes in, 2,000 bytes out"])
+
+class TimingLogTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_records_are_appended(self):
+		path = os.path.join(self.directory.name, 'state', 'timings.jsonl')
+		log = TimingLog(path)
+		log.write({'markdown': 0.5})
+		log.write({'markdown': 0.25})
+		with open(path, encoding = 'utf-8') as f:
+			lines = [json.loads(line) for line in f]
+		self.assertEqual([line['markdown'] for line in lines], [0.5, 0.25])
+		self.assertTrue(all('time' in line and 'host' in line for line in lines))
+
+	def test_write_errors_are_ignored(self):
+		log = TimingLog(os.path.join(self.directory.name, 'timings.jsonl'))
+		os.mkdir(log.path)
+		log.write({'markdown': 0.5})
+
+if __name__ == '__main__':
+	unittest.main()
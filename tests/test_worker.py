@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of `worker`, the background thread converting the document.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import threading, unittest
+
+from time import monotonic, sleep
+
+try:
+	from gi.repository import GLib
+	from worker import RenderWorker
+except ImportError:
+	raise unittest.SkipTest("PyGObject is not installed")
+
+class RenderWorkerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.started = threading.Event()
+		self.release = threading.Event()
+		self.converted = []
+		self.results = []
+		self.worker = RenderWorker(self.convert, self.results.append)
+
+	def tearDown(self):
+		self.release.set()
+		self.worker.stop()
+
+	def convert(self, text):
+
+		# Called on the worker thread. Waits until the test lets it finish.
+		self.converted.append(text)
+		self.started.set()
+		self.release.wait(5)
+		return text.upper()
+
+	def run_main_loop(self, seconds):
+
+		# Delivers the results that are ready within the time.
+		context = GLib.MainContext.default()
+		end = monotonic() + seconds
+		while monotonic() < end:
+			while context.iteration(False):
+				pass
+			sleep(0.01)
+
+	def test_newer_job_supersedes_older(self):
+		first = self.worker.submit('a')
+		second = self.worker.submit('b')
+		self.assertGreater(second, first)
+		self.release.set()
+		self.run_main_loop(0.5)
+		self.assertEqual(self.results, ['B'])
+		self.assertFalse(self.worker.is_busy)
+
+	def test_running_job_is_superseded(self):
+		self.worker.submit('a')
+		self.assertTrue(self.started.wait(5))
+		cancelled = self.worker.cancelled
+		self.worker.submit('b')
+		self.assertTrue(cancelled.is_set())
+		self.release.set()
+		self.run_main_loop(0.5)
+		self.assertEqual(self.converted, ['a', 'b'])
+		self.assertEqual(self.results, ['B'])
+
+	def test_cancel_drops_result_of_running_job(self):
+		self.worker.submit('a')
+		self.assertTrue(self.started.wait(5))
+		self.worker.cancel()
+		self.assertTrue(self.worker.cancelled.is_set())
+		self.assertFalse(self.worker.is_busy)
+		self.release.set()
+		self.run_main_loop(0.5)
+		self.assertEqual(self.results, [])
+
+	def test_stop_joins_thread(self):
+		self.worker.submit('a')
+		self.assertTrue(self.started.wait(5))
+
+		# The running job isn't finished within the timeout.
+		self.assertFalse(self.worker.stop(0.1))
+		self.release.set()
+		self.assertTrue(self.worker.stop())
+		self.assertNotIn('RenderWorker', [thread.name for thread in threading.enumerate()])
+		self.run_main_loop(0.1)
+		self.assertEqual(self.results, [])
+
+if __name__ == '__main__':
+	unittest.main()
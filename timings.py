@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Timings – rolling statistics and a JSON-lines log of render timings.
+
+A render is recorded as a dictionary with the time in seconds spent in each
+stage, e.g. `get_text`, `markdown`, `smartypants` and `load_string`, in the
+order they are run, and the number of bytes in and out of the pipeline, as
+`input_bytes` and `output_bytes`.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import json, os, socket, time
+
+from collections import deque
+from math import ceil
+from configuration import xdg_state_home
+
+LOG_FILE = os.path.join(xdg_state_home, "gedit-markdown", "timings.jsonl")
+"""Default JSON-lines log file."""
+
+class Timings:
+
+	"""
+		Keeps the timings of the most recent renders.
+	"""
+
+	def __init__(self, size = 100):
+
+		self.size = size
+		"""Number of renders kept."""
+
+		# Recorded renders, oldest first.
+		self._records = deque(maxlen = size)
+
+	def __len__(self):
+		return len(self._records)
+
+	def add(self, record):
+		self._records.append(record)
+
+	def latest(self):
+		return self._records[-1] if self._records else None
+
+	def percentile(self, key, p):
+
+		"""
+			Returns the p:th percentile of the value of the key over the kept
+			renders, by the nearest-rank method, or `None` if no render has the
+			key.
+		"""
+
+		values = sorted(record[key] for record in self._records if key in record)
+		if not values:
+			return None
+		return values[max(0, ceil(len(values) * p / 100) - 1)]
+
+	def summary(self):
+
+		"""
+			Returns a list of lines with the latest and 95th percentile time of
+			every stage.
+		"""
+
+		latest = self.latest()
+		if latest is None:
+			return []
+		lines = []
+		for stage, seconds in latest.items():
+			if not stage.endswith('_bytes'):
+				lines.append("{0}: {1:.1f} ms (p95 {2:.1f} ms)".format(stage, seconds * 1000, self.percentile(stage, 95) * 1000))
+		lines.append("{0:,d} bytes in, {1:,d} bytes out".format(latest.get('input_bytes', 0), latest.get('output_bytes', 0)))
+		return lines
+
+class TimingLog:
+
+	"""
+		Appends render timings to a JSON-lines file, one object per line.
+	"""
+
+	def __init__(self, path = LOG_FILE):
+		self.path = path
+		self._host = socket.gethostname()
+		os.makedirs(os.path.dirname(path), exist_ok = True)
+
+	def write(self, record):
+		line = dict(record, time = time.time(), host = self._host)
+		try:
+			with open(self.path, 'a', encoding = 'utf-8') as f:
+				f.write(json.dumps(line, sort_keys = True) + '\n')
+		except OSError:
+			pass
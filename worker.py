@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Worker – converts text on a background thread, so that a slow conversion never
+blocks the GTK main loop.
+
+Every job is given a generation number. Only the most recent job is of
+interest: a job that is superseded before it has started is never run, and
+the result of a job that is superseded while it runs is dropped. The running
+job is also told that it has been cancelled, so that it can stop early. Results
+are handed back to the main loop with `GLib.idle_add`.
+
+© 2015 Thomas Barregren <thomas@barregren.se>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from gettext import gettext as _
+from threading import Condition, Event, Thread
+from gi.repository import GLib
+
+class RenderWorker:
+
+	"""
+		Runs `convert(text, *context)` on a background thread and calls
+		`callback(result, *context)` on the main loop when it is done.
+	"""
+
+	def __init__(self, convert, callback):
+
+		self.convert = convert
+		"""Function converting text, called on the worker thread."""
+
+		self.callback = callback
+		"""Function receiving the result, called on the main loop."""
+
+		# Generation number of the most recent job.
+		self._generation = 0
+
+		# The job waiting to be run, if any.
+		self._job = None
+
+		# Set when the worker shall stop.
+		self._stopped = False
+
+		# Set when the running job is superseded.
+		self._cancelled = Event()
+
+		# Whether the result of the most recent job is still to be delivered.
+		# Only used on the main loop.
+		self._is_busy = False
+
+		self._condition = Condition()
+		self._thread = Thread(target = self._run, name = "RenderWorker", daemon = True)
+		self._thread.start()
+
+	@property
+	def generation(self):
+		return self._generation
+
+	@property
+	def cancelled(self):
+
+		"""
+			`threading.Event` set when the running job is superseded. Only
+			meaningful on the worker thread, while a job is running.
+		"""
+
+		return self._cancelled
+
+	@property
+	def is_busy(self):
+
+		"""
+			Whether the most recent job has yet to deliver its result. Only
+			meaningful on the main loop.
+		"""
+
+		return self._is_busy
+
+	def submit(self, text, *context):
+
+		"""
+			Queues a job, replacing any job that has not started yet, and
+			returns its generation number.
+		"""
+
+		self._is_busy = True
+		with self._condition:
+			self._generation += 1
+			self._job = (self._generation, text, context)
+			self._cancelled.set()
+			self._condition.notify()
+			return self._generation
+
+	def cancel(self):
+
+		"""
+			Drops the queued job and the result of the running one.
+		"""
+
+		self._is_busy = False
+		with self._condition:
+			self._generation += 1
+			self._job = None
+			self._cancelled.set()
+
+	def stop(self, timeout = None):
+
+		"""
+			Cancels all jobs and waits for the worker thread to finish, at most
+			`timeout` seconds if given. Returns whether it has finished.
+		"""
+
+		self._is_busy = False
+		with self._condition:
+			self._generation += 1
+			self._job = None
+			self._stopped = True
+			self._cancelled.set()
+			self._condition.notify()
+		self._thread.join(timeout)
+		return not self._thread.is_alive()
+
+	def _run(self):
+		while True:
+
+			# Wait for a job.
+			with self._condition:
+				while self._job is None and not self._stopped:
+					self._condition.wait()
+				if self._stopped:
+					return
+				generation, text, context = self._job
+				self._job = None
+				self._cancelled = Event()
+
+			try:
+				result = self.convert(text, *context)
+			except Exception as err:
+				result = "<p>" + _("Unexpected error while rendering: {0}").format(err) + "</p>"
+
+			# A newer job has been submitted while this one was running.
+			if generation != self._generation:
+				continue
+
+			GLib.idle_add(self._deliver, generation, result, context)
+
+	def _deliver(self, generation, result, context):
+
+		# The result may have become stale while waiting for the main loop.
+		if generation == self._generation:
+			self._is_busy = False
+			self.callback(result, *context)
+
+		# Remove the idle source.
+		return False